@@ -6,7 +6,7 @@ except ImportError:
     print("X-Plane not loaded")
 
 from .globals import logger, TAXIWAY_WIDTH_CODE, TAXI_SPEED, RABBIT, AIRCRAFT
-from .geo import distance, Point
+from .geo import distanceLatLon
 
 # fmt: off
 ICAO_AND_IATA_AIRLINERS_CODES = [
@@ -179,6 +179,7 @@ class Aircraft:
         self.lon = xp.findDataRef("sim/flightmodel/position/longitude")
         self.psi = xp.findDataRef("sim/flightmodel/position/psi")
         self.groundspeed = xp.findDataRef("sim/flightmodel/position/groundspeed")
+        self.agl = xp.findDataRef("sim/flightmodel/position/y_agl")
         self.tiller = xp.findDataRef("ckpt/tiller")
         self.width_code = TAXIWAY_WIDTH_CODE.C  # init to default
         self.init()
@@ -269,6 +270,10 @@ class Aircraft:
     def speed(self) -> float:
         return xp.getDataf(self.groundspeed)
 
+    def altitude(self) -> float:
+        # above ground level, in meters
+        return xp.getDataf(self.agl)
+
     def mark(self) -> int:
         self.positions.append(self.position())
         self.speeds.append(self.speed())
@@ -276,7 +281,7 @@ class Aircraft:
 
     def moved(self, orig: int = 0) -> float:
         pos = self.position()
-        return distance(Point(lat=self.positions[orig][0], lon=self.positions[orig][1]), Point(lat=pos[0], lon=pos[1]))
+        return distanceLatLon(self.positions[orig][0], self.positions[orig][1], pos[0], pos[1])
 
     def tiller(self) -> float:
         # runs [-50, 50]
@@ -2,18 +2,26 @@
 # Airport information container: name, taxi routes, runways, ramps, holding positions, etc.
 #
 import os
-import re
 import math
+import time
 from typing import Tuple
-
-from .geo import FeatureCollection, Point, Line, Polygon, destination, distance, bearing, turn, pointInPolygon, nearestPointToLines
-from .graph import Graph, Edge, Vertex
+from collections import OrderedDict
+
+from .geo import FeatureCollection, Point, Line, Polygon, LocalProjection, EXACT, destination, distance, distanceRad, bearing, turn, pointInPolygon, nearestPointToLine
+from .graph import Graph, Edge, Vertex, RoutingProfile
+from .geoarray import pointsInPolygon
+from .aptdat import aptFiles, aptIndex, locateAirport, streamAirportMmap, SCANNERS, ROUTING_CODES, AptRecords
+from .aptcache import readCompiled, writeCompiled
+from .hierarchy import findHierarchy, mkHierarchies
+from .routetree import RouteTrees
+from .csr import CompactGraph
 from .globals import (
     logger,
     get_global,
     minsec,
     DISTANCE_TO_RAMPS,
     TAXIWAY_TYPE,
+    TAXIWAY_WIDTH_CODE,
     RUNWAY_BUFFER_WIDTH,
     AIRPORT,
     MOVEMENT,
@@ -23,8 +31,6 @@ from .globals import (
     ROUTING_ALGORITHMS,
 )
 
-SYSTEM_DIRECTORY = "."
-
 TURN_LIMIT = 10.0  # °, below this, it is not considered a turn, just a small break in an almost straight line
 SMALL_TURN_LIMIT = 15.0  # °, above this angle, it is recommended to slow down for the turn
 
@@ -60,19 +66,20 @@ class Runway(Line):
         self.first_exit = self.threshold
         logger.debug(f"displaced threshold at {round(move,1)}m")
 
-    def runwayExits(self, graph: Graph) -> set:
+    def runwayExits(self, graph: Graph, profile: RoutingProfile | None = None) -> set:
         # return vertex that this on taxiway network, that is NOT a on a runway edge
         # and that is the closest to runway threshold
         # Select vertices from segments that are not runway
         # Select vertices that are "inside" a buffer around the runway
         # Select the vertex closest to the start or threshold
         buffer = Polygon.new(self.start.lat, self.start.lon, self.end.lat, self.end.lon, RUNWAY_BUFFER_WIDTH)
+        inside = dict(zip(graph.vert_dict.keys(), pointsInPolygon(graph.get_coordinates(), buffer)))  # all vertices at once
         candidates = set()
         for e in graph.edges_arr:
-            if e.usage == TAXIWAY_TYPE.TAXIWAY:
-                if pointInPolygon(e.start, buffer):
+            if e.usage == TAXIWAY_TYPE.TAXIWAY and (profile is None or profile.allows(e)):
+                if inside[e.start.id]:
                     candidates.add(e.start)
-                if pointInPolygon(e.start, buffer):
+                if inside[e.start.id]:
                     candidates.add(e.end)
         logger.debug(f"runway has {len(candidates)} vertices in buffering zone (width={RUNWAY_BUFFER_WIDTH}m)")
         return candidates
@@ -102,14 +109,14 @@ class Runway(Line):
         logger.debug(f"entry closest to {contact_str} not found, using {contact_str}")
         return None
 
-    def nextExit(self, graph: Graph, position: Point, destination: Vertex) -> Tuple[str, float] | None:
+    def nextExit(self, graph: Graph, position: Point, destination: Vertex, profile: RoutingProfile | None = None) -> Tuple[str, float] | None:
         # return next vertex that this on taxiway network, that is NOT a on a runway edge
         # and that is the closest to position and "in front of" the position (i.e. close to end edge than position)
         # Aircraft landed, is rolling out, prompt for the greens.
         # What is the next exit in front of the aircraft suitable for routing?
         # Needs refining: left or right exit?
         # 𝑑=(𝑥−𝑥1)(𝑦2−𝑦1)−(𝑦−𝑦1)(𝑥2−𝑥1)
-        candidates = self.runwayExits(graph=graph)
+        candidates = self.runwayExits(graph=graph, profile=profile)
         pos_to_end = distance(position, self.end)
         side_needed = self.side(destination)
 
@@ -156,24 +163,6 @@ class Ramp(Point):
         self.heading = heading
 
 
-class AptLine:
-    # APT.DAT line for this airport
-    def __init__(self, line):
-        self.arr = line.split()
-        if len(self.arr) == 0:
-            logger.debug(f"empty line? '{line}'")
-
-    def linecode(self):
-        if len(self.arr) > 0:
-            return int(self.arr[0])
-        return None
-
-    def content(self):
-        if len(self.arr) > 1:
-            return " ".join(self.arr[1:])
-        return None  # line has no content
-
-
 class Airport:
     """Airport represetation (limited to FTG needs)"""
 
@@ -187,34 +176,51 @@ class Airport:
         self.altitude = 0  # ASL, in meters
         self.loaded = False
         self.scenery_pack = False
-        self.lines = []
+        self.records = AptRecords()
         self.graph = Graph(name="taxiways")
         self.runways = {}
         self.holds = {}
         self.ramps = {}
+        self.routes = RouteCache()
         #
         self.smooth_line = 0
         self.smoothGraph = Graph(name="Smoothed taxiways")
         self.tempSmoothCurve = []
 
         # PREFERENCES - Fetched by LightString
-        # Set sensible default value from global preferences
-        self.use_threshold = get_global("USE_THRESHOLD", self.prefs)
-        if self.use_threshold is None:
-            self.use_threshold = True
-        self.distance_between_taxiway_lights = get_global(AIRPORT.DISTANCE_BETWEEN_LIGHTS.value, self.prefs)  # meters, for show_taxiways()
-        self.distance_between_green_lights = get_global(AIRPORT.DISTANCE_BETWEEN_GREEN_LIGHTS.value, self.prefs)  # meters for follow_the_greens()
-        self.rabbit_speed = get_global(RABBIT.SPEED.value, self.prefs)  # seconds
         # Info 4
-        # Fine tune for specific airport(s)
         self.setPreferences()
         logger.debug(f"AIRPORT rabbit: btw greens={self.distance_between_green_lights}m, whole net={self.distance_between_taxiway_lights}m, speed={self.rabbit_speed}s")
 
     def prepare(self):
+        t0 = time.perf_counter()
+        self.routes.clear()  # routes of previous load
+        use_compiled = get_global("USE_COMPILED_CACHE", self.prefs)
+        if use_compiled and self.ldCompiled():
+            self.mkProjection()
+            self.mkCompact()
+            # Info 4.c
+            logger.info(f"{self.icao} warm load (compiled cache) in {round(time.perf_counter() - t0, 3)}s")
+            return [True, "Airport ready"]
+
         status = self.load()
         if not status:
             return [False, f"We could not find airport named '{self.icao}'."]
 
+        status = self.build()
+        if not status[0]:
+            return status
+        self.mkProjection()
+        self.mkCompact()
+
+        # Info 4.c
+        logger.info(f"{self.icao} cold load (apt.dat) in {round(time.perf_counter() - t0, 3)}s")
+        if use_compiled:
+            writeCompiled(self.icao, self.scenery_pack, self.compiled())
+        return status
+
+    def build(self):
+        # Builds routing network, runways, holds and ramps from loaded apt.dat lines
         # status = self.load_smooth()
         # if not status:
         #     return [False, f"We could not find smooth taxiway lines for airport named '{self.icao}'."]
@@ -241,9 +247,172 @@ class Airport:
         # Info 8
         logger.debug(f"ramps: {status.keys()}")
 
+        if not get_global("KEEP_APT_LINES", self.prefs):
+            self.records.release()  # all needed data has been extracted
+
         return [True, "Airport ready"]
 
-    def setPreferences(self):
+    def mkCompact(self):
+        # Flat array copy of routing network for route searches
+        if not get_global("USE_COMPACT_GRAPH", self.prefs) or len(self.graph.vert_dict) == 0:
+            self.graph.compact = None
+            return
+        self.graph.compact = CompactGraph(self.graph, contract=get_global("CONTRACT_CHAINS", self.prefs))
+
+    def mkProjection(self):
+        # Local projection centered on routing network, vertices, runways, holds and ramps get their plane coordinates
+        if not get_global("USE_LOCAL_PROJECTION", self.prefs) or len(self.graph.vert_dict) == 0:
+            self.graph.projection = EXACT
+            return
+        lat0 = sum([v.lat for v in self.graph.vert_dict.values()]) / len(self.graph.vert_dict)
+        lon0 = sum([v.lon for v in self.graph.vert_dict.values()]) / len(self.graph.vert_dict)
+        projection = LocalProjection(lat0, lon0)
+        points = list(self.graph.vert_dict.values()) + list(self.holds.values()) + list(self.ramps.values())
+        for r in self.runways.values():
+            points = points + [r.start, r.end, r.threshold]
+        for p in points:
+            projection.project(p)
+        self.graph.projection = projection
+
+    def projectionAccuracy(self) -> dict:
+        # Differences between local projection and spherical geometry on airport edges:
+        # edge length (m), edge bearing (°), and position of a light at green lights spacing along edge (m).
+        projection = self.graph.projection
+        report = {"extent": 0.0, "distance": 0.0, "bearing": 0.0, "light": 0.0}
+        if projection.exact:
+            return report
+        center = Point(projection.lat0, projection.lon0)
+        report["extent"] = max([distance(center, v) for v in self.graph.vert_dict.values()])
+        spacing = self.distance_between_green_lights
+        for e in self.graph.edges_arr:
+            if e.start.isSame(e.end):
+                continue
+            report["distance"] = max(report["distance"], abs(projection.distance(e.start, e.end) - distance(e.start, e.end)))
+            db = abs(projection.bearing(e.start, e.end) - bearing(e.start, e.end))
+            report["bearing"] = max(report["bearing"], min(db, 360 - db))
+            light = projection.destination(e.start, projection.bearing(e.start, e.end), spacing)
+            report["light"] = max(report["light"], distance(light, destination(e.start, bearing(e.start, e.end), spacing)))
+        return report
+
+    def mkHierarchies(self) -> int:
+        # Contraction hierarchies of large routing network, for routes without restriction and for strict mode routes
+        # of all aircraft width codes. Long, see compiler.
+        if len(self.graph.vert_dict) < get_global("HIERARCHY_MIN_VERTICES", self.prefs):
+            return 0
+        t0 = time.perf_counter()
+        profiles = [None]
+        for width_code in TAXIWAY_WIDTH_CODE:
+            profiles = profiles + Route.strictProfile(width_code, MOVEMENT.ARRIVAL).levels()
+        count = mkHierarchies(self.graph, profiles)
+        logger.info(f"{self.icao}: {count} routing hierarchies built in {round(time.perf_counter() - t0, 1)}s")
+        return count
+
+    def mkRouteTrees(self, aircraft, move: MOVEMENT, use_strict_mode: bool):
+        # Shortest route trees toward all destinations of move, for the profile routes of aircraft will use.
+        # Trees are built in background, first level for all destinations, trees of other profiles are dropped.
+        if not get_global("USE_ROUTE_TREES", self.prefs):
+            self.graph.trees = None
+            return
+        size = get_global("ROUTE_TREES_MAX", self.prefs)
+        if self.graph.trees is None or self.graph.trees.size != size:
+            self.graph.trees = RouteTrees(self.graph, size)
+        profile = Route.strictProfile(aircraft.width_code, move) if use_strict_mode else None
+        # destination vertices as found by Route.ends()
+        strict = profile.strict() if profile is not None else None
+        if move == MOVEMENT.DEPARTURE:
+            positions = [r.threshold if self.use_threshold else r.start for r in self.runways.values()] + list(self.holds.values())
+        else:
+            positions = list(self.ramps.values())
+        roots = []
+        for pos in positions:
+            dst = self.graph.findClosestVertex(pos, strict)
+            if dst is not None and dst[0] is not None and dst[0] not in roots:
+                roots.append(dst[0])
+        self.graph.trees.prepare(profile, roots)
+
+    def compiled(self, hierarchies: bool = False) -> dict:
+        # Airport data needed by FtG, in a form suitable for compiled cache
+        def edge_usage(e):
+            if e.usage == TAXIWAY_TYPE.RUNWAY:
+                return "runway"
+            return "taxiway" if e.width_code is None else f"taxiway_{e.width_code.value}"
+
+        def ramp_attributes(r):
+            return {a: getattr(r, a) for a in ["locationType", "aircrafts", "icaoType", "operationType", "airlines"] if hasattr(r, a)}
+
+        data = {
+            "name": self.name,
+            "altitude": self.altitude,
+            "vertices": [(v.id, v.lat, v.lon, v.usage, v.name) for v in self.graph.vert_dict.values()],
+            "edges": [
+                (e.start.id, e.end.id, e.cost, e.direction.value, edge_usage(e), e.name, [(a.active.value, ",".join(a.runways)) for a in e.active])
+                for e in self.graph.edges_arr
+            ],
+            "runways": [
+                (r.name, r.width, r.start.lat, r.start.lon, r.displaced_threshold, r.overrun, r.end.lat, r.end.lon, [p.coords() for p in r.polygon.coordinates])
+                for r in self.runways.values()
+            ],
+            "ramps": [(r.name, r.heading, r.lat, r.lon, ramp_attributes(r)) for r in self.ramps.values()],
+        }
+        if hierarchies:  # present, even if empty, when hierarchies were built
+            data["hierarchies"] = {k: h if type(h) is dict else h.compiled() for k, h in self.graph.hierarchies.items()}
+        return data
+
+    def ldCompiled(self) -> bool:
+        # Load airport from compiled cache, if compiled cache is valid
+        index = aptIndex() if get_global("USE_APT_INDEX", self.prefs) else None
+        source = locateAirport(self.icao, index)
+        if index is not None:
+            index.save()
+        if source is None:
+            return False
+        data = readCompiled(self.icao, source)
+        if data is None:
+            return False
+
+        self.name = data["name"]
+        self.altitude = data["altitude"]
+        self.scenery_pack = source
+        logger.info(f"found compiled airport {self.icao} '{self.name}' from '{source}'")
+        for vid, lat, lon, usage, name in data["vertices"]:
+            self.graph.add_vertex(vid, Point(lat, lon), usage, name)
+        for src, dst, cost, direction, usage, name, actives in data["edges"]:
+            edge = Edge(self.graph.get_vertex(src), self.graph.get_vertex(dst), cost, direction, usage, name)
+            for active, runways in actives:
+                edge.add_active(active, runways)
+            self.graph.add_edge(edge)
+        logger.info(f"added {len(self.graph.vert_dict)} nodes, {len(self.graph.edges_arr)} edges")
+        self.graph.stats()
+        if get_global("USE_ROUTING_HIERARCHY", self.prefs):
+            self.graph.hierarchies = data.get("hierarchies", {})  # decoded on first use
+            if len(self.graph.hierarchies) > 0:
+                logger.info(f"{len(self.graph.hierarchies)} routing hierarchies")
+        for name, width, lat, lon, dt, dbo, lat2, lon2, polygon in data["runways"]:
+            pol = Polygon([Point(p[0], p[1]) for p in polygon])
+            self.runways[name] = Runway(name=name, width=width, lat=lat, lon=lon, dt=dt, dbo=dbo, lat2=lat2, lon2=lon2, pol=pol)
+        logger.debug(f"runways: {self.runways.keys()}")
+        for name, heading, lat, lon, attributes in data["ramps"]:
+            ramp = Ramp(name, heading, lat, lon)
+            for a, v in attributes.items():
+                setattr(ramp, a, v)
+            self.ramps[name] = ramp
+        logger.debug(f"ramps: {self.ramps.keys()}")
+        self.loaded = True
+        return True
+
+    def setPreferences(self, prefs: dict | None = None):
+        # Set sensible default value from global preferences.
+        # Preferences can be changed after airport is prepared (prefetched airport, preferences reloaded)
+        if prefs is not None:
+            self.prefs = prefs
+        self.use_threshold = get_global("USE_THRESHOLD", self.prefs)
+        if self.use_threshold is None:
+            self.use_threshold = True
+        self.distance_between_taxiway_lights = get_global(AIRPORT.DISTANCE_BETWEEN_LIGHTS.value, self.prefs)  # meters, for show_taxiways()
+        self.distance_between_green_lights = get_global(AIRPORT.DISTANCE_BETWEEN_GREEN_LIGHTS.value, self.prefs)  # meters for follow_the_greens()
+        self.rabbit_speed = get_global(RABBIT.SPEED.value, self.prefs)  # seconds
+        self.routes.size = get_global("ROUTE_CACHE_SIZE", self.prefs)
+        # Fine tune for specific airport(s)
         # Local airport preferences override global preferences
         apt = self.prefs.get("Airports", {})
         prefs = apt.get(self.icao)
@@ -258,82 +427,52 @@ class Airport:
             self.distance_between_green_lights = apt[AIRPORT.DISTANCE_BETWEEN_GREEN_LIGHTS.value]
 
     def load(self):
-        APT_FILES = {}
-
-        # Add scenery packs, which include Global Airports scenery in XP11
-        scenery_packs_file = os.path.join(SYSTEM_DIRECTORY, "Custom Scenery", "scenery_packs.ini")
-        if os.path.exists(scenery_packs_file):
-            scenery_packs = open(scenery_packs_file, "r", encoding="utf-8", errors="ignore")
-            scenery = scenery_packs.readline()
-            scenery = scenery.strip()
-            while scenery:
-                if re.match("^SCENERY_PACK", scenery, flags=0):
-                    logger.debug(f"SCENERY_PACK {scenery.rstrip()}")
-                    scenery_pack_dir = scenery[13:-1]
-                    scenery_pack_apt = os.path.join(scenery_pack_dir, "Earth nav data", "apt.dat")
-                    # logger.debug("APT.DAT {scenery_pack_apt}")
-                    if os.path.exists(scenery_pack_apt) and os.path.isfile(scenery_pack_apt):
-                        logger.debug(f"added apt.dat {scenery_pack_apt}")
-                        APT_FILES[scenery] = scenery_pack_apt
-                scenery = scenery_packs.readline()
-            scenery_packs.close()
-
-        # Add XP 12 location for Global Airports
-        default_airports_file = os.path.join(
-            SYSTEM_DIRECTORY,
-            "Global Scenery",
-            "Global Airports",
-            "Earth nav data",
-            "apt.dat",
-        )
-        if os.path.exists(default_airports_file) and os.path.isfile(default_airports_file):
-            APT_FILES["default airports"] = default_airports_file
-        # else:
-        #     logger.warning(f"default airport file {DEFAULT_AIRPORTS} not found")
-        # logger.debug(f"APT files: {APT_FILES}")
+        APT_FILES = aptFiles()
+        index = aptIndex() if get_global("USE_APT_INDEX", self.prefs) else None
+        scanner = SCANNERS.get(get_global("APT_FILE_SCANNER", self.prefs), streamAirportMmap)
 
         for scenery, filename in APT_FILES.items():
             if self.loaded:
-                return self.loaded
+                break
 
             logger.debug(f"scenery pack {scenery.strip()}..")
-            apt_dat = open(filename, "r", encoding="utf-8", errors="ignore")
-            line = apt_dat.readline()
-
-            while not self.loaded and line:  # while we have not found our airport and there are more lines in this pack
-                if re.match("^1 ", line, flags=0):  # if it is a "startOfAirport" line
-                    newparam = line.split()  # if no characters supplied to split(), multiple space characters as one
-                    # logger.debug(f"airport: {newparam[4]}")
-                    if newparam[4] == self.icao:  # it is the airport we are looking for
-                        self.name = " ".join(newparam[5:])
-                        self.altitude = newparam[1]
-                        # Info 4.a
-                        logger.info(f"found airport {newparam[4]} '{self.name}' in '{filename}'")
-                        self.scenery_pack = filename  # remember where we found it
-                        self.lines.append(AptLine(line.strip()))  # keep first line
-                        line = apt_dat.readline()  # next line in apt.dat
-                        while line and not re.match("^1 ", line, flags=0):  # while we do not encounter a line defining a new airport...
-                            testline = AptLine(line.strip())
-                            if testline.linecode() is not None:
-                                self.lines.append(testline)
-                            else:
-                                logger.debug(f"did not load empty line '{line.strip()}'")
-                            line = apt_dat.readline()  # next line in apt.dat
-                        # Info 4.b
-                        logger.info(f"read {len(self.lines)} lines for {self.name}")
-                        self.loaded = True
-
-                if line:  # otherwize we reached the end of file
-                    line = apt_dat.readline()  # next line in apt.dat
-
-            apt_dat.close()
+            lines = index.stream(filename, self.icao) if index is not None else scanner(filename, self.icao)
+            if lines is not None:
+                self.setLines(lines, filename)
 
+        if index is not None:
+            index.save()
         return self.loaded
 
+    def setLines(self, lines, filename: str):
+        # Parse airport lines as they come, first line is airport "1 " line.
+        # Only lines FtG uses are kept, unless all lines are requested for debugging.
+        lines = iter(lines)
+        header = next(lines, None)
+        if header is None:
+            return
+        newparam = header.split()
+        self.name = " ".join(newparam[5:])
+        self.altitude = newparam[1]
+        # Info 4.a
+        logger.info(f"found airport {newparam[4]} '{self.name}' in '{filename}'")
+        self.scenery_pack = filename  # remember where we found it
+        self.records = AptRecords(codes=None if get_global("KEEP_APT_LINES", self.prefs) else ROUTING_CODES)
+        self.records.add(header)
+        for line in lines:
+            self.records.add(line)
+        # Info 4.b
+        logger.info(f"read {self.records.count} lines for {self.name}")
+        self.loaded = True
+
     def dumpAptFile(self, filename):
+        # Debugging only, needs KEEP_APT_LINES = true to get all lines
+        if self.records.codes is not None or self.records.count == 0:
+            logger.warning(f"airport lines not kept, {filename} not written (set KEEP_APT_LINES = true)")
+            return
         aptfile = open(filename, "w")
-        for line in self.lines:
-            aptfile.write(f"{line.linecode()} {line.content()}\n")
+        for record in self.records.all():
+            aptfile.write(f"{record.code} {record.content()}\n")
         aptfile.close()
 
     # def loadSmoothedTaxiwayNetwork(self):
@@ -376,21 +515,16 @@ class Airport:
     #     return True
 
     def stats(self):
-        s = {}
-        for l in self.lines:
-            if l.linecode() not in s:
-                s[l.linecode()] = 0
-            s[l.linecode()] = s[l.linecode()] + 1
-        logger.debug(f"airport apt.dat {len(self.lines)} lines: {dict(sorted(s.items()))}")
+        logger.debug(f"airport apt.dat {self.records.count} lines: {self.records.stats()}")
 
     # Collect 1201 and (102,1204) line codes and create routing network (graph) of taxiways
     def mkRoutingNetwork(self):
         # 1201  25.29549372  051.60759816 both 16 unnamed entity(split)
-        def addVertex(aptline):
-            args = aptline.content().split()
+        def addVertex(record):
+            args = record.args
             return self.graph.add_vertex(args[3], Point(args[0], args[1]), args[2], " ".join(args[3:]))
 
-        vertexlines = list(filter(lambda x: x.linecode() == 1201, self.lines))
+        vertexlines = self.records.get(1201)
         v = list(map(addVertex, vertexlines))
         logger.debug(f"added {len(v)} vertices")
 
@@ -400,32 +534,28 @@ class Airport:
         # 1204 ils 16L,34R
         edgeCount = 0  # just for info
         edgeActiveCount = 0
-        edge = None
-        for aptline in self.lines:
-            if aptline.linecode() == 1202:  # edge
-                args = aptline.content().split()
-                if len(args) >= 4:
-                    src = self.graph.get_vertex(args[0])
-                    dst = self.graph.get_vertex(args[1])
-                    cost = distance(src, dst)
-                    edge = None
-                    if len(args) == 5:
-                        edge = Edge(src, dst, cost, args[2], args[3], args[4])
-                    else:
-                        edge = Edge(src, dst, cost, args[2], args[3], "")
-                    self.graph.add_edge(edge)
-                    edgeCount += 1
-                else:
-                    logger.debug(f"not enough params {aptline.linecode()} {aptline.content()}")
-            elif aptline.linecode() == 1204 and edge is not None:
-                args = aptline.content().split()
+        for record in self.records.get(1202):  # edge
+            args = record.args
+            if len(args) < 4:
+                logger.debug(f"not enough params {record.code} {record.content()}")
+                continue
+            src = self.graph.get_vertex(args[0])
+            dst = self.graph.get_vertex(args[1])
+            cost = distance(src, dst)
+            edge = None
+            if len(args) == 5:
+                edge = Edge(src, dst, cost, args[2], args[3], args[4])
+            else:
+                edge = Edge(src, dst, cost, args[2], args[3], "")
+            self.graph.add_edge(edge)
+            edgeCount += 1
+            for active in record.details or []:  # 1204
+                args = active.args
                 if len(args) >= 2:
                     edge.add_active(args[0], args[1])
                     edgeActiveCount += 1
                 else:
-                    logger.debug(f"not enough params {aptline.linecode()} {aptline.content()}")
-            else:
-                edge = None
+                    logger.debug(f"not enough params {active.code} {active.content()}")
 
         # Info 6
         self.stats()
@@ -438,12 +568,11 @@ class Airport:
         # 100 60.00 1 1 0.25 1 3 0 16L  25.29609337  051.60889908    0  300 2 2 1 0 34R  25.25546269  051.62677745    0  306 3 2 1 0
         runways = {}
 
-        for aptline in self.lines:
-            if aptline.linecode() == 100:  # runway
-                args = aptline.content().split()
-                runway = Polygon.new(lat1=args[8], lon1=args[9], lat2=args[17], lon2=args[18], width=float(args[0]))
-                runways[args[7]] = Runway(name=args[7], width=args[0], lat=args[8], lon=args[9], dt=args[10], dbo=args[11], lat2=args[17], lon2=args[18], pol=runway)
-                runways[args[16]] = Runway(name=args[16], width=args[0], lat=args[17], lon=args[18], dt=args[19], dbo=args[20], lat2=args[8], lon2=args[9], pol=runway)
+        for record in self.records.get(100):  # runway
+            args = record.args
+            runway = Polygon.new(lat1=args[8], lon1=args[9], lat2=args[17], lon2=args[18], width=float(args[0]))
+            runways[args[7]] = Runway(name=args[7], width=args[0], lat=args[8], lon=args[9], dt=args[10], dbo=args[11], lat2=args[17], lon2=args[18], pol=runway)
+            runways[args[16]] = Runway(name=args[16], width=args[0], lat=args[17], lon=args[18], dt=args[19], dbo=args[20], lat2=args[8], lon2=args[9], pol=runway)
 
         self.runways = runways
         logger.debug(f"added {len(runways.keys())} runways")
@@ -467,24 +596,21 @@ class Airport:
         # 1202 ignored.
         ramps = {}
 
-        ramp = False
-        for aptline in self.lines:
-            if aptline.linecode() == 1300:  # ramp
-                args = aptline.content().split()
-                if args[3] != "misc":
-                    rampName = " ".join(args[5:])
-                    ramp = Ramp(rampName, args[2], args[0], args[1])
-                    ramp.locationType = args[3]
-                    ramp.aircrafts = args[4].split("|")
-                    ramps[rampName] = ramp
-            elif ramp and aptline.linecode() == 1301:  # ramp details
-                args = aptline.content().split()
+        for record in self.records.get(1300):  # ramp
+            args = record.args
+            if args[3] == "misc":
+                continue
+            rampName = " ".join(args[5:])
+            ramp = Ramp(rampName, args[2], args[0], args[1])
+            ramp.locationType = args[3]
+            ramp.aircrafts = args[4].split("|")
+            ramps[rampName] = ramp
+            for details in record.details or []:  # 1301 ramp details
+                args = details.args
                 ramp.icaoType = args[0]
                 ramp.operationType = args[1]
                 if len(args) > 2 and args[2] != "":
                     ramp.airlines = args[2].split(",")
-            else:
-                ramp = False
 
         self.ramps = ramps
         logger.debug(f"added {len(ramps.keys())} ramps")
@@ -507,9 +633,9 @@ class Airport:
     def findClosestRamp(self, coord):
         closest = None
         shortest = math.inf
-        point = Point(coord[0], coord[1])
+        lat, lon = math.radians(coord[0]), math.radians(coord[1])
         for name, ramp in self.ramps.items():
-            d = distance(ramp, point)
+            d = distanceRad(ramp.rlat, ramp.rlon, lat, lon)
             if d < shortest:
                 shortest = d
                 closest = name
@@ -636,7 +762,8 @@ class Airport:
                 return (False, f"We could not find stand {destination}.")
             dst_type = "stand"
 
-        route = Route.Find(self.graph, aircraft, arrival_runway, dst_pos, dst_type, move, use_strict_mode, self.use_threshold)
+        route = Route.Find(self.graph, aircraft, arrival_runway, dst_pos, dst_type, move, use_strict_mode, self.use_threshold, self.routes)
+        logger.debug(f"route cache: {self.routes.stats()}")
 
         if route.found():
             route.runway = arrival_runway
@@ -704,14 +831,14 @@ class Airport:
         # Returns ATC ground frequency if it exists
         self.atc_ground = None
 
-        for line in self.lines:
-            linecode = line.linecode()
-            if linecode == "1053" and self.atc_ground is None:
-                a = line.content().split()
-                self.atc_ground = a[2] / 1000
-            elif linecode == "53" and self.atc_ground is None:
-                a = line.content().split()
-                self.atc_ground = a[2] / 1000
+        # 1053 121900 GND, frequency in kHz
+        for record in self.records.get(1053):
+            self.atc_ground = int(record.args[0]) / 1000
+            return self.atc_ground
+        # 53 12190 GND, older format, frequency in 10 kHz
+        for record in self.records.get(53):
+            self.atc_ground = int(record.args[0]) / 100
+            return self.atc_ground
 
         return self.atc_ground
 
@@ -721,13 +848,50 @@ class Airport:
 
     # Returns all lines with supplied linecode
     def getLines(self, code):
-        return list(filter(lambda x: x.linecode() == code, self.lines))
+        return self.records.get(code)
+
+
+class RouteCache:
+    # Routes found, least recently used first, keyed by route ends, routing profile and algorithm
+    def __init__(self, size: int = 0):
+        self.size = size
+        self.routes = OrderedDict()  # {(src, dst, profile, algorithm): [vertex ids] or None if no route}
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> str:
+        return f"hits={self.hits}, misses={self.misses}, {len(self.routes)} routes"
+
+    def get(self, key: tuple) -> tuple:
+        # Returns (True, route) if key in cache, (False, None) otherwise
+        if key in self.routes:
+            self.routes.move_to_end(key)
+            self.hits = self.hits + 1
+            route = self.routes[key]
+            return True, list(route) if route is not None else None
+        self.misses = self.misses + 1
+        return False, None
+
+    def add(self, key: tuple, route: list | None):
+        if self.size <= 0:
+            return
+        self.routes[key] = list(route) if route is not None else None
+        self.routes.move_to_end(key)
+        while len(self.routes) > self.size:
+            self.routes.popitem(last=False)
+
+    def clear(self):
+        self.routes.clear()
+        self.hits = 0
+        self.misses = 0
 
 
 class Route:
-    # Container for route from src to dst on graph
-    def __init__(self, graph):
+    # Container for route from src to dst on graph, using edges allowed by profile if any
+    def __init__(self, graph, profile: RoutingProfile | None = None, cache: RouteCache | None = None):
         self.graph = graph
+        self.profile = profile
+        self.cache = cache
         self.route = []
         self.vertices = None
         self.edges = None
@@ -764,21 +928,75 @@ class Route:
             else:
                 f["properties"]["marker-color"] = "#00FF00"  # green
             features.append(f)
-            e = self.graph.get_edge(self.route[i], self.route[i + 1])
+            e = self.graph.get_edge(self.route[i], self.route[i + 1], self.profile)
             e.setProp("index", i)
             features.append(e.feature())
         return features
 
     def _find(self, src, dst) -> bool:
-        # If requested to try AStar, try it first, if failed, try Dijkstra
-        # If Dijstra fails, we really can't do anything about it.
+        # Routes already found are taken from cache
+        if self.cache is None or self.cache.size <= 0:
+            return self._search(src, dst)
+        key = (src, dst, str(self.profile) if self.profile is not None else None, self.algorithm)
+        cached, self.route = self.cache.get(key)
+        if cached:
+            logger.info("..found (cache)" if self.found() else "..failed (cache)")
+            return self.found()
+        found = self._search(src, dst)
+        self.cache.add(key, self.route if found else None)
+        return found
+
+    def _search(self, src, dst) -> bool:
+        # Routing methods are tried in this order, the first one available gives the route:
+        # 1. route cache, see _find(),
+        # 2. shortest route trees toward dst, only if already built, a miss queues them for the worker thread,
+        # 3. contraction hierarchies, if built for all searches needed,
+        # 4. AStar (AStarRelaxed for relaxed profile) on compact graph, on graph if there is no compact graph,
+        # 5. Dijkstra, if requested.
+        # AStar explores all reachable vertices before it fails, Dijkstra would not find a route either.
+        # If it fails, we really can't do anything about it.
+        if self.graph.trees is not None:
+            built, self.route = self.graph.trees.lookup(src, dst, self.profile)
+            if built:
+                logger.info("..found (route tree)" if self.found() else "..failed (route tree)")
+                return self.found()
+        found = self._findHierarchy(src, dst)
+        if found is not None:
+            return found
+        # AStar searches run on compact graph when available, same routes.
+        searcher = self.graph.compact if self.graph.compact is not None else self.graph
+        # Restrictions of relaxed profile can only be broken by AStar.
+        if self.profile is not None and self.profile.relaxed:
+            self.route = searcher.AStarRelaxed(src, dst, self.profile)
+            return self.found()
         if self.algorithm == ROUTING_ALGORITHMS.ASTAR:
-            self.route = self.graph.AStar(src, dst)
-            logger.info(f"..failed to find route using algorithm {self.algorithm}, will try algorithm Dijkstra..")
+            self.route = searcher.AStar(src, dst, profile=self.profile)
+            if not self.found():
+                logger.info(f"..failed to find route using algorithm {self.algorithm}")
             return self.found()
-        self.route = self.graph.Dijkstra(src, dst)
+        self.route = self.graph.Dijkstra(src, dst, profile=self.profile)
         return self.found()
 
+    def _findHierarchy(self, src, dst) -> bool | None:
+        # Returns None if graph does not have the hierarchies needed, whether route was found otherwise.
+        # Relaxed search is replaced by successive searches with less restrictions.
+        if len(self.graph.hierarchies) == 0:
+            return None
+        profiles = self.profile.levels() if self.profile is not None and self.profile.relaxed else [self.profile]
+        hierarchies = [findHierarchy(self.graph, p) for p in profiles]
+        if None in hierarchies:
+            return None
+        searched = []
+        for hierarchy in hierarchies:
+            if hierarchy in searched:  # profiles with same edges allowed
+                continue
+            searched.append(hierarchy)
+            self.route = hierarchy.route(src, dst)
+            if self.found():
+                logger.info("..found (hierarchy)")
+                return True
+        return False
+
     def found(self) -> bool:
         return self.route is not None and len(self.route) > 2
 
@@ -802,7 +1020,7 @@ class Route:
         # note: edges[k] starts at vertices[k]
         self.edges = []
         for i in range(len(self.route) - 1):
-            e = self.graph.get_edge(self.route[i], self.route[i + 1])
+            e = self.graph.get_edge(self.route[i], self.route[i + 1], self.profile)
             v = self.graph.get_vertex(self.route[i])
             v.setProp("taxiway-width", e.width_code.value if e.width_code is not None else "-")
             v.setProp("ls", i)
@@ -817,7 +1035,7 @@ class Route:
         self.dleft = []
         for i in range(len(self.route) - 1, 0, -1):
             self.dleft.append(total)
-            e = self.graph.get_edge(self.route[i - 1], self.route[i])
+            e = self.graph.get_edge(self.route[i - 1], self.route[i], self.profile)
             total = total + e.cost
         self.dleft.append(total)
         self.dleft.reverse()
@@ -917,6 +1135,19 @@ class Route:
         #     logger.debug(f"taxi route {route_str}")
         return route_str
 
+    @classmethod
+    def strictProfile(cls, width_code, move: MOVEMENT) -> RoutingProfile:
+        # Relaxed profile of strict mode
+        return RoutingProfile(
+            width_code=width_code,
+            move=move,
+            respect_width=True,
+            respect_inner=False,  # unused anyway
+            use_runway=False,  # forced, otherwise wierd things happen
+            respect_oneway=True,
+            relaxed=True,
+        )
+
     @classmethod
     def Find(
         cls,
@@ -928,108 +1159,25 @@ class Route:
         move: MOVEMENT,
         use_strict_mode: bool,
         use_threshold: bool,
+        cache: RouteCache | None = None,
     ):
         # Returns first route that works, or a route that does not work
         if use_strict_mode:
+            # Single search where restrictions can be broken, from least to most important:
+            # respect one ways, do not use runways, respect width code. Inner/outer is not used.
+            # Route is the shortest route among routes that break the least important restrictions.
             logger.info("searching restricted route..")
-            width_code = aircraft.width_code
-            for respect_width_code in [True, False]:
-                wc = "Y" if respect_width_code else "N"
-                # WY/IY/RY/OY = respect_width/respect_inner/user_runway/respect_one_way
-
-                cannot_use_runway = True  # forced, otherwise wierd things happen
-                # cannot_use_runway = arrival_runway is None
-
-                if cannot_use_runway:
-                    # Strict, do not use runways, respect oneway, respect inner/outer
-                    # subgraph = graph.clone(
-                    #     width_code=width_code,
-                    #     move=move,
-                    #     respect_width=respect_width_code,
-                    #     respect_inner=True
-                    #     use_runway=False,
-                    #     respect_oneway=True,
-                    # )
-                    # route = cls(subgraph)
-                    # if route.find(aircraft, arrival_runway, dst_pos, dst_type, move, use_threshold=use_threshold):
-                    #     logger.info(f"..found/W{wc}IYRNOY")
-                    #     return route
-                    # logger.debug("..failed..")
-
-                    # do not use runways, respect oneway
-                    subgraph = graph.clone(
-                        width_code=width_code,
-                        move=move,
-                        respect_width=respect_width_code,
-                        respect_inner=False,  # unused anyway
-                        use_runway=False,
-                        respect_oneway=True,
-                    )
-                    route = cls(subgraph)
-                    if route.find(aircraft, arrival_runway, dst_pos, dst_type, move, use_threshold=use_threshold):
-                        logger.info(f"..found/W{wc}INRNOY")
-                        return route
-                    logger.debug("..failed..")
-                    # Alternative:
-                    # route = Route.Find(subgraph, aircraft, arrival_runway, dst_pos, dst_type, move, use_strict_mode=False, use_threshold=use_threshold)
-                    # if route.found():
-                    #     logger.info(f"..found/W{wc}INRNOY")
-                    #     return route
-                    # logger.debug("..failed..")
-
-                    # do not respect one ways
-                    subgraph = graph.clone(
-                        width_code=width_code,
-                        move=move,
-                        respect_width=respect_width_code,
-                        respect_inner=False,  # unused anyway
-                        use_runway=False,
-                        respect_oneway=False,
-                    )
-                    route = cls(subgraph)
-                    if route.find(aircraft, arrival_runway, dst_pos, dst_type, move, use_threshold=use_threshold):
-                        logger.info(f"..found/W{wc}INRNON")
-                        return route
-                    logger.debug("..failed..")
-                else:
-                    logger.debug("runway can be used while taxiing, probably because we are on a runway")
-
-                # use runway
-                subgraph = graph.clone(
-                    width_code=width_code,
-                    move=move,
-                    respect_width=respect_width_code,
-                    respect_inner=False,  # unused anyway
-                    use_runway=True,
-                    respect_oneway=True,
-                )
-                route = cls(subgraph)
-                if route.find(aircraft, arrival_runway, dst_pos, dst_type, move, use_threshold=use_threshold):
-                    logger.info(f"..found/W{wc}INRYOY")
-                    return route
-                logger.debug("..failed..")
-
-                # do not respect one ways
-                subgraph = graph.clone(
-                    width_code=width_code,
-                    move=move,
-                    respect_width=respect_width_code,
-                    respect_inner=False,  # unused anyway
-                    use_runway=True,
-                    respect_oneway=False,
-                )
-                route = cls(subgraph)
-                if route.find(aircraft, arrival_runway, dst_pos, dst_type, move, use_threshold=use_threshold):
-                    logger.info(f"..found/W{wc}INRYON")
-                    return route
-
-            # We're desperate
-            logger.info("..failed to find restricted route, trying wide search..")
-        else:
-            logger.info("searching route without restriction..")
+            profile = cls.strictProfile(aircraft.width_code, move)
+            route = cls(graph, profile, cache)
+            if route.find(aircraft, arrival_runway, dst_pos, dst_type, move, use_threshold=use_threshold):
+                logger.info(f"..found/{profile.tag(graph, route.route)}")
+                return route
+            # Everything was allowed, route cannot be found
+            logger.info("..failed (definitively)")
+            return route
 
-        # else, default on whole graph
-        route = cls(graph)
+        logger.info("searching route without restriction..")
+        route = cls(graph, cache=cache)
         if route.find(aircraft, arrival_runway, dst_pos, dst_type, move, use_threshold):
             logger.info("..found")
         else:
@@ -1037,29 +1185,45 @@ class Route:
         return route
 
     def find(self, aircraft, arrival_runway: Runway | None, dst_pos: Runway | Ramp | Hold, dst_type: str, move: MOVEMENT, use_threshold: bool) -> bool:
+        # With a relaxed profile, route ends are first searched on edges allowed by the strict profile,
+        # route then starts and ends on edges that respect restrictions whenever possible.
+        profile = self.profile.strict() if self.profile is not None else None
+        ends = self.ends(aircraft, arrival_runway, dst_pos, dst_type, move, use_threshold, profile)
+        if ends is not None and self._find(ends[0], ends[1]):
+            return True
+        if profile is self.profile:
+            return self.found()
+        logger.debug("..no route from restricted ends, trying relaxed ends..")
+        relaxed = self.ends(aircraft, arrival_runway, dst_pos, dst_type, move, use_threshold, self.profile)
+        if relaxed is None or relaxed == ends:  # would fail again
+            return self.found()
+        return self._find(relaxed[0], relaxed[1])
+
+    def ends(self, aircraft, arrival_runway: Runway | None, dst_pos: Runway | Ramp | Hold, dst_type: str, move: MOVEMENT, use_threshold: bool, profile: RoutingProfile | None) -> tuple | None:
+        # Returns (source vertex, destination vertex) of route on edges allowed by profile, None if not found
         # From aircraft position..
         pos = aircraft.position()
         if not pos:
             logger.debug("plane could not be located")
-            return self.found()
+            return None
         pos_pt = Point(pos[0], pos[1])
         self.precise_start = pos_pt
         logger.debug(f"..got starting position {pos}..")
 
         src = None
         if move == MOVEMENT.DEPARTURE:
-            src = self.graph.findClosestVertex(pos_pt)
+            src = self.graph.findClosestVertex(pos_pt, profile)
         else:  # arrival
             brng = aircraft.heading()
             speed = aircraft.speed()
             logger.debug(f"arrival: trying vertex ahead {brng}, {speed}")
-            src = self.graph.findClosestVertexAheadGuess(pos_pt, brng, speed)
+            src = self.graph.findClosestVertexAheadGuess(pos_pt, brng, speed, profile)
             if src is None or src[0] is None:  # tries a less constraining search...
                 logger.debug("no vertex ahead")
-                src = self.graph.findClosestVertex(pos_pt)
+                src = self.graph.findClosestVertex(pos_pt, profile)
             if arrival_runway is not None and dst_type == "stand":
                 if dst_pos is not None:
-                    nextexit = arrival_runway.nextExit(graph=self.graph, position=pos_pt, destination=dst_pos)
+                    nextexit = arrival_runway.nextExit(graph=self.graph, position=pos_pt, destination=dst_pos, profile=profile)
                     if nextexit is not None:
                         src = nextexit
                         logger.debug(f"Arrival: on runway {arrival_runway.name}, closest exit vertex in front is {nextexit[0]}")
@@ -1069,13 +1233,13 @@ class Route:
 
         if src is None:
             logger.debug("no return from findClosestVertex")
-            return self.found()
+            return None
         if src[0] is None:
             logger.debug("no close vertex")
-            return self.found()
+            return None
         if src[1] > TOO_FAR:
             logger.debug(f"aircraft too far from taxiways ({round(src[1], 2)}m)")
-            return self.found()
+            return None
         logger.debug("..got starting vertex..")
 
         # ..to destination
@@ -1084,35 +1248,35 @@ class Route:
             if dst_type == "runway":
                 if use_threshold:
                     logger.debug("departure destination: using runway threshold")
-                    dst = self.graph.findClosestVertex(dst_pos.threshold)
+                    dst = self.graph.findClosestVertex(dst_pos.threshold, profile)
                     self.precise_end = dst_pos.threshold
                 else:
                     logger.debug("departure destination: using end of runway")
-                    dst = self.graph.findClosestVertex(dst_pos.start)
+                    dst = self.graph.findClosestVertex(dst_pos.start, profile)
                     self.precise_end = dst_pos.start
             elif dst_type == "hold":
-                dst = self.graph.findClosestVertex(dst_pos)
+                dst = self.graph.findClosestVertex(dst_pos, profile)
                 self.precise_end = dst_pos
             else:
                 logger.warning("departure destination is not a runway or a hold position")
         else:  # arrival, dst_type == "stand"
             if dst_type != "stand":
                 logger.warning("arrival destination is not a stand")
-            dst = self.graph.findClosestVertex(dst_pos)
+            dst = self.graph.findClosestVertex(dst_pos, profile)
             self.precise_end = dst_pos
 
         if dst is None:
             logger.debug("no return from findClosestVertex")
-            return self.found()
+            return None
         if dst[0] is None:
             logger.debug("no close vertex")
-            return self.found()
+            return None
         if dst[1] > TOO_FAR:
             logger.debug(f"aircraft too far from taxiways ({round(dst[1], 2)}m)")
-            return self.found()
+            return None
         logger.debug("..got destination vertex..")
 
-        return self._find(src[0], dst[0])
+        return src[0], dst[0]
 
     def progress(self, position, edge, dist_to_travel: float):  # -> Point, bearing, finished
         # position is on edge.
@@ -1140,19 +1304,20 @@ class Route:
         logger.log(9, f"at route index {i}")
 
         # must project position on edge
-        pos_on_edge, dist = nearestPointToLines(position, [edge])
+        projection = self.graph.projection
+        pos_on_edge, dist = nearestPointToLine(position, edge) or [None, math.inf]
         if pos_on_edge is None:
             logger.log(9, "could not position on edge")
             pos_on_edge = position
         else:
             logger.log(9, f"position on edge at {round(dist, 1)}m")
-        d = distance(pos_on_edge, edge_end)  # distance remaning on edge
+        d = projection.distance(pos_on_edge, edge_end)  # distance remaning on edge
         logger.log(9, f"on route edge {i} {edge.start.id}-{edge.end.id}{rev},length={round(edge.cost, 1)}m), at {round(d, 1)}m from edge end")
 
         # 2. travel on same edge..
         if distance_left < d:  # moving on edge only
             logger.log(9, f"travelling {round(distance_left, 1)}m on same edge, remaining {round(d - distance_left, 1)} to end of edge")
-            newpos = destination(pos_on_edge, edge_bearing, distance_left)
+            newpos = projection.destination(pos_on_edge, edge_bearing, distance_left)
             logger.log(9, f"reached destination on edge at {newpos.coords()}, {round(edge_bearing)}")
             return newpos, edge_bearing, False
 
@@ -1186,7 +1351,7 @@ class Route:
             9,
             f"need to travel {round(distance_left, 1)}m on edge {i} ({rev}length={round(self.edges[i].cost, 1)}, bearing={round(hdg)}), remaining {round(self.edges[i].cost - distance_left, 1)}m to travel on edge",
         )
-        newpos = destination(edge_start, hdg, distance_left)
+        newpos = projection.destination(edge_start, hdg, distance_left)
         logger.log(9, f"reached destination at {newpos.coords()}, {round(hdg)}")
 
         return newpos, hdg, False
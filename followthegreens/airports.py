@@ -0,0 +1,110 @@
+# Prepared airports cache
+# Airports are expensive to prepare. Prepared airports are kept in a process-wide cache
+# shared by Follow the greens, Show taxiways and airport prefetch.
+# Least recently used airports are evicted when the approximate memory used by cached airports
+# exceeds the budget. Most recently used airport is always kept.
+#
+import threading
+from collections import OrderedDict
+
+from .globals import logger, get_global
+from .airport import Airport
+
+# Approximate memory used by prepared airport elements, in bytes, measured on large airports
+VERTEX_EDGE_SIZE = 600  # per vertex or edge of routing network
+FEATURE_SIZE = 2000  # per runway or ramp
+
+
+def airportSize(airport: Airport) -> int:
+    # Approximate memory used by prepared airport, in bytes
+    return VERTEX_EDGE_SIZE * (len(airport.graph.vert_dict) + len(airport.graph.edges_arr)) + FEATURE_SIZE * (len(airport.runways) + len(airport.ramps))
+
+
+class AirportCache:
+
+    def __init__(self):
+        self.airports = OrderedDict()  # {icao: Airport}, least recently used first
+        self.sizes = {}
+        self.loading = {}  # {icao: threading.Event} airports being prepared
+        self.lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def size(self) -> int:
+        return sum(self.sizes.values())
+
+    def stats(self) -> str:
+        return f"hits={self.hits}, misses={self.misses}, evictions={self.evictions}, {len(self.airports)} airports, ~{round(self.size / 1048576, 1)}MB"
+
+    def get(self, icao: str, prefs: dict = {}) -> list:
+        # Returns [airport, status], airport is None if it could not be prepared.
+        # Airport is prepared if not in cache. If it is being prepared by another thread, waits for it.
+        icao = icao.upper()
+        while True:
+            with self.lock:
+                airport = self.airports.get(icao)
+                if airport is not None:
+                    self.airports.move_to_end(icao)
+                    self.hits = self.hits + 1
+                    logger.info(f"airport cache hit {icao} ({self.stats()})")
+                    airport.setPreferences(prefs)  # preferences may have changed since airport was prepared
+                    return [airport, [True, "Airport ready"]]
+                loading = self.loading.get(icao)
+                if loading is None:
+                    loading = threading.Event()
+                    self.loading[icao] = loading
+                    self.misses = self.misses + 1
+                    break
+            logger.debug(f"waiting for {icao} being prepared..")
+            loading.wait()
+            if icao not in self.airports:  # could not be prepared
+                return [None, [False, f"We could not prepare airport {icao}."]]
+
+        logger.info(f"airport cache miss {icao} ({self.stats()})")
+        try:
+            airport = Airport(icao=icao, prefs=prefs)
+            status = airport.prepare()  # [ok, errmsg]
+            if status[0]:
+                self.add(airport)
+            else:
+                airport = None
+        except:
+            logger.warning(f"airport {icao} could not be prepared", exc_info=True)
+            airport = None
+            status = [False, f"We could not prepare airport {icao}."]
+        finally:
+            with self.lock:
+                self.loading.pop(icao, None)
+            loading.set()
+        return [airport, status]
+
+    def add(self, airport: Airport):
+        with self.lock:
+            self.airports[airport.icao] = airport
+            self.airports.move_to_end(airport.icao)
+            self.sizes[airport.icao] = airportSize(airport)
+            self.evict(get_global("AIRPORT_CACHE_SIZE", airport.prefs) * 1048576)
+
+    def evict(self, budget: int):
+        with self.lock:
+            while self.size > budget and len(self.airports) > 1:
+                icao, airport = self.airports.popitem(last=False)
+                self.sizes.pop(icao, None)
+                self.evictions = self.evictions + 1
+                logger.info(f"airport cache evicted {icao} ({self.stats()})")
+
+    def clear(self):
+        with self.lock:
+            self.airports.clear()
+            self.sizes.clear()
+            logger.debug("airport cache cleared")
+
+
+AIRPORT_CACHE = AirportCache()
+
+
+def airportCache() -> AirportCache:
+    # Shared cache instance
+    return AIRPORT_CACHE
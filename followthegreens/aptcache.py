@@ -0,0 +1,72 @@
+# Compiled airport cache
+# Keeps airport data FtG needs (routing network, runways, ramps) in a binary file per airport,
+# so that airport can be prepared without reading its apt.dat file.
+# A compiled airport is valid as long as the apt.dat file it was compiled from did not change.
+#
+import os
+import sys
+import marshal
+
+from .aptdat import CACHE_DIRECTORY
+from .globals import logger
+
+COMPILED_DIRECTORY = os.path.join(CACHE_DIRECTORY, "airports")
+COMPILED_EXTENSION = ".ftgc"
+COMPILED_VERSION = 1  # increase when content of compiled airport changes
+
+
+def compiledFileName(icao: str) -> str:
+    return os.path.join(COMPILED_DIRECTORY, icao + COMPILED_EXTENSION)
+
+
+def compiledKey(source: str) -> dict | None:
+    # Compiled airport is keyed by the apt.dat file it was compiled from and its modification time.
+    # marshal format may change between python versions, so python version is part of the key.
+    try:
+        st = os.stat(source)
+    except OSError:
+        return None
+    return {
+        "version": COMPILED_VERSION,
+        "python": list(sys.version_info[:2]),
+        "source": source,
+        "mtime": st.st_mtime,
+        "size": st.st_size,
+    }
+
+
+def readCompiled(icao: str, source: str) -> dict | None:
+    # Returns compiled airport data if it exists and is valid for source, None otherwise
+    fn = compiledFileName(icao)
+    if not os.path.exists(fn):
+        logger.debug(f"no compiled airport for {icao}")
+        return None
+    key = compiledKey(source)
+    try:
+        with open(fn, "rb") as fp:
+            data = marshal.loads(fp.read())
+    except:
+        logger.warning(f"compiled airport {fn} could not be read", exc_info=True)
+        return None
+    if key is None or data.get("key") != key:
+        logger.debug(f"compiled airport for {icao} is outdated ({data.get('key')} vs {key})")
+        return None
+    return data
+
+
+def writeCompiled(icao: str, source: str, data: dict) -> bool:
+    key = compiledKey(source)
+    if key is None:
+        return False
+    fn = compiledFileName(icao)
+    try:
+        os.makedirs(COMPILED_DIRECTORY, exist_ok=True)
+        tmp = fn + ".tmp"
+        with open(tmp, "wb") as fp:
+            fp.write(marshal.dumps(data | {"key": key}))
+        os.replace(tmp, fn)
+    except:
+        logger.warning(f"compiled airport {fn} could not be saved", exc_info=True)
+        return False
+    logger.debug(f"compiled airport saved in {fn}")
+    return True
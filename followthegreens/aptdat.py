@@ -0,0 +1,378 @@
+# apt.dat files utility functions and classes
+# Locates apt.dat files in scenery packs, in scenery pack priority order,
+# and maintains a persistent index of airports found in each of them.
+#
+import os
+import re
+import json
+import mmap
+import threading
+
+from .globals import logger, APT_SCANNER
+
+SYSTEM_DIRECTORY = "."
+
+CACHE_DIRECTORY = os.path.join(SYSTEM_DIRECTORY, "Output", "caches", "followthegreens")
+INDEX_FILE_NAME = "ftg_aptindex.json"
+INDEX_VERSION = 1
+
+
+def aptFiles() -> dict:
+    # Returns {scenery: apt.dat file} in scenery pack priority order,
+    # first scenery pack has highest priority, default airports come last.
+    APT_FILES = {}
+
+    # Add scenery packs, which include Global Airports scenery in XP11
+    scenery_packs_file = os.path.join(SYSTEM_DIRECTORY, "Custom Scenery", "scenery_packs.ini")
+    if os.path.exists(scenery_packs_file):
+        scenery_packs = open(scenery_packs_file, "r", encoding="utf-8", errors="ignore")
+        scenery = scenery_packs.readline()
+        scenery = scenery.strip()
+        while scenery:
+            if re.match("^SCENERY_PACK", scenery, flags=0):
+                logger.debug(f"SCENERY_PACK {scenery.rstrip()}")
+                scenery_pack_dir = scenery[13:-1]
+                scenery_pack_apt = os.path.join(scenery_pack_dir, "Earth nav data", "apt.dat")
+                # logger.debug("APT.DAT {scenery_pack_apt}")
+                if os.path.exists(scenery_pack_apt) and os.path.isfile(scenery_pack_apt):
+                    logger.debug(f"added apt.dat {scenery_pack_apt}")
+                    APT_FILES[scenery] = scenery_pack_apt
+            scenery = scenery_packs.readline()
+        scenery_packs.close()
+
+    # Add XP 12 location for Global Airports
+    default_airports_file = os.path.join(
+        SYSTEM_DIRECTORY,
+        "Global Scenery",
+        "Global Airports",
+        "Earth nav data",
+        "apt.dat",
+    )
+    if os.path.exists(default_airports_file) and os.path.isfile(default_airports_file):
+        APT_FILES["default airports"] = default_airports_file
+    # else:
+    #     logger.warning(f"default airport file {DEFAULT_AIRPORTS} not found")
+    # logger.debug(f"APT files: {APT_FILES}")
+    return APT_FILES
+
+
+def findAirportReadline(filename: str, icao: str) -> list | None:
+    # Returns lines of airport block in apt.dat file, None if not in file.
+    # Reads file line by line.
+    apt_dat = open(filename, "r", encoding="utf-8", errors="ignore")
+    line = apt_dat.readline()
+    lines = None
+
+    while lines is None and line:  # while we have not found our airport and there are more lines in this pack
+        if re.match("^1 ", line, flags=0):  # if it is a "startOfAirport" line
+            newparam = line.split()  # if no characters supplied to split(), multiple space characters as one
+            # logger.debug(f"airport: {newparam[4]}")
+            if newparam[4] == icao:  # it is the airport we are looking for
+                lines = [line]  # keep first line
+                line = apt_dat.readline()  # next line in apt.dat
+                while line and not re.match("^1 ", line, flags=0):  # while we do not encounter a line defining a new airport...
+                    lines.append(line)
+                    line = apt_dat.readline()  # next line in apt.dat
+
+        if line:  # otherwize we reached the end of file
+            line = apt_dat.readline()  # next line in apt.dat
+
+    apt_dat.close()
+    return lines
+
+
+def airportHeaders(buf):
+    # Iterates over airport "1 " lines in buffer (bytes or mmap), yields (icao, offset, length),
+    # where offset and length are those of the whole airport block.
+    # An airport block starts at its "1 " line and ends before the next "1 " line
+    # (or at the end of the buffer).
+    size = len(buf)
+    start = 0 if buf[:2] == b"1 " else buf.find(b"\n1 ")
+    if start > 0:
+        start = start + 1
+    while start >= 0:
+        eol = buf.find(b"\n", start)
+        if eol < 0:
+            eol = size
+        args = buf[start:eol].split()
+        icao = args[4].decode("utf-8", errors="ignore") if len(args) > 4 else None
+        end = buf.find(b"\n1 ", eol - 1)
+        end = size if end < 0 else end + 1
+        yield icao, start, end - start
+        start = end if end < size else -1
+
+
+def findBlockMmap(filename: str, icao: str) -> list | None:
+    # Returns [offset, length] of airport block in apt.dat file, None if not in file.
+    # Memory-maps file and only looks at airport "1 " lines.
+    if os.path.getsize(filename) == 0:
+        return None
+    with open(filename, "rb") as apt_dat:
+        with mmap.mmap(apt_dat.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            for name, offset, length in airportHeaders(buf):
+                if name == icao:
+                    return [offset, length]
+    return None
+
+
+def findAirportMmap(filename: str, icao: str) -> list | None:
+    # Returns lines of airport block in apt.dat file, None if not in file.
+    # Only airport block found is read and decoded.
+    loc = findBlockMmap(filename, icao)
+    if loc is None:
+        return None
+    return readAirport(filename, loc[0], loc[1])
+
+
+def streamAirportMmap(filename: str, icao: str):
+    # Returns line iterator over airport block in apt.dat file, None if not in file.
+    loc = findBlockMmap(filename, icao)
+    if loc is None:
+        return None
+    return streamAirport(filename, loc[0], loc[1])
+
+
+# Scanners return an iterable over the lines of the airport block, None if airport is not in file
+SCANNERS = {
+    APT_SCANNER.READLINE: findAirportReadline,
+    APT_SCANNER.MMAP: streamAirportMmap,
+}
+
+
+def indexAirports(filename: str) -> dict:
+    # Returns {icao: [offset, length]} for all airports in apt.dat file.
+    # If an airport appears more than once in a file,
+    # first occurence is kept, like a sequential scan would do.
+    airports = {}
+    if os.path.getsize(filename) == 0:
+        return airports
+    with open(filename, "rb") as apt_dat:
+        with mmap.mmap(apt_dat.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            for icao, offset, length in airportHeaders(buf):
+                if icao is not None and icao not in airports:
+                    airports[icao] = [offset, length]
+    return airports
+
+
+def locateAirport(icao: str, index=None) -> str | None:
+    # Returns apt.dat file the airport is loaded from, in scenery pack priority order, None if not found.
+    # Uses the index if supplied, otherwise looks at airport lines of each file.
+    for scenery, filename in aptFiles().items():
+        if index is not None:
+            if icao in index.index(filename):
+                return filename
+        elif os.path.getsize(filename) > 0:
+            with open(filename, "rb") as apt_dat:
+                with mmap.mmap(apt_dat.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                    for name, offset, length in airportHeaders(buf):
+                        if name == icao:
+                            return filename
+    return None
+
+
+def readAirport(filename: str, offset: int, length: int) -> list:
+    # Returns lines of airport block at offset in apt.dat file
+    with open(filename, "rb") as apt_dat:
+        apt_dat.seek(offset)
+        block = apt_dat.read(length)
+    return block.decode("utf-8", errors="ignore").splitlines()
+
+
+def streamAirport(filename: str, offset: int, length: int):
+    # Yields lines of airport block at offset in apt.dat file, one at a time,
+    # whole airport block is never in memory.
+    with open(filename, "rb") as apt_dat:
+        apt_dat.seek(offset)
+        remaining = length
+        while remaining > 0:
+            line = apt_dat.readline(remaining)
+            if not line:
+                break
+            remaining = remaining - len(line)
+            yield line.decode("utf-8", errors="ignore")
+
+
+class AptRecord:
+    # apt.dat line, split once: row code and arguments.
+    # Records continued by other records (1202 edge by 1204 active, 1300 ramp by 1301 details)
+    # keep their continuation records in details.
+    __slots__ = ("code", "args", "details", "seq")
+
+    def __init__(self, code: int, args: list, seq: int):
+        self.code = code
+        self.args = args
+        self.details = None
+        self.seq = seq
+
+    def content(self) -> str:
+        return " ".join(self.args)
+
+
+CONTINUATIONS = {1204: 1202, 1301: 1300}  # continuation row code: continued row code
+
+# Row codes FtG uses: airport, ATC frequencies, runways, taxi routing network, ramps
+ROUTING_CODES = {1, 53, 1053, 100, 1201, 1202, 1204, 1300, 1301}
+
+
+class AptRecords:
+    # apt.dat lines of an airport, grouped by row code, in apt.dat file order within a row code.
+    # Each line is parsed once into an AptRecord.
+    # If codes is supplied, lines with other row codes are only counted, not kept.
+
+    def __init__(self, codes: set | None = None):
+        self.codes = codes
+        self.rows = {}
+        self.counts = {}
+        self.count = 0
+        self.continued = None  # last record that can be continued
+
+    def add(self, line: str) -> AptRecord | None:
+        arr = line.split()
+        if len(arr) == 0 or not arr[0].isdigit():
+            logger.debug(f"did not load line '{line.strip()}'")
+            return None
+        code = int(arr[0])
+        self.counts[code] = self.counts.get(code, 0) + 1
+        self.count = self.count + 1
+        if self.codes is not None and code not in self.codes:
+            self.continued = None
+            return None
+        record = AptRecord(code, arr[1:], self.count - 1)
+        if code in self.rows:
+            self.rows[code].append(record)
+        else:
+            self.rows[code] = [record]
+        continues = CONTINUATIONS.get(code)
+        if continues is None:
+            self.continued = record if code in CONTINUATIONS.values() else None
+        elif self.continued is not None and self.continued.code == continues:
+            if self.continued.details is None:
+                self.continued.details = []
+            self.continued.details.append(record)
+        return record
+
+    def get(self, code: int) -> list:
+        return self.rows.get(code, [])
+
+    def stats(self) -> dict:
+        return dict(sorted(self.counts.items()))
+
+    def all(self) -> list:
+        # All records kept, in apt.dat file order
+        return sorted([r for records in self.rows.values() for r in records], key=lambda r: r.seq)
+
+    def release(self):
+        # Drops records once they have been used, counts are kept
+        self.rows = {}
+        self.continued = None
+
+
+class AptIndex:
+    # Persistent index of airports in apt.dat files
+    # {filename: {"mtime": float, "size": int, "airports": {icao: [offset, length]}}}
+    # Index of a file is (re)built the first time it is needed,
+    # and each time the apt.dat file modification time or size changes.
+
+    def __init__(self, filename: str | None = None):
+        self.filename = filename if filename is not None else os.path.join(CACHE_DIRECTORY, INDEX_FILE_NAME)
+        self.files = {}
+        self.changed = False
+        self.lock = threading.RLock()
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.filename):
+            logger.debug(f"no apt.dat index {self.filename}")
+            return
+        try:
+            with open(self.filename, "r") as fp:
+                data = json.load(fp)
+            if data.get("version") == INDEX_VERSION:
+                self.files = data.get("files", {})
+                logger.debug(f"apt.dat index loaded ({len(self.files)} files)")
+            else:
+                logger.info(f"apt.dat index version mismatch ({data.get('version')}), index ignored")
+        except:
+            logger.warning(f"apt.dat index {self.filename} could not be loaded, index ignored", exc_info=True)
+            self.files = {}
+
+    def save(self):
+        with self.lock:
+            if not self.changed:
+                return
+            try:
+                os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+                tmp = self.filename + ".tmp"
+                with open(tmp, "w") as fp:
+                    json.dump({"version": INDEX_VERSION, "files": self.files}, fp)
+                os.replace(tmp, self.filename)
+                self.changed = False
+                logger.debug(f"apt.dat index saved ({len(self.files)} files)")
+            except:
+                logger.warning(f"apt.dat index {self.filename} could not be saved", exc_info=True)
+
+    def valid(self, filename: str) -> bool:
+        entry = self.files.get(filename)
+        if entry is None:
+            return False
+        try:
+            st = os.stat(filename)
+        except OSError:
+            return False
+        return entry["mtime"] == st.st_mtime and entry["size"] == st.st_size
+
+    def index(self, filename: str) -> dict:
+        # Returns {icao: [offset, length]} for file, (re)builds it if necessary
+        with self.lock:
+            if not self.valid(filename):
+                st = os.stat(filename)
+                logger.debug(f"indexing {filename}..")
+                airports = indexAirports(filename)
+                self.files[filename] = {"mtime": st.st_mtime, "size": st.st_size, "airports": airports}
+                self.changed = True
+                logger.info(f"indexed {len(airports)} airports in {filename}")
+            return self.files[filename]["airports"]
+
+    def locate(self, filename: str, icao: str) -> list | None:
+        # Returns [offset, length] of airport block in file, None if not in file
+        loc = self.index(filename).get(icao)
+        if loc is None:
+            return None
+        with open(filename, "rb") as apt_dat:
+            apt_dat.seek(loc[0])
+            args = apt_dat.readline().split()
+        if len(args) > 4 and args[0] == b"1" and args[4].decode("utf-8", errors="ignore") == icao:
+            return loc
+        # Index does not match file content, rebuild index for this file and try again
+        logger.warning(f"apt.dat index for {filename} does not match file content, re-indexing")
+        with self.lock:
+            self.files.pop(filename, None)
+        return self.index(filename).get(icao)
+
+    def find(self, filename: str, icao: str) -> list | None:
+        # Returns lines of airport block in file, None if not in file
+        loc = self.locate(filename, icao)
+        if loc is None:
+            return None
+        return readAirport(filename, loc[0], loc[1])
+
+    def stream(self, filename: str, icao: str):
+        # Returns line iterator over airport block in file, None if not in file
+        loc = self.locate(filename, icao)
+        if loc is None:
+            return None
+        return streamAirport(filename, loc[0], loc[1])
+
+
+APT_INDEX = None
+APT_INDEX_LOCK = threading.Lock()
+
+
+def aptIndex() -> AptIndex:
+    # Shared index instance, loaded on first use. Main and prefetch threads may both ask for it first.
+    global APT_INDEX
+    if APT_INDEX is None:
+        with APT_INDEX_LOCK:
+            if APT_INDEX is None:
+                APT_INDEX = AptIndex()
+    return APT_INDEX
@@ -0,0 +1,136 @@
+# Offline airport compiler
+# Compiles all airports found in scenery packs and Global Airports into the compiled airport cache,
+# so that FtG does not need to read apt.dat files in the simulator.
+# Run it once after scenery update, outside of X-Plane, with python 3.12+, for example:
+#
+#   cd "X-Plane 12/Resources/plugins/PythonPlugins"
+#   python -m followthegreens.compiler --xplane "../../.." --jobs 8
+#   python -m followthegreens.compiler --xplane "../../.." EBBR KJFK
+#   python -m followthegreens.compiler --xplane "../../.." --hierarchy
+#
+# Airports are compiled in parallel in a pool of processes.
+# With --hierarchy, contraction hierarchies of large airports are added to the compiled airports (long).
+#
+import os
+import sys
+import time
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .globals import logger
+from .aptdat import aptFiles, aptIndex
+from .aptcache import readCompiled, writeCompiled
+from .airport import Airport
+
+
+def airportSources(icaos: list | None = None) -> dict:
+    # Returns {icao: apt.dat file} for all airports, or requested airports,
+    # apt.dat file is the one FtG would load the airport from (scenery pack priority order).
+    sources = {}
+    index = aptIndex()
+    for scenery, filename in aptFiles().items():
+        for icao in index.index(filename):
+            if icao not in sources and (icaos is None or icao in icaos):
+                sources[icao] = filename
+    index.save()
+    return sources
+
+
+def compileAirport(icao: str, source: str, force: bool = False, hierarchy: bool = False) -> dict:
+    # Compiles one airport, returns report
+    report = {"icao": icao, "source": source, "status": "compiled", "parse": 0.0, "build": 0.0, "hierarchy": 0.0, "nodes": 0, "edges": 0, "reason": ""}
+    try:
+        data = readCompiled(icao, source) if not force else None
+        if data is not None and (not hierarchy or "hierarchies" in data):
+            report["status"] = "up to date"
+            return report
+        airport = Airport(icao=icao, prefs={"USE_COMPILED_CACHE": False})
+        t0 = time.perf_counter()
+        status = airport.load()
+        report["parse"] = time.perf_counter() - t0
+        if not status:
+            report["status"] = "failed"
+            report["reason"] = "not found"
+            return report
+        t0 = time.perf_counter()
+        status = airport.build()
+        report["build"] = time.perf_counter() - t0
+        report["nodes"] = len(airport.graph.vert_dict)
+        report["edges"] = len(airport.graph.edges_arr)
+        if report["edges"] == 0:  # FtG cannot use it, no need to compile it
+            report["status"] = "skipped"
+            report["reason"] = "no taxi routing network"
+            return report
+        if not status[0]:
+            report["status"] = "failed"
+            report["reason"] = status[1]
+            return report
+        if hierarchy:
+            t0 = time.perf_counter()
+            airport.mkHierarchies()
+            report["hierarchy"] = time.perf_counter() - t0
+        if not writeCompiled(icao, airport.scenery_pack, airport.compiled(hierarchies=hierarchy)):
+            report["status"] = "failed"
+            report["reason"] = "could not save"
+    except Exception as e:
+        report["status"] = "failed"
+        report["reason"] = f"{type(e).__name__}: {e}"
+    return report
+
+
+def initWorker(xplane: str, level: int):
+    # Paths to apt.dat files and caches are relative to X-Plane folder
+    os.chdir(xplane)
+    logger.setLevel(level)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Follow the greens airport compiler")
+    parser.add_argument("--xplane", default=".", help="X-Plane folder, default to current folder")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="number of processes, default to number of CPU")
+    parser.add_argument("--force", action="store_true", help="compile airports even if their compiled cache is up to date")
+    parser.add_argument("--verbose", action="store_true", help="report each airport, not only failures")
+    parser.add_argument("--hierarchy", action="store_true", help="add contraction hierarchies of large airports, for faster routing")
+    parser.add_argument("icao", nargs="*", help="airports to compile, default to all airports")
+    args = parser.parse_args()
+
+    level = logging.WARNING
+    initWorker(args.xplane, level)
+    t0 = time.perf_counter()
+    sources = airportSources([icao.upper() for icao in args.icao] if len(args.icao) > 0 else None)
+    print(f"{len(sources)} airports to compile in {len(set(sources.values()))} apt.dat files (located in {round(time.perf_counter() - t0, 1)}s)")
+    reports = []
+    for icao in args.icao:  # requested airports in no apt.dat file are failures
+        if icao.upper() not in sources:
+            print(f"{icao.upper()}: not found")
+            reports.append({"icao": icao.upper(), "source": None, "status": "failed", "parse": 0.0, "build": 0.0, "hierarchy": 0.0, "nodes": 0, "edges": 0, "reason": "not found"})
+
+    with ProcessPoolExecutor(max_workers=args.jobs, initializer=initWorker, initargs=(os.getcwd(), level)) as executor:
+        futures = [executor.submit(compileAirport, icao, source, args.force, args.hierarchy) for icao, source in sources.items()]
+        for future in as_completed(futures):
+            r = future.result()
+            reports.append(r)
+            if r["status"] == "failed" or args.verbose:
+                print(
+                    f"{r['icao']:8s}: {r['status']:10s} parse {r['parse']:.3f}s, build {r['build']:.3f}s, hierarchy {r['hierarchy']:.3f}s, {r['nodes']} nodes, {r['edges']} edges {r['reason']}".rstrip()
+                )
+
+    counts = {}
+    for r in reports:
+        counts[r["status"]] = counts.get(r["status"], 0) + 1
+    compiled = [r for r in reports if r["status"] == "compiled"]
+    print(f"{len(reports)} airports in {round(time.perf_counter() - t0, 1)}s: {', '.join([f'{v} {k}' for k, v in sorted(counts.items())])}")
+    if len(compiled) > 0:
+        parse = sum([r["parse"] for r in compiled])
+        build = sum([r["build"] for r in compiled])
+        hierarchy = sum([r["hierarchy"] for r in compiled])
+        print(f"compiled airports: parse {round(parse, 1)}s, build {round(build, 1)}s, hierarchy {round(hierarchy, 1)}s (cpu time, all processes)")
+        print("slowest:")
+        for r in sorted(compiled, key=lambda r: r["parse"] + r["build"] + r["hierarchy"], reverse=True)[:5]:
+            print(f"  {r['icao']:8s}: parse {r['parse']:.3f}s, build {r['build']:.3f}s, hierarchy {r['hierarchy']:.3f}s, {r['nodes']} nodes, {r['edges']} edges")
+    return 1 if counts.get("failed", 0) > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
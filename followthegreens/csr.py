@@ -0,0 +1,286 @@
+# Compressed sparse row graph
+# Flat array copy of a Graph for route searches. Vertices are integer indices, in Graph.vert_dict order,
+# ids maps indices back to vertex ids (apt.dat node ids). Arcs leaving vertex i are arcs offsets[i] to offsets[i + 1] - 1,
+# with their destination vertex, cost and flags (Edge.flags and arc bits below).
+# Arcs of a vertex are the edges of Vertex.adjacent, then one way edges of Vertex.contraflow travelled in reverse,
+# in the order Graph searches use them. AStar() and AStarRelaxed() return the same routes as Graph searches:
+# vertices with same evaluation are visited in vertex id order.
+# Graph keeps edges and geometry, compact graph is rebuilt when airport is prepared.
+# Route._search() uses it when route trees and contraction hierarchies cannot give the route.
+#
+# Chains: taxiway lines are drawn with many vertices that only trace a curve, each connected to two others
+# by edges of same attributes. When chains are contracted, an arc toward a chain goes directly to the other end of the chain
+# (super arc), searches no longer visit vertices inside chains. Vertices inside chains keep their arcs, so that a route
+# can start inside a chain. Super arcs into the chain of the route destination are replaced by their first arc,
+# so that the destination can be reached. Routes found are expanded back to all vertices.
+# Routes have the same cost, they may differ from Graph searches when several shortest routes exist.
+#
+import heapq
+from array import array
+
+from .geo import distanceRad
+from .globals import logger
+from .graph import Graph, RoutingProfile, EDGE_ONEWAY, BROKEN_WIDTH, BROKEN_RUNWAY, BROKEN_ONEWAY
+
+ARC_CONTRAFLOW = 1 << 16  # arc is a one way edge travelled in reverse, from Vertex.contraflow
+ARC_REVERSE = 1 << 17  # arc goes from edge end to edge start
+
+
+def edgeKey(edge) -> tuple:
+    # Edges with same key can be contracted in the same chain
+    return (edge.flags, tuple([(a.active, tuple(a.runways)) for a in edge.active]))
+
+
+class CompactGraph:
+
+    def __init__(self, graph: Graph, contract: bool = False):
+        self.name = graph.name
+        self.ids = list(graph.vert_dict)  # {index: vertex id}
+        self.index = {vid: i for i, vid in enumerate(self.ids)}  # {vertex id: index}
+        self.rank = array("q", [0] * len(self.ids))  # {index: rank of vertex id in sorted vertex ids}, breaks ties in searches
+        for r, i in enumerate(sorted(range(len(self.ids)), key=self.ids.__getitem__)):
+            self.rank[i] = r
+        self.lats = array("d")  # radians
+        self.lons = array("d")
+        self.offsets = array("q", [0])
+        self.targets = array("q")
+        self.costs = array("d")
+        self.flags = array("q")
+        self.vias = array("q")  # {arc: chain travelled by super arc, -1 if none}
+        self.chains = []  # [(chain id, vertices inside chain in travel order, cost of first arc)] travelled by super arcs
+        self.chain = array("q", [-1] * len(self.ids))  # {index: chain id of vertex inside a chain, -1 if none}
+        inner = self.mkChains(graph) if contract else {}
+        for v in graph.vert_dict.values():
+            self.lats.append(v.rlat)
+            self.lons.append(v.rlon)
+            for m, e in v.adjacent.items():
+                self.addArc(v, m, e, 0, inner)
+            for m, e in v.contraflow.items():
+                if m not in v.adjacent:
+                    self.addArc(v, m, e, ARC_CONTRAFLOW, inner)
+            self.offsets.append(len(self.targets))
+        logger.debug(f"compact graph {self.name}: {len(self.ids)} vertices, {len(self.targets)} arcs, {self.stats()}")
+
+    def stats(self) -> str:
+        inside = len([c for c in self.chain if c >= 0])
+        chains = len(set([c for c in self.chain if c >= 0]))
+        return f"{chains} chains, {inside} vertices inside chains, {len([v for v in self.vias if v >= 0])} super arcs"
+
+    def mkChains(self, graph: Graph) -> dict:
+        # Marks vertices inside chains, returns them with their two (neighbor id, edge).
+        # A vertex is inside a chain if it has exactly two edges, to two other vertices, with same key,
+        # and if they are one way edges, one comes in and the other goes out.
+        incident = {}
+        for e in graph.edges_arr:
+            incident.setdefault(e.start.id, []).append(e)
+            if e.end.id != e.start.id:
+                incident.setdefault(e.end.id, []).append(e)
+        inner = {}  # {vertex id: ((neighbor id, edge), (neighbor id, edge))}
+        for vid, edges in incident.items():
+            if len(edges) != 2 or edgeKey(edges[0]) != edgeKey(edges[1]):
+                continue
+            e1, e2 = edges
+            n1 = e1.end.id if e1.start.id == vid else e1.start.id
+            n2 = e2.end.id if e2.start.id == vid else e2.start.id
+            if n1 == n2 or vid in (n1, n2):
+                continue
+            if e1.flags & EDGE_ONEWAY != 0 and (e1.end.id == vid) == (e2.end.id == vid):
+                continue
+            inner[vid] = ((n1, e1), (n2, e2))
+
+        # Chains between two vertices not inside chains, loops back to same vertex and rings are not contracted
+        contracted = {}
+        count = 0
+        for vid in graph.vert_dict:
+            if vid in inner:
+                continue
+            for first in [n for n in list(graph.vert_dict[vid].adjacent) + list(graph.vert_dict[vid].contraflow) if n in inner]:
+                if first in contracted:
+                    continue
+                chain = [first]
+                prev = vid
+                while chain[-1] in inner:
+                    (n1, e1), (n2, e2) = inner[chain[-1]]
+                    nxt = n2 if n1 == prev else n1
+                    prev = chain[-1]
+                    chain.append(nxt)
+                if chain[-1] == vid:
+                    continue
+                for n in chain[:-1]:
+                    self.chain[self.index[n]] = count
+                    contracted[n] = inner[n]
+                count = count + 1
+        return contracted
+
+    def addArc(self, vertex, dst, edge, flags: int, inner: dict):
+        if edge.start.id != vertex.id:
+            flags = flags | ARC_REVERSE
+        via = -1
+        cost = edge.cost
+        if dst in inner and vertex.id not in inner:  # super arc to the other end of chain
+            chain = []
+            prev = vertex.id
+            while dst in inner:
+                chain.append(self.index[dst])
+                (n1, e1), (n2, e2) = inner[dst]
+                prev, dst, e = (dst, n2, e2) if n1 == prev else (dst, n1, e1)
+                cost = cost + e.cost
+            via = len(self.chains)
+            self.chains.append((self.chain[chain[0]], tuple(chain), edge.cost))
+        self.targets.append(self.index[dst])
+        self.costs.append(cost)
+        self.flags.append(edge.flags | flags)
+        self.vias.append(via)
+
+    def mask(self, profile: RoutingProfile | None) -> int:
+        # Arcs with any of these flags cannot be used, like Graph.get_neighbors()
+        if profile is None:
+            return ARC_CONTRAFLOW
+        return profile.exclude | (0 if profile.contraflow else ARC_CONTRAFLOW)
+
+    def heuristic(self, goal: int):
+        # Straight distance to goal, computed once per vertex and search, like Graph.AStar()
+        lats, lons = self.lats, self.lons
+        glat, glon = lats[goal], lons[goal]
+        h = {}
+
+        def heuristic(n):
+            d = h.get(n)
+            if d is None:
+                d = distanceRad(lats[n], lons[n], glat, glon)
+                h[n] = d
+            return d
+
+        return heuristic
+
+    def expand(self, n, via: int) -> list:
+        # Vertex ids of arc ending at n through chain via, in reverse order, n first
+        path = [self.ids[n]]
+        if via >= 0:
+            path = path + [self.ids[i] for i in reversed(self.chains[via][1])]
+        return path
+
+    def arc(self, a: int, stop_chain: int) -> tuple:
+        # (destination, cost, chain) of arc a. Super arcs into the chain of destination stop at their first vertex.
+        via = self.vias[a]
+        if via < 0:
+            return self.targets[a], self.costs[a], -1
+        chain_id, chain, first = self.chains[via]
+        if chain_id == stop_chain:
+            return chain[0], first, -1
+        return self.targets[a], self.costs[a], via
+
+    def AStar(self, start_node, stop_node, profile: RoutingProfile | None = None):
+        # Graph.AStar() on arrays. Returns list of vertex ids (path) or None
+        start = self.index.get(start_node)
+        stop = self.index.get(stop_node)
+        if start is None or stop is None:
+            logger.warning(f"AStar: invalid vertex id {start_node} or {stop_node}")
+            return None
+        offsets, targets, costs, flags, vias, rank = self.offsets, self.targets, self.costs, self.flags, self.vias, self.rank
+        mask = self.mask(profile)
+        heuristic = self.heuristic(stop)
+        stop_chain = self.chain[stop]
+
+        closed_list = set()
+        g = {start: 0}
+        parents = {start: (start, -1)}
+        open_list = [(heuristic(start), rank[start], start)]
+
+        while open_list:
+            f, r, n = heapq.heappop(open_list)
+            if n in closed_list or f > g[n] + heuristic(n):  # outdated evaluation
+                continue
+
+            if n == stop:
+                reconst_path = []
+                while parents[n][0] != n:
+                    reconst_path = reconst_path + self.expand(n, parents[n][1])
+                    n = parents[n][0]
+                reconst_path.append(start_node)
+                reconst_path.reverse()
+                logger.info("..found (compact graph)")
+                return reconst_path
+
+            closed_list.add(n)
+            gn = g[n]
+            for a in range(offsets[n], offsets[n + 1]):
+                if flags[a] & mask != 0:
+                    continue
+                if vias[a] < 0:
+                    m, c, via = targets[a], costs[a], -1
+                else:
+                    m, c, via = self.arc(a, stop_chain)
+                gm = gn + c
+                if m not in g or g[m] > gm:
+                    g[m] = gm
+                    parents[m] = (n, via)
+                    closed_list.discard(m)
+                    heapq.heappush(open_list, (gm + heuristic(m), rank[m], m))
+
+        logger.warning(f"AStar: could not find route from {start_node} to {stop_node}")
+        return None
+
+    def AStarRelaxed(self, start_node, stop_node, profile: RoutingProfile):
+        # Graph.AStarRelaxed() on arrays. Returns list of vertex ids (path) or None
+        start = self.index.get(start_node)
+        stop = self.index.get(stop_node)
+        if start is None or stop is None:
+            logger.warning(f"AStarRelaxed: invalid vertex id {start_node} or {stop_node}")
+            return None
+        offsets, targets, costs, flags, vias, rank = self.offsets, self.targets, self.costs, self.flags, self.vias, self.rank
+        exclude, width, runway, oneway = profile.exclude, profile.width, profile.runway, profile.oneway
+        heuristic = self.heuristic(stop)
+        stop_chain = self.chain[stop]
+
+        state = (start, 0)
+        g = {state: 0}
+        parents = {state: (state, -1)}
+        closed_list = {}  # {vertex: [(broken, g)]} states whose neighbors have been inspected
+        open_list = [(0, heuristic(start), rank[start], start)]
+
+        while open_list:
+            broken, f, r, n = heapq.heappop(open_list)
+            state = (n, broken)
+            if f > g[state] + heuristic(n):  # outdated evaluation
+                continue
+            closed = closed_list.setdefault(n, [])
+            if any([b & ~broken == 0 and d <= g[state] for b, d in closed]):
+                continue
+
+            if n == stop:
+                reconst_path = []
+                while parents[state][0] != state:
+                    reconst_path = reconst_path + self.expand(state[0], parents[state][1])
+                    state = parents[state][0]
+                reconst_path.append(start_node)
+                reconst_path.reverse()
+                logger.info("..found (compact graph)")
+                return reconst_path
+
+            gn = g[state]
+            closed.append((broken, gn))
+            for a in range(offsets[n], offsets[n + 1]):
+                fl = flags[a]
+                if fl & exclude != 0:
+                    continue
+                b = broken
+                if fl & width != 0:
+                    b = b | BROKEN_WIDTH
+                if fl & runway != 0:
+                    b = b | BROKEN_RUNWAY
+                if fl & oneway != 0 and fl & ARC_REVERSE != 0:
+                    b = b | BROKEN_ONEWAY
+                if vias[a] < 0:
+                    m, c, via = targets[a], costs[a], -1
+                else:
+                    m, c, via = self.arc(a, stop_chain)
+                next_state = (m, b)
+                gm = gn + c
+                if next_state not in g or g[next_state] > gm:
+                    g[next_state] = gm
+                    parents[next_state] = (state, via)
+                    heapq.heappush(open_list, (b, gm + heuristic(m), rank[m], m))
+
+        logger.warning(f"AStarRelaxed: could not find route from {start_node} to {stop_node}")
+        return None
@@ -21,7 +21,7 @@ from .globals import (
     AMBIANT_RWY_LIGHT_CMDROOT,
     AMBIANT_RWY_LIGHT,
 )
-from .geo import EARTH, Point, distance
+from .geo import EARTH
 
 
 # Hardcaded here, not preferences
@@ -291,7 +291,7 @@ class FlightLoop:
         nextvtx = route.graph.get_vertex(nextvtxid)
 
         # 2. distance to that next vertex and turn at that vertex
-        dist_to_next_vertex = distance(Point(lat=position[0], lon=position[1]), nextvtx)
+        dist_to_next_vertex = route.graph.projection.distanceTo(nextvtx, position[0], position[1])
 
         if round(self.last_dist_to_next_vertex, 1) == round(dist_to_next_vertex, 1):  # not moved
             msg = "stopped"
@@ -17,7 +17,9 @@ from .version import __VERSION__
 from .globals import logger, get_global, INTERNAL_CONSTANTS, FTG_STATUS, MOVEMENT, AMBIANT_RWY_LIGHT_VALUE, RABBIT_MODE, RUNWAY_BUFFER_WIDTH, SAY_ROUTE
 from .aircraft import Aircraft
 from .airport import Airport
+from .airports import airportCache
 from .flightloop import FlightLoop
+from .prefetch import Prefetcher
 from .lightstring import LightString
 from .ui import UIUtil
 from .nato import phonetic, toml_dumps
@@ -29,6 +31,8 @@ VERSION = "VERSION"
 
 class FollowTheGreens:
 
+    PREFETCH = True  # may prefetch arrival airport
+
     def __init__(self, pi):
         self.status = FTG_STATUS.NEW
         self.pi = pi
@@ -68,6 +72,10 @@ class FollowTheGreens:
 
         self.ui = UIUtil(self)  # Where windows are built
         self.flightLoop = FlightLoop(self)  # where the magic is done
+        self.prefetcher = None  # prepares arrival airport in background
+        if self.PREFETCH and get_global("PREFETCH_AIRPORT", self.prefs):
+            self.prefetcher = Prefetcher(self)
+            self.prefetcher.start()
 
         self.status = FTG_STATUS.INITIALIZED
 
@@ -324,9 +332,8 @@ VERSION = "{__VERSION__}"
         # Prompt for local destination at airport.
         # Either a runway for departure or a parking for arrival.
         if not self.airport or (self.airport.icao != airport):  # we may have changed airport since last call
-            airport = Airport(icao=airport, prefs=self.prefs)
-            # Info 4 to 9 in airport.prepare()
-            status = airport.prepare()  # [ok, errmsg]
+            # Info 4 to 9 in airport.prepare(), if airport not already prepared
+            airport, status = airportCache().get(airport, self.prefs)  # [ok, errmsg]
             if not status[0]:
                 logger.warning(f"airport not ready: {status[1]}")
                 return self.ui.sorry(status[1])
@@ -334,11 +341,13 @@ VERSION = "{__VERSION__}"
             self.inc(self.airport.icao)
         else:
             logger.debug(f"airport {self.airport.icao} already loaded")
+            self.airport.setPreferences(self.prefs)  # preferences may have been reloaded
 
         logger.info(f"airport {self.airport.icao} ready")
 
         # Info 10
         self.move = self.airport.guessMove(self.aircraft.position())
+        self.airport.mkRouteTrees(self.aircraft, self.move, get_global("RESPECT_CONSTRAINTS", preferences=self.prefs))
         return self.ui.promptForDestination()
 
     def newGreen(self, destination):
@@ -548,9 +557,13 @@ VERSION = "{__VERSION__}"
     def disable(self):
         # alias to cancel
         self.inc("disabled")
+        if self.prefetcher is not None:
+            self.prefetcher.stop()
         return self.terminate("disabled")
 
     def stop(self):
         # alias to cancel
         self.inc("stopped")
+        if self.prefetcher is not None:
+            self.prefetcher.stop()
         return self.terminate("stopped")
@@ -65,10 +65,21 @@ MAX_SAME_POINT = 0.25  # m, 25cm
 
 
 class Feature:
+    # Features are created by thousands (vertices, edges, lights), they have no __dict__.
+    # GeoJSON properties are only used for debug exports, they are created on first use.
+    __slots__ = ("_properties",)
+    featureType = "Feature"
+    geomType = ""
+    PROPERTIES = {}  # default properties
+
     def __init__(self):
-        self.properties = {}
-        self.featureType = "Feature"
-        self.geomType = ""
+        self._properties = None
+
+    @property
+    def properties(self) -> dict:
+        if self._properties is None:
+            self._properties = dict(self.PROPERTIES)
+        return self._properties
 
     def coords(self, lonLat: bool = False) -> list:
         return []
@@ -114,15 +125,18 @@ class FeatureCollection:
 
 
 class Point(Feature):
+    __slots__ = ("lat", "lon", "alt", "rlat", "rlon", "xy")
+    geomType = "Point"
+    PROPERTIES = {"marker-color": "#aaaaaa", "marker-size": "medium"}
+
     def __init__(self, lat, lon, alt=0):
         Feature.__init__(self)
-        self.geomType = "Point"
         self.lat = float(lat)
         self.lon = float(lon)
         self.alt = float(alt)
-        # self.properties["marker"] = None
-        self.properties["marker-color"] = "#aaaaaa"
-        self.properties["marker-size"] = "medium"
+        self.rlat = math.radians(self.lat)  # radians, computed once for distance(), bearing() and destination()
+        self.rlon = math.radians(self.lon)
+        self.xy = None  # (x, y) metre coordinates in airport local projection, see LocalProjection
 
     def coords(self, lonLat: bool = False) -> list:
         if lonLat:
@@ -134,14 +148,14 @@ class Point(Feature):
 
 
 class Line(Feature):
+    __slots__ = ("start", "end")
+    geomType = "LineString"
+    PROPERTIES = {"stroke": "#aaaaaa", "strokeWidth": 1, "strokeOpacity": 1}
+
     def __init__(self, start: Point, end: Point):
         Feature.__init__(self)
-        self.geomType = "LineString"
         self.start = start
         self.end = end
-        self.properties["stroke"] = "#aaaaaa"
-        self.properties["strokeWidth"] = 1
-        self.properties["strokeOpacity"] = 1
 
     def coords(self, lonLat=False) -> list:
         return [self.start.coords(lonLat), self.end.coords(lonLat)]
@@ -168,13 +182,13 @@ class Line(Feature):
 
 
 class LineString(Feature):
+    __slots__ = ("points",)
+    geomType = "LineString"
+    PROPERTIES = {"stroke": "#aaaaaa", "strokeWidth": 1, "strokeOpacity": 1}
+
     def __init__(self, points):
         Feature.__init__(self)
-        self.geomType = "LineString"
         self.points = points
-        self.properties["stroke"] = "#aaaaaa"
-        self.properties["strokeWidth"] = 1
-        self.properties["strokeOpacity"] = 1
 
     def coords(self, lonLat=False):
         return list(map(lambda x: x.coords(lonLat), self.points))
@@ -191,13 +205,13 @@ class LineString(Feature):
 
 
 class Polygon(Feature):
+    __slots__ = ("coordinates",)
+    geomType = "Polygon"
+    PROPERTIES = {"stroke": "#aaaaaa", "strokeWidth": 1, "strokeOpacity": 1}
+
     def __init__(self, p):
         Feature.__init__(self)
-        self.geomType = "Polygon"
         self.coordinates = p  # List[Point]
-        self.properties["stroke"] = "#aaaaaa"
-        self.properties["strokeWidth"] = 1
-        self.properties["strokeOpacity"] = 1
 
     def coords(self, lonLat: bool = False) -> list:
         return list(map(lambda x: x.coords(lonLat), self.coordinates))
@@ -225,18 +239,27 @@ def haversine(lat1, lat2, long1, long2):  # in radians.
 
 
 def distance(p1, p2):  # in degrees.
-    lat1, lat2 = math.radians(p1.lat), math.radians(p2.lat)
-    long1, long2 = math.radians(p1.lon), math.radians(p2.lon)
-    a = haversine(lat1, lat2, long1, long2)
-    return 2 * R * math.asin(math.sqrt(a))  # in m
+    return distanceRad(p1.rlat, p1.rlon, p2.rlat, p2.rlon)  # in m
 
 
 def bearing(src, dst):
-    lat1 = math.radians(src.lat)
-    lon1 = math.radians(src.lon)
-    lat2 = math.radians(dst.lat)
-    lon2 = math.radians(dst.lon)
+    return bearingRad(src.rlat, src.rlon, dst.rlat, dst.rlon)
+
+
+def destination(src, brngDeg, d):
+    lat2, lon2 = destinationRad(src.rlat, src.rlon, brngDeg, d)
+    return Point(math.degrees(lat2), math.degrees(lon2))
+
+
+# Fast path: coordinates are floats, no Point created.
+# Used in flight loops with raw [lat, lon] positions from X-Plane.
+# Results are the same as distance(), bearing() and destination().
+def distanceRad(lat1, lon1, lat2, lon2):  # in radians.
+    a = math.pow(math.sin((lat2 - lat1) / 2), 2) + math.cos(lat1) * math.cos(lat2) * math.pow(math.sin((lon2 - lon1) / 2), 2)  # haversine(), inlined
+    return 2 * R * math.asin(math.sqrt(a))  # in m
+
 
+def bearingRad(lat1, lon1, lat2, lon2):  # in radians, returns degrees.
     y = math.sin(lon2 - lon1) * math.cos(lat2)
     x = math.cos(lat1) * math.sin(lat2) - math.sin(lat1) * math.cos(lat2) * math.cos(lon2 - lon1)
     t = math.atan2(y, x)
@@ -244,9 +267,7 @@ def bearing(src, dst):
     return brng
 
 
-def destination(src, brngDeg, d):
-    lat = math.radians(src.lat)
-    lon = math.radians(src.lon)
+def destinationRad(lat, lon, brngDeg, d) -> tuple:  # in radians, returns (lat, lon) in radians.
     brng = math.radians(brngDeg)
     r = d / R
 
@@ -255,7 +276,15 @@ def destination(src, brngDeg, d):
         math.sin(brng) * math.sin(r) * math.cos(lat),
         math.cos(r) - math.sin(lat) * math.sin(lat2),
     )
-    return Point(math.degrees(lat2), math.degrees(lon2))
+    return (lat2, lon2)
+
+
+def distanceLatLon(lat1, lon1, lat2, lon2):  # in degrees.
+    return distanceRad(math.radians(lat1), math.radians(lon1), math.radians(lat2), math.radians(lon2))
+
+
+def distanceTo(point, lat, lon):  # from point to lat, lon in degrees.
+    return distanceRad(point.rlat, point.rlon, math.radians(lat), math.radians(lon))
 
 
 def lineintersect(line1, line2):
@@ -289,6 +318,84 @@ def lineintersect(line1, line2):
     return None
 
 
+class LocalProjection:
+    # Local tangent plane around a reference point: x is metres east, y is metres north.
+    # FtG works within a few kilometres of an airport, distances, bearings and destinations
+    # are then Euclidean in the plane, which is much cheaper than spherical trigonometry.
+    # Points keep their plane coordinates in Point.xy, computed once. Latitude/longitude of new points
+    # (lights, positions on route) are computed back from plane coordinates.
+    # Exact projection uses spherical functions instead (same interface).
+    def __init__(self, lat0: float = 0.0, lon0: float = 0.0, exact: bool = False):
+        self.lat0 = lat0
+        self.lon0 = lon0
+        self.exact = exact
+        self.ky = R * math.pi / 180  # metres per degree of latitude
+        self.kx = self.ky * math.cos(math.radians(lat0))  # metres per degree of longitude at reference point
+
+    def project(self, point) -> tuple:
+        # Sets and returns point plane coordinates
+        point.xy = ((point.lon - self.lon0) * self.kx, (point.lat - self.lat0) * self.ky)
+        return point.xy
+
+    def point(self, x: float, y: float) -> Point:
+        p = Point(self.lat0 + y / self.ky, self.lon0 + x / self.kx)
+        p.xy = (x, y)
+        return p
+
+    def distance(self, p1, p2) -> float:
+        if self.exact:
+            return distance(p1, p2)
+        x1, y1 = p1.xy or self.project(p1)
+        x2, y2 = p2.xy or self.project(p2)
+        return math.hypot(x2 - x1, y2 - y1)
+
+    def distanceTo(self, point, lat: float, lon: float) -> float:
+        # Distance from point to lat, lon in degrees, no Point created
+        if self.exact:
+            return distanceTo(point, lat, lon)
+        x1, y1 = point.xy or self.project(point)
+        return math.hypot((lon - self.lon0) * self.kx - x1, (lat - self.lat0) * self.ky - y1)
+
+    def bearing(self, src, dst) -> float:
+        if self.exact:
+            return bearing(src, dst)
+        x1, y1 = src.xy or self.project(src)
+        x2, y2 = dst.xy or self.project(dst)
+        return math.degrees(math.atan2(x2 - x1, y2 - y1)) % 360
+
+    def destination(self, src, brngDeg, d) -> Point:
+        if self.exact:
+            return destination(src, brngDeg, d)
+        x, y = src.xy or self.project(src)
+        brng = math.radians(brngDeg)
+        return self.point(x + d * math.sin(brng), y + d * math.cos(brng))
+
+
+EXACT = LocalProjection(exact=True)  # spherical functions
+
+
+def nearestPointToLine(p, line):
+    # Returns the nearest point to p on line and distance to it,
+    # or None if perpendicular to line through p does not cross line.
+    d1 = distance(p, line.start)
+    if d1 == 0:  # < 0.0001 ?
+        return [Point(lat=line.start.lat, lon=line.start.lon), 0.0]
+    d2 = distance(p, line.end)
+    if d2 == 0:
+        return [Point(lat=line.end.lat, lon=line.end.lon), 0.0]
+    dl = max(d1, d2)
+    brng = bearing(line.start, line.end)
+    brng += 90  # perpendicular
+    p1 = destination(p, brng, dl)
+    brng -= 180  # perpendicular
+    p2 = destination(p, brng, dl)
+    perpendicular = Line(p1, p2)
+    intersect = lineintersect(perpendicular, line)
+    if intersect:
+        return [intersect, distance(p, intersect)]
+    return None
+
+
 def nearestPointToLines(p, lines):
     # First the nearest point to a collection of lines.
     # Lines is an array if Line()
@@ -296,25 +403,13 @@ def nearestPointToLines(p, lines):
     nearest = None
     dist = math.inf
     for line in lines:
-        d1 = distance(p, line.start)
-        if d1 == 0:  # < 0.0001 ?
-            return [Point(lat=line.start.lat, lon=line.start.lon), 0.0]
-        d2 = distance(p, line.end)
-        if d2 == 0:
-            return [Point(lat=line.end.lat, lon=line.end.lon), 0.0]
-        dl = max(d1, d2)
-        brng = bearing(line.start, line.end)
-        brng += 90  # perpendicular
-        p1 = destination(p, brng, dl)
-        brng -= 180  # perpendicular
-        p2 = destination(p, brng, dl)
-        perpendicular = Line(p1, p2)
-        intersect = lineintersect(perpendicular, line)
-        if intersect:
-            d = distance(p, intersect)
-            if d < dist:
-                dist = d
-                nearest = intersect
+        found = nearestPointToLine(p, line)
+        if found is None:
+            continue
+        if found[1] == 0:  # p is on line
+            return found
+        if found[1] < dist:
+            nearest, dist = found
 
     return [nearest, dist]
 
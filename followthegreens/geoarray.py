@@ -0,0 +1,133 @@
+# Vectorized geometry
+# Array versions of geo.py distance, bearing, destination and pointInPolygon, for many points at once:
+# distances from aircraft to all lights of a light string, vertices of routing network inside a polygon, etc.
+# Points are held in Coordinates (arrays of latitudes and longitudes), built once by their owner (Graph, LightString).
+# NumPy is used if available, pure Python otherwise.
+# NumPy results are the same as geo.py results, within floating point rounding (pointInPolygon results are identical).
+#
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .geo import R
+
+HAS_NUMPY = np is not None
+
+
+class Coordinates:
+
+    def __init__(self, points: list):
+        # points is a list of Point, in their owner order
+        if HAS_NUMPY:
+            self.lats = np.array([p.lat for p in points], dtype=float)
+            self.lons = np.array([p.lon for p in points], dtype=float)
+        else:
+            self.lats = [p.lat for p in points]
+            self.lons = [p.lon for p in points]
+
+    def __len__(self):
+        return len(self.lats)
+
+
+def distances(position, coords: Coordinates, start: int = 0) -> list:
+    # Distances from position [lat, lon] to coords[start:], in meters
+    lats, lons = coords.lats[start:], coords.lons[start:]
+    lat1, long1 = math.radians(position[0]), math.radians(position[1])
+    if HAS_NUMPY:
+        lat2, long2 = np.radians(lats), np.radians(lons)
+        a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((long2 - long1) / 2) ** 2
+        return 2 * R * np.arcsin(np.sqrt(a))
+    res = []
+    for lat, lon in zip(lats, lons):
+        lat2, long2 = math.radians(lat), math.radians(lon)
+        a = math.pow(math.sin((lat2 - lat1) / 2), 2) + math.cos(lat1) * math.cos(lat2) * math.pow(math.sin((long2 - long1) / 2), 2)
+        res.append(2 * R * math.asin(math.sqrt(a)))
+    return res
+
+
+def closest(position, coords: Coordinates, start: int = 0) -> list:
+    # Returns [index, distance] of coords[start:] closest to position [lat, lon], first one if several, [None, math.inf] if none
+    if len(coords) <= start:
+        return [None, math.inf]
+    d = distances(position, coords, start)
+    if HAS_NUMPY:
+        i = int(np.argmin(d))
+        return [start + i, float(d[i])]
+    i = min(range(len(d)), key=d.__getitem__)
+    return [start + i, d[i]]
+
+
+def bearings(point, coords: Coordinates) -> list:
+    # Bearings from point to coords, in degrees [0, 360[
+    lat1, lon1 = math.radians(point.lat), math.radians(point.lon)
+    if HAS_NUMPY:
+        lat2, lon2 = np.radians(coords.lats), np.radians(coords.lons)
+        y = np.sin(lon2 - lon1) * np.cos(lat2)
+        x = math.cos(lat1) * np.sin(lat2) - math.sin(lat1) * np.cos(lat2) * np.cos(lon2 - lon1)
+        return np.degrees(np.arctan2(y, x)) % 360
+    res = []
+    for lat, lon in zip(coords.lats, coords.lons):
+        lat2, lon2 = math.radians(lat), math.radians(lon)
+        y = math.sin(lon2 - lon1) * math.cos(lat2)
+        x = math.cos(lat1) * math.sin(lat2) - math.sin(lat1) * math.cos(lat2) * math.cos(lon2 - lon1)
+        res.append(math.degrees(math.atan2(y, x)) % 360)
+    return res
+
+
+def destinations(coords: Coordinates, brngDeg, d) -> tuple:
+    # Returns (latitudes, longitudes) of points at distance(s) d in bearing(s) brngDeg from coords.
+    # brngDeg and d are either a number or a sequence the size of coords.
+    if HAS_NUMPY:
+        lat, lon = np.radians(coords.lats), np.radians(coords.lons)
+        brng = np.radians(np.asarray(brngDeg, dtype=float))
+        r = np.asarray(d, dtype=float) / R
+        lat2 = np.arcsin(np.sin(lat) * np.cos(r) + np.cos(lat) * np.sin(r) * np.cos(brng))
+        lon2 = lon + np.arctan2(np.sin(brng) * np.sin(r) * np.cos(lat), np.cos(r) - np.sin(lat) * np.sin(lat2))
+        return np.degrees(lat2), np.degrees(lon2)
+    n = len(coords)
+    brngs = brngDeg if isinstance(brngDeg, (list, tuple)) else [brngDeg] * n
+    dists = d if isinstance(d, (list, tuple)) else [d] * n
+    lats, lons = [], []
+    for i in range(n):
+        lat, lon = math.radians(coords.lats[i]), math.radians(coords.lons[i])
+        brng = math.radians(brngs[i])
+        r = dists[i] / R
+        lat2 = math.asin(math.sin(lat) * math.cos(r) + math.cos(lat) * math.sin(r) * math.cos(brng))
+        lon2 = lon + math.atan2(math.sin(brng) * math.sin(r) * math.cos(lat), math.cos(r) - math.sin(lat) * math.sin(lat2))
+        lats.append(math.degrees(lat2))
+        lons.append(math.degrees(lon2))
+    return lats, lons
+
+
+def pointsInPolygon(coords: Coordinates, polygon) -> list:
+    # Whether each of coords is inside polygon, same test as geo.pointInPolygon() (x is latitude, y is longitude)
+    pol = polygon.coords()
+    if HAS_NUMPY:
+        x, y = coords.lats, coords.lons
+        inside = np.zeros(len(coords), dtype=bool)
+        for i in range(len(pol)):
+            x0, y0 = pol[i]
+            x1, y1 = pol[(i + 1) % len(pol)]
+            if y0 == y1:  # no point strictly between y0 and y1
+                continue
+            cross = (min(y0, y1) < y) & (y <= max(y0, y1)) & (x >= min(x0, x1))
+            cur_x = x0 if x0 == x1 else x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+            inside ^= cross & (x > cur_x)
+        return inside
+    res = []
+    for px, py in zip(coords.lats, coords.lons):
+        inside = False
+        for i in range(len(pol)):
+            x0, y0 = pol[i]
+            x1, y1 = pol[(i + 1) % len(pol)]
+            if not min(y0, y1) < py <= max(y0, y1):
+                continue
+            if px < min(x0, x1):
+                continue
+            cur_x = x0 if x0 == x1 else x0 + (py - y0) * (x1 - x0) / (y1 - y0)
+            inside ^= px > cur_x
+        res.append(inside)
+    return res
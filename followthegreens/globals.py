@@ -220,6 +220,33 @@ SAY_ROUTE = True  # Print route on pop up display and speak it orally.
 LEVEL4 = 0  # ASMGCS LEVEL 4 Compliance steps (highly experimental, DO NOT CHANGE.)
 
 
+# ################################
+# AIRPORT DATA FILES
+#
+class APT_SCANNER(StrEnum):
+    READLINE = "readline"  # reads apt.dat files line by line
+    MMAP = "mmap"  # memory-maps apt.dat files and only looks at airport lines
+
+
+USE_APT_INDEX = True  # Keep an index of airports found in apt.dat files to locate them without scanning files
+APT_FILE_SCANNER = APT_SCANNER.MMAP  # How apt.dat files are scanned when not using the index
+USE_COMPILED_CACHE = True  # Keep airport routing network, runways and ramps in a compiled cache file per airport
+AIRPORT_CACHE_SIZE = 64  # MB, approximate memory budget for prepared airports kept in memory, most recent airport is always kept
+KEEP_APT_LINES = False  # Keep all apt.dat lines of airport in memory after it is prepared, for debugging (dumpAptFile)
+PREFETCH_AIRPORT = False  # Prepare airport aircraft is about to land at in background, before FtG is started
+PREFETCH_ALTITUDE = 1500  # meters above ground, airport is prefetched below that altitude
+PREFETCH_DISTANCE = 25000  # meters, airport is prefetched when aircraft is closer than this distance
+PREFETCH_INTERVAL = 10.0  # seconds, aircraft position is checked for prefetch at this interval
+USE_ROUTING_HIERARCHY = True  # Use contraction hierarchies of airport found in compiled cache for routing (built by compiler with --hierarchy)
+HIERARCHY_MIN_VERTICES = 2000  # Contraction hierarchies are only built for airports with at least this number of routing vertices
+USE_ROUTE_TREES = True  # Keep shortest route trees toward destinations, new greens and re-routes to same destination need no search
+ROUTE_TREES_MAX = 32  # Number of route trees kept per airport, at least one per destination, built in background
+ROUTE_CACHE_SIZE = 64  # Number of routes found kept per airport, same route requested again needs no search, 0 to disable
+USE_LOCAL_PROJECTION = True  # Lights and aircraft progress geometry in airport local plane (metres) rather than on the sphere
+USE_COMPACT_GRAPH = True  # AStar searches (route tree miss, no hierarchy) on a flat array (compressed sparse row) copy of airport routing network
+CONTRACT_CHAINS = True  # AStar searches on compact graph skip vertices that only trace taxiway curves
+
+
 # ################################
 # INTERNALS CONTROL
 # of aircraft movements
@@ -364,6 +391,7 @@ LIGHT_TYPE_OBJFILES = {
 # Values of the following parameters is show on debug
 INTERNAL_CONSTANTS = [
     "LOGGING_LEVEL",
+    "APT_FILE_SCANNER",
     "RESPECT_CONSTRAINTS",
     "USE_THRESHOLD",
     "RABBIT_SPEED",
@@ -376,16 +404,32 @@ INTERNAL_CONSTANTS = [
     "DISTANCE_TO_RAMPS",
     "ADD_LIGHT_AT_LAST_VERTEX",
     "ADD_LIGHT_AT_VERTEX",
+    "AIRPORT_CACHE_SIZE",
+    "CONTRACT_CHAINS",
     "DRIFTING_DISTANCE",
     "DRIFTING_LIMIT",
     "FTG_SPEED_PARAMS",
+    "HIERARCHY_MIN_VERTICES",
+    "KEEP_APT_LINES",
     "LEAD_OFF_RUNWAY_DISTANCE",
     "MIN_SEGMENTS_BEFORE_HOLD",
     "PLANE_MONITOR_DURATION",
+    "PREFETCH_AIRPORT",
+    "PREFETCH_ALTITUDE",
+    "PREFETCH_DISTANCE",
+    "PREFETCH_INTERVAL",
+    "ROUTE_CACHE_SIZE",
+    "ROUTE_TREES_MAX",
     "ROUTING_ALGORITHM",
     "RUNWAY_BUFFER_WIDTH",
     "RUNWAY_LIGHT_LEVEL_WHILE_FTG",
     "TOO_FAR",
+    "USE_APT_INDEX",
+    "USE_COMPACT_GRAPH",
+    "USE_COMPILED_CACHE",
+    "USE_LOCAL_PROJECTION",
+    "USE_ROUTE_TREES",
+    "USE_ROUTING_HIERARCHY",
     "WARNING_DISTANCE",
     "MAINWINDOW_FROM_BOTTOM",
     "MAINWINDOW_FROM_LEFT",
@@ -399,9 +443,12 @@ INTERNAL_CONSTANTS = [
 ALL_INTERNAL_CONSTANTS = [
     "ADD_LIGHT_AT_LAST_VERTEX",
     "ADD_LIGHT_AT_VERTEX",
+    "AIRPORT_CACHE_SIZE",
     "AIRPORTLIGHT_ON",
     "AMBIANT_RWY_LIGHT_CMDROOT",
     "AMBIANT_RWY_LIGHT_VALUE",
+    "APT_FILE_SCANNER",
+    "CONTRACT_CHAINS",
     "DISTANCE_BETWEEN_GREEN_LIGHTS",
     "DISTANCE_BETWEEN_LIGHTS",
     "DISTANCE_BETWEEN_STOPLIGHTS",
@@ -425,6 +472,8 @@ ALL_INTERNAL_CONSTANTS = [
     "FTG_SPEED_COMMAND",
     "FTG_SPEED_COMMAND_DESC",
     "FTG_SPEED_PARAMS",
+    "HIERARCHY_MIN_VERTICES",
+    "KEEP_APT_LINES",
     "LEAD_OFF_RUNWAY_DISTANCE",
     "LIGHT_TYPE_OBJFILES",
     "LIGHTS_AHEAD",
@@ -439,6 +488,8 @@ ALL_INTERNAL_CONSTANTS = [
     "PLANE_MONITOR_DURATION",
     "RABBIT_SPEED",
     "RABBIT_LENGTH",
+    "ROUTE_CACHE_SIZE",
+    "ROUTE_TREES_MAX",
     "ROUTING_ALGORITHM",
     "RUNWAY_BUFFER_WIDTH",
     "RUNWAY_LIGHT_LEVEL_WHILE_FTG",
@@ -447,6 +498,12 @@ ALL_INTERNAL_CONSTANTS = [
     "STW_COMMAND_DESC",
     "STW_MENU",
     "TOO_FAR",
+    "USE_APT_INDEX",
+    "USE_COMPACT_GRAPH",
+    "USE_COMPILED_CACHE",
+    "USE_LOCAL_PROJECTION",
+    "USE_ROUTE_TREES",
+    "USE_ROUTING_HIERARCHY",
     "USE_THRESHOLD",
     "RESPECT_CONSTRAINTS",
     "WARNING_DISTANCE",
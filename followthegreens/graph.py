@@ -5,16 +5,17 @@
 #
 import os
 import math
+import heapq
 from functools import reduce
 
 from .geo import (
+    EXACT,
     Point,
     Line,
     Polygon,
     FeatureCollection,
     bearing,
     distance,
-    nearestPointToLines,
     destination,
     pointInPolygon,
     turn,
@@ -27,18 +28,37 @@ from .globals import (
     TAXIWAY_ACTIVE,
     TAXIWAY_DIRECTION,
 )
+from .spatial import GridIndex, SegmentIndex
+from .geoarray import Coordinates
+
+# Edge attributes, as bits of Edge.flags, used by routing profiles to ignore edges
+EDGE_RUNWAY = 1
+EDGE_ONEWAY = 2
+EDGE_INNER = 4  # Edge.is_inner
+EDGE_OUTER = 8  # Edge.is_outer
+EDGE_WIDTH = {code: 16 << i for i, code in enumerate(TAXIWAY_WIDTH_CODE)}  # one bit per width code
+
+# Restrictions broken by a route, as bits, by increasing importance.
+# Comparing broken restrictions as numbers compares their importance: breaking one restriction is worse
+# than breaking all less important restrictions.
+BROKEN_ONEWAY = 1  # one way edge used in reverse direction
+BROKEN_RUNWAY = 2  # runway edge used for taxiing
+BROKEN_WIDTH = 4  # edge not wide enough for aircraft
 
 
 class Vertex(Point):  ## Vertex(Point)
+    __slots__ = ("id", "usage", "name", "adjacent", "contraflow")
+
     def __init__(self, node, point, usage, name=""):
         Point.__init__(self, point.lat, point.lon)
         self.id = node
         self.usage = usage
         self.name = name
         self.adjacent = {}
-        self.setProp("vid", node)  # vertex id
+        self.contraflow = {}  # {neighbor vertex id: one way edge from neighbor to this vertex}
 
     def props(self):
+        self.setProp("vid", self.id)  # vertex id
         self.setProp("marker-color", "#888888")  # “dest”, “init”, “both” or “junc”
         if self.usage == "dest":
             self.setProp("marker-color", "#00aa00")
@@ -53,23 +73,24 @@ class Vertex(Point):  ## Vertex(Point)
         self.setProp("marker-size", "small")
         return self.properties
 
-    def add_neighbor(self, neighbor, weight=0):
-        self.adjacent[neighbor] = weight
+    def add_neighbor(self, neighbor, edge):
+        # adjacent is {neighbor vertex id: edge to reach it}
+        self.adjacent[neighbor] = edge
         # note: cannot add opposite neighbor.add_neighbor(self) since might be one way only
 
     def get_connections(self, graph, options={}):
         return self.adjacent.keys()
 
     def get_neighbors(self):
-        return list(map(lambda a: (a, self.adjacent[a]), self.adjacent))
+        return [(a, e.cost) for a, e in self.adjacent.items()]
 
     def turn(self, src, dst) -> float | None:
         # Turn angle coming from src and going to dst
         # Will be used as a weighted extra cost when visited from src to dst
         if src.id not in self.adjacent and self.id not in src.adjacent:
-            logger.warning(f"turn: at {self.id}: from {src.id} to {dst.id}, src not in adjacents {self.adjacent} or self not in src {src.adjacent} ({type(self.id)})")
+            logger.warning(f"turn: at {self.id}: from {src.id} to {dst.id}, src not in adjacents {list(self.adjacent)} or self not in src {list(src.adjacent)} ({type(self.id)})")
         if dst.id not in self.adjacent and self.id not in dst.adjacent:
-            logger.warning(f"turn: at {self.id}: from {src.id} to {dst.id}, dst not in adjacents {self.adjacent} or self not in dst {dst.adjacent} ({type(self.id)})")
+            logger.warning(f"turn: at {self.id}: from {src.id} to {dst.id}, dst not in adjacents {list(self.adjacent)} or self not in dst {list(dst.adjacent)} ({type(self.id)})")
         b1 = bearing(src, self)
         b2 = bearing(self, dst)
         return turn(b1, b2)
@@ -87,6 +108,8 @@ class Active:
 
 
 class Edge(Line):
+    __slots__ = ("name", "cost", "direction", "usage", "width_code", "usage2", "active", "flags")
+
     def __init__(self, src, dst, cost, direction, usage, name):
         Line.__init__(self, src, dst)
         self.name = name  # segment name, not unique! For documentation only.
@@ -113,6 +136,22 @@ class Edge(Line):
         self.active = []  # array of segment activity, activity can be departure, arrival, or ils.
         # departure require clearance. plane cannot stop on segment of type ils.
 
+        self.flags = self.mkFlags()
+
+    def mkFlags(self) -> int:
+        flags = 0
+        if self.usage == TAXIWAY_TYPE.RUNWAY:
+            flags = flags | EDGE_RUNWAY
+        if self.direction == TAXIWAY_DIRECTION.ONEWAY:
+            flags = flags | EDGE_ONEWAY
+        if self.is_inner:
+            flags = flags | EDGE_INNER
+        if self.is_outer:
+            flags = flags | EDGE_OUTER
+        if self.width_code is not None:
+            flags = flags | EDGE_WIDTH[self.width_code]
+        return flags
+
     def props(self):
         props = self.properties
         props["stroke"] = "#000080"  # “taxiway”, “runway”, runway dark blue
@@ -190,11 +229,102 @@ class Edge(Line):
         return ret.strip("/")
 
 
+class RoutingProfile:
+    # Restrictions applied to the graph while searching for a route.
+    # Edges that cannot be used are ignored during the search, graph is not cloned.
+    # Same restrictions as Graph.clone().
+    # If relaxed, width, runway and one way restrictions can be broken, Graph.AStarRelaxed()
+    # then finds the route that breaks the least important restrictions in a single search.
+    def __init__(
+        self,
+        width_code: TAXIWAY_WIDTH_CODE | None,
+        move: MOVEMENT,
+        respect_width: bool = False,
+        respect_inner: bool = False,
+        use_runway: bool = True,
+        respect_oneway: bool = True,
+        relaxed: bool = False,
+    ):
+        self.restrictions = (width_code, move, respect_width, respect_inner, use_runway, respect_oneway)
+        self.width = 0  # edges not wide enough
+        if respect_width and width_code is not None:
+            for code, flag in EDGE_WIDTH.items():
+                if width_code.value > code.value:  # not wide enough
+                    self.width = self.width | flag
+        self.exclude = 0  # edges with any of these flags cannot be used
+        if respect_inner:
+            if move == MOVEMENT.ARRIVAL:  # arrival cannot use outer rwy
+                self.exclude = self.exclude | EDGE_OUTER
+            if move == MOVEMENT.DEPARTURE:  # departure cannot use inner rwy
+                self.exclude = self.exclude | EDGE_INNER
+        self.runway = 0 if use_runway else EDGE_RUNWAY  # cannot use runway for taxiing
+        self.oneway = EDGE_ONEWAY if respect_oneway else 0
+        self.relaxed = relaxed
+        if relaxed:
+            self.contraflow = True
+        else:
+            self.exclude = self.exclude | self.width | self.runway
+            self.contraflow = not respect_oneway  # one way edges can be used in both directions
+        self.name = f"{move},{width_code},{respect_width},{respect_inner},{use_runway},{respect_oneway}{',relaxed' if relaxed else ''}"
+
+    def __str__(self):
+        return self.name
+
+    def allows(self, edge) -> bool:
+        return edge.flags & self.exclude == 0
+
+    def strict(self):
+        # Same restrictions, not relaxed
+        return RoutingProfile(*self.restrictions) if self.relaxed else self
+
+    def levels(self) -> list:
+        # Profiles of successive searches equivalent to relaxed search, by increasing restrictions broken
+        width_code, move, respect_width, respect_inner, use_runway, respect_oneway = self.restrictions
+        return [
+            RoutingProfile(
+                width_code,
+                move,
+                respect_width=respect_width and (broken & BROKEN_WIDTH == 0),
+                respect_inner=respect_inner,
+                use_runway=use_runway or (broken & BROKEN_RUNWAY != 0),
+                respect_oneway=respect_oneway and (broken & BROKEN_ONEWAY == 0),
+            )
+            for broken in range((BROKEN_WIDTH | BROKEN_RUNWAY | BROKEN_ONEWAY) + 1)
+        ]
+
+    def breaks(self, edge, src) -> int:
+        # Restrictions broken when travelling edge from src
+        broken = 0
+        if edge.flags & self.width != 0:
+            broken = BROKEN_WIDTH
+        if edge.flags & self.runway != 0:
+            broken = broken | BROKEN_RUNWAY
+        if edge.flags & self.oneway != 0 and edge.start.id != src:
+            broken = broken | BROKEN_ONEWAY
+        return broken
+
+    def tag(self, graph, route: list) -> str:
+        # Restrictions respected by route: W?IN?R?O? = respect width/(inner not respected)/use runway/respect one way
+        broken = 0
+        for i in range(len(route) - 1):
+            broken = broken | self.breaks(graph.get_edge(route[i], route[i + 1], self), route[i])
+        return f"W{'N' if broken & BROKEN_WIDTH else 'Y'}INR{'Y' if broken & BROKEN_RUNWAY else 'N'}O{'N' if broken & BROKEN_ONEWAY else 'Y'}"
+
+
 class Graph:  # Graph(FeatureCollection)?
     def __init__(self, name: str = "unamed"):
         self.name = name
         self.vert_dict = {}
         self.edges_arr = []
+        self.edges_dict = {}  # {(src, dst): edge}, twoway edges are registered in both directions
+        self.hierarchies = {}  # {profile key: contraction hierarchy}, see hierarchy.py
+        self.trees = None  # shortest route trees toward destinations, see routetree.py
+        self.grid = None  # spatial index of vertices, built on first use
+        self.segments = None  # spatial index of edges, built on first use
+        self.coordinates = None  # coordinates of vertices for vectorized geometry, built on first use
+        self.projection = EXACT  # local projection of airport, see Airport.mkProjection()
+        self.compact = None  # flat array copy of graph for route searches, see csr.py
+        self.flags = 0  # flags of all edges
 
         # Try to guess if information is supplied or not
         self._uses_width_code = False
@@ -261,13 +391,39 @@ class Graph:  # Graph(FeatureCollection)?
     def add_vertex(self, node, point, usage, name=""):
         new_vertex = Vertex(node, point, usage, name="")
         self.vert_dict[node] = new_vertex
+        self.grid = None
+        self.compact = None
+        self.coordinates = None
         return new_vertex
 
+    def get_grid(self) -> GridIndex:
+        if self.grid is None:
+            self.grid = GridIndex(self.vert_dict.values())
+        return self.grid
+
+    def get_coordinates(self) -> Coordinates:
+        # Coordinates of vertices, in vert_dict order
+        if self.coordinates is None:
+            self.coordinates = Coordinates(list(self.vert_dict.values()))
+        return self.coordinates
+
+    def get_segments(self) -> SegmentIndex:
+        if self.segments is None:
+            self.segments = SegmentIndex(self.edges_arr)
+        return self.segments
+
     def get_vertex(self, n):
         return self.vert_dict.get(n)
 
     # Options taxiwayOnly = True|False, minSizeCode = {A,B,C,D,E,F}
-    def get_connections(self, src, options={}):
+    # Profile restricts connections to edges it allows, options are then ignored.
+    def get_connections(self, src, options={}, profile: RoutingProfile | None = None):
+        if profile is not None:
+            connectionKeys = [dst for dst, e in src.adjacent.items() if profile.allows(e)]
+            if profile.contraflow:
+                connectionKeys = connectionKeys + [dst for dst, e in src.contraflow.items() if dst not in connectionKeys and profile.allows(e)]
+            return connectionKeys
+
         if len(options) > 0:
             connectionKeys = []
             for dst in src.adjacent.keys():
@@ -285,14 +441,40 @@ class Graph:  # Graph(FeatureCollection)?
 
         return src.adjacent.keys()
 
+    def is_connected(self, vertex, profile: RoutingProfile | None = None, incoming: bool = False) -> bool:
+        # Vertex can be left using an edge allowed by profile, or reached using an allowed edge if incoming
+        if profile is None:
+            return len(vertex.adjacent) > 0 or (incoming and len(vertex.contraflow) > 0)
+        for e in vertex.adjacent.values():
+            if profile.allows(e):
+                return True
+        if incoming or profile.contraflow:
+            for e in vertex.contraflow.values():
+                if profile.allows(e):
+                    return True
+        return False
+
     def add_edge(self, edge):
         if edge.start.id in self.vert_dict and edge.end.id in self.vert_dict:
             self.edges_arr.append(edge)
-            self.vert_dict[edge.start.id].add_neighbor(self.vert_dict[edge.end.id].id, edge.cost)
+            self.segments = None
+            self.compact = None
+            self.vert_dict[edge.start.id].add_neighbor(self.vert_dict[edge.end.id].id, edge)
+            # First edge from src to dst is kept, it replaces a twoway edge from dst to src registered in reverse direction.
+            key = (edge.start.id, edge.end.id)
+            found = self.edges_dict.get(key)
+            if found is None or found.start.id != edge.start.id:
+                self.edges_dict[key] = edge
 
             if edge.direction == TAXIWAY_DIRECTION.TWOWAY:
-                self.vert_dict[edge.end.id].add_neighbor(self.vert_dict[edge.start.id].id, edge.cost)
+                self.vert_dict[edge.end.id].add_neighbor(self.vert_dict[edge.start.id].id, edge)
+                key = (edge.end.id, edge.start.id)
+                if key not in self.edges_dict:
+                    self.edges_dict[key] = edge
+            else:
+                self.vert_dict[edge.end.id].contraflow[edge.start.id] = edge
             # Check if information is available
+            self.flags = self.flags | edge.flags
             if edge.width_code is not None:
                 self._uses_width_code = True
             if edge.direction == TAXIWAY_DIRECTION.ONEWAY:
@@ -339,8 +521,6 @@ class Graph:  # Graph(FeatureCollection)?
                 continue
 
             # if not excluded, add it
-            if not respect_oneway and e.direction == TAXIWAY_DIRECTION.ONEWAY:
-                e.direction = TAXIWAY_DIRECTION.TWOWAY
             candidates.append(e)
 
         graph = Graph(f"{self.name} cloned with restrictions ({move},{width_code},{respect_width},{respect_inner},{use_runway},{respect_oneway})")
@@ -354,7 +534,8 @@ class Graph:  # Graph(FeatureCollection)?
             t = e.usage.value
             if e.width_code is not None:
                 t = t + "_" + e.width_code.value
-            e2 = Edge(start, end, e.cost, e.direction.value, t, e.name)
+            direction = e.direction if respect_oneway else TAXIWAY_DIRECTION.TWOWAY  # do not change original graph, it is shared
+            e2 = Edge(start, end, e.cost, direction.value, t, e.name)
             # copies extra info
             e2.active = e.active.copy()
             graph.add_edge(e2)
@@ -365,20 +546,22 @@ class Graph:  # Graph(FeatureCollection)?
         )
         return graph
 
-    def get_edge(self, src, dst):
-        arr = list(filter(lambda x: x.start.id == src and x.end.id == dst, self.edges_arr))
-        if len(arr) > 0:
-            return arr[0]
-
-        arr = list(
-            filter(
-                lambda x: x.start.id == dst and x.end.id == src and x.direction == TAXIWAY_DIRECTION.TWOWAY,
-                self.edges_arr,
-            )
-        )
-        if len(arr) > 0:
-            return arr[0]
-
+    def get_edge(self, src, dst, profile: RoutingProfile | None = None):
+        # Edge from src to dst, or twoway edge from dst to src.
+        # With profile, edge allowed by profile, or one way edge from dst to src if profile allows contraflow.
+        edge = self.edges_dict.get((src, dst))
+        if profile is None or (edge is not None and profile.allows(edge)):
+            return edge
+        vertex = self.vert_dict.get(src)
+        if vertex is None:
+            return None
+        edge = vertex.adjacent.get(dst)
+        if edge is not None and profile.allows(edge):
+            return edge
+        if profile.contraflow:
+            edge = vertex.contraflow.get(dst)
+            if edge is not None and profile.allows(edge):
+                return edge
         return None
 
     def get_vertices(self):
@@ -404,61 +587,68 @@ class Graph:  # Graph(FeatureCollection)?
 
         return connected
 
-    def findClosestPointOnEdges(self, point):  # @todo: construct array of lines on "add_edge"
-        return nearestPointToLines(point, self.edges_arr)
-
-    def findClosestVertex(self, point):
-        closest = None
-        shortest = math.inf
-        for n, v in self.vert_dict.items():
-            if len(v.adjacent) > 0:  # It must be a vertex connected to the network of taxiways
-                d = distance(v, point)
-                if d < shortest:
-                    shortest = d
-                    closest = n
+    def findClosestPointOnEdges(self, point):
+        return self.get_segments().nearestPoint(point)
+
+    def findClosestVertex(self, point, profile: RoutingProfile | None = None):
+        # It must be a vertex connected to the network of taxiways
+        v, shortest = self.get_grid().nearest(point, lambda v: self.is_connected(v, profile))
+        closest = v.id if v is not None else None
         logger.debug(f"{closest} at {round(shortest, 1)}m")
         return [closest, shortest]
 
-    def findVertexInPolygon(self, polygon):
-        vertices = []
-        for n, v in self.vert_dict.items():
-            if pointInPolygon(v, polygon):
-                vertices.append(v)
-        return vertices
+    def findVertexInPolygon(self, polygon, profile: RoutingProfile | None = None):
+        # With profile, only vertices on edges allowed by profile
+        if profile is None:
+            return self.get_grid().inPolygon(polygon)
+        return self.get_grid().inPolygon(polygon, lambda v: self.is_connected(v, profile, incoming=True))
 
-    def findClosestVertexAheadGuess(self, point, brng, speed):
+    def findClosestVertexAheadGuess(self, point, brng, speed, profile: RoutingProfile | None = None):
+        # Same as successive findClosestVertexAhead() with growing triangles until a vertex is found,
+        # but vertices are looked up once, in the grid cells under all triangles.
         MAX_AHEAD = 500  # m, we could make algorithm grow these until vertex found "ahead"
         MAX_LATERAL = 200  # m
         AHEAD_START = 300
         LATERAL_START = 40
         AHEAD_INC = 100
         LATERAL_INC = 20
-        found = [None]
+        tries = []
         ahead = AHEAD_START
-        lateral = LATERAL_START
-
-        while not found[0] and ahead < MAX_AHEAD:
-            while not found[0] and lateral < MAX_LATERAL:
-                found = self.findClosestVertexAhead(point, brng, speed, ahead, lateral)
+        while ahead < MAX_AHEAD:
+            lateral = LATERAL_START
+            while lateral < MAX_LATERAL:
+                tries.append((ahead, lateral, self.triangleAhead(point, brng, ahead, lateral)))
                 lateral += LATERAL_INC
             ahead += AHEAD_INC
-            lateral = LATERAL_START
-        logger.debug(f"found at ahead={ahead}, lateral={lateral}")
-        return found
-
-    def findClosestVertexAhead(self, point, brng, speed, ahead=200, lateral=100):
+        candidates = self.get_grid().inBox([p for t in tries for p in t[2].coordinates])
+        connected = {}  # {vertex id: connected}, connection checked once per vertex
+        for ahead, lateral, triangle in tries:
+            vertices = []
+            for v in candidates:
+                if pointInPolygon(v, triangle):
+                    if v.id not in connected:
+                        connected[v.id] = profile is None or self.is_connected(v, profile, incoming=True)
+                    if connected[v.id]:
+                        vertices.append(v)
+            if len(vertices) > 0:
+                logger.debug(f"found at ahead={ahead}, lateral={lateral}")
+                return self.closestAhead(point, brng, ahead, vertices)
+        logger.debug("not found")
+        return [None, math.inf]
+
+    def triangleAhead(self, point, brng, ahead, lateral) -> Polygon:
         # We draw a triangle in front of the plane, plane is at apex, base is AHEAD meters in front (bearing)
         # and LATERAL meters wide left and right.
-        # Should set maxahead from speed, if fast, maxahead large.
-        MAX_AHEAD = 200  # m
-        maxpoint = destination(point, brng, MAX_AHEAD)
         base = destination(point, brng, ahead)
         baseL = destination(base, brng + 90, lateral)
         baseR = destination(base, brng - 90, lateral)
-        triangle = Polygon([point, baseL, baseR])
-        vertices = self.findVertexInPolygon(triangle)
-        logger.debug(f"{ahead}, {lateral}, inside {len(vertices)}")
+        return Polygon([point, baseL, baseR])
 
+    def closestAhead(self, point, brng, ahead, vertices):
+        # Should set maxahead from speed, if fast, maxahead large.
+        MAX_AHEAD = 200  # m
+        maxpoint = destination(point, brng, MAX_AHEAD)
+        base = destination(point, brng, ahead)
         v = None
         d = math.inf
         if len(vertices) > 0:
@@ -475,51 +665,55 @@ class Graph:  # Graph(FeatureCollection)?
             return [v.id, d]
         return [None, d]
 
-    def Dijkstra(self, source, target, options={}):
+    def findClosestVertexAhead(self, point, brng, speed, ahead=200, lateral=100, profile: RoutingProfile | None = None):
+        triangle = self.triangleAhead(point, brng, ahead, lateral)
+        vertices = self.findVertexInPolygon(triangle, profile)
+        logger.debug(f"{ahead}, {lateral}, inside {len(vertices)}")
+        return self.closestAhead(point, brng, ahead, vertices)
+
+    def Dijkstra(self, source, target, options={}, profile: RoutingProfile | None = None):
         # This will store the Shortest path between source and target node
         route = []
         if not source or not target:
             logger.warning("source or target missing")
             return route
 
-        # These are all the nodes which have not been visited yet
-        unvisited_nodes = list(self.get_vertices())
-        # logger.debug("Unvisited nodes", unvisited_nodes)
-        # It will store the shortest distance from one node to another
+        # It will store the shortest distance from source to nodes reached so far
         shortest_distance = {}
         # It will store the predecessors of the nodes
         predecessor = {}
-
-        # Iterating through all the unvisited nodes
-        for nodes in unvisited_nodes:
-            # Setting the shortest_distance of all the nodes as infinty
-            shortest_distance[nodes] = math.inf
+        # Nodes already visited (also known as relaxed), their shortest distance is final
+        visited = set()
+        # Nodes at equal distance are visited in vertex order, like a linear scan of all vertices would do
+        order = {n: i for i, n in enumerate(self.vert_dict)}
 
         # The distance of a point to itself is 0.
         shortest_distance[str(source)] = 0
+        # Priority queue of (distance, order, node) to visit, a node may appear more than once
+        # with decreasing distances, only its first appearance (shortest distance) is used.
+        queue = [(0, order.get(str(source), -1), str(source))]
+
+        # Running the loop until target is visited or all reachable nodes have been visited
+        while queue:
+            # closest node not visited yet
+            dist, i, min_node = heapq.heappop(queue)
+            if min_node in visited:  # already visited with a shorter distance
+                continue
+            visited.add(min_node)
+            if min_node == target:  # shortest distance to target is final, no need to go further
+                break
 
-        # Running the loop while all the nodes have been visited
-        while unvisited_nodes:
-            # setting the value of min_node as None
-            min_node = None
-            # iterating through all the unvisited node
-            for current_node in unvisited_nodes:
-                # For the very first time that loop runs this will be called
-                if min_node is None:
-                    # Setting the value of min_node as the current node
-                    min_node = current_node
-                elif shortest_distance[min_node] > shortest_distance[current_node]:
-                    # I the value of min_node is less than that of current_node, set
-                    # min_node as current_node
-                    min_node = current_node
-
+            vertex = self.get_vertex(min_node)
+            if vertex is None:
+                continue
             # Iterating through the connected nodes of current_node (for
             # example, a is connected with b and c having values 10 and 3
             # respectively) and the weight of the edges
-            connected = self.get_connections(self.get_vertex(min_node), options)
-            # logger.debug("connected %s %s", min_node, connected)
+            connected = self.get_connections(vertex, options, profile)
             for child_node in connected:
-                e = self.get_edge(min_node, child_node)  # should always be found...
+                if child_node in visited:
+                    continue
+                e = self.get_edge(min_node, child_node, profile)  # should always be found...
                 cost = e.cost
 
                 # checking if the value of the current_node + value of the edge
@@ -527,14 +721,12 @@ class Graph:  # Graph(FeatureCollection)?
                 # is lesser than the value that distance between current nodes
                 # and its connections
                 #
-                if (cost + shortest_distance[min_node]) < shortest_distance[child_node]:
+                if (cost + dist) < shortest_distance.get(child_node, math.inf):
                     # If true  set the new value as the minimum distance of that connection
-                    shortest_distance[child_node] = cost + shortest_distance[min_node]
+                    shortest_distance[child_node] = cost + dist
                     # Adding the current node as the predecessor of the child node
                     predecessor[child_node] = min_node
-
-            # After the node has been visited (also known as relaxed) remove it from unvisited node
-            unvisited_nodes.remove(min_node)
+                    heapq.heappush(queue, (cost + dist, order.get(child_node, -1), child_node))
 
         # Till now the shortest distance between the source node and target node
         # has been found. Set the current node as the target node
@@ -574,7 +766,7 @@ class Graph:  # Graph(FeatureCollection)?
             return math.inf
         return distance(va, vb)
 
-    def get_neighbors(self, a):
+    def get_neighbors(self, a, profile: RoutingProfile | None = None):
         """
         Returns a vertex's neighbors with weight to reach.
         """
@@ -582,20 +774,38 @@ class Graph:  # Graph(FeatureCollection)?
         if v is None:
             logger.warning(f"vertex not found: {a}")
             return []
+        if profile is not None:
+            neighbors = [(m, e.cost) for m, e in v.adjacent.items() if profile.allows(e)]
+            if profile.contraflow:
+                neighbors = neighbors + [(m, e.cost) for m, e in v.contraflow.items() if m not in v.adjacent and profile.allows(e)]
+            return neighbors
         return v.get_neighbors()
 
-    def AStar(self, start_node, stop_node):
-        # open_list is a list of nodes which have been visited, but who's neighbors
-        # haven't all been inspected, starts off with the start node
-        # closed_list is a list of nodes which have been visited
+    def AStar(self, start_node, stop_node, profile: RoutingProfile | None = None):
+        # open_list is a priority queue of nodes which have been visited, but who's neighbors
+        # haven't all been inspected, ordered by f() - evaluation function, starts off with the start node.
+        # A node may appear more than once in open_list, only its best (last) evaluation is used.
+        # closed_list is a set of nodes which have been visited
         # and who's neighbors have been inspected
         #
         # Stolen here: https://stackabuse.com/basic-ai-concepts-a-search-algorithm/
         # Heuristics adjusted for geography (direct distance to target, necessarily smaller or equal to goal)
+        # Heuristics of a node is computed once per search.
         #
         # Returns list of vertices (path) or None
         #
-        open_list = set([start_node])
+        goal = self.get_vertex(stop_node)
+        if goal is None or self.get_vertex(start_node) is None:
+            logger.warning(f"AStar: invalid vertex id {start_node} or {stop_node}")
+            return None
+
+        h = {}
+
+        def heuristic(n):
+            if n not in h:
+                h[n] = distance(self.vert_dict[n], goal)
+            return h[n]
+
         closed_list = set([])
 
         # g contains current distances from start_node to all other nodes
@@ -608,17 +818,13 @@ class Graph:  # Graph(FeatureCollection)?
         parents = {}
         parents[start_node] = start_node
 
-        while len(open_list) > 0:
-            n = None
+        open_list = [(heuristic(start_node), start_node)]
 
-            # find a node with the lowest value of f() - evaluation function
-            for v in open_list:
-                if n is None or g[v] + self.heuristic(v, stop_node) < g[n] + self.heuristic(n, stop_node):
-                    n = v
-
-            if n is None:
-                logger.warning(f"AStar: could not find route from {start_node} to {stop_node}")
-                return None
+        while len(open_list) > 0:
+            # node with the lowest value of f()
+            f, n = heapq.heappop(open_list)
+            if n in closed_list or f > g[n] + heuristic(n):  # outdated evaluation
+                continue
 
             # if the current node is the stop_node
             # then we begin reconstructin the path from it to the start_node
@@ -632,31 +838,80 @@ class Graph:  # Graph(FeatureCollection)?
                 logger.info("..found")
                 return reconst_path
 
+            # n's neighbors are all inspected below
+            closed_list.add(n)
+
             # for all neighbors of the current node do
-            for m, weight in self.get_neighbors(n):
-                # if the current node isn't in both open_list and closed_list
-                # add it to open_list and note n as it's parent
-                if m not in open_list and m not in closed_list:
-                    open_list.add(m)
-                    parents[m] = n
+            for m, weight in self.get_neighbors(n, profile):
+                # check if it's quicker to first visit n, then m
+                # and if it is, update parent data and g data
+                # and if the node was in the closed_list, move it back to open_list
+                if m not in g or g[m] > g[n] + weight:
                     g[m] = g[n] + weight
+                    parents[m] = n
+                    closed_list.discard(m)
+                    heapq.heappush(open_list, (g[m] + heuristic(m), m))
 
-                # otherwise, check if it's quicker to first visit n, then m
-                # and if it is, update parent data and g data
-                # and if the node was in the closed_list, move it to open_list
-                else:
-                    if g[m] > g[n] + weight:
-                        g[m] = g[n] + weight
-                        parents[m] = n
+        logger.warning(f"AStar: could not find route from {start_node} to {stop_node}")
+        return None
 
-                        if m in closed_list:
-                            closed_list.remove(m)
-                            open_list.add(m)
+    def AStarRelaxed(self, start_node, stop_node, profile: RoutingProfile):
+        # AStar where restrictions of relaxed profile can be broken.
+        # Search states are (vertex, restrictions broken to reach it), evaluated by restrictions broken first, then f().
+        # Returns the shortest route among routes that break the least important restrictions,
+        # the route successive searches with fewer and fewer restrictions would find, in a single search.
+        #
+        # Returns list of vertices (path) or None
+        #
+        goal = self.get_vertex(stop_node)
+        if goal is None or self.get_vertex(start_node) is None:
+            logger.warning(f"AStarRelaxed: invalid vertex id {start_node} or {stop_node}")
+            return None
 
-            # remove n from the open_list, and add it to closed_list
-            # because all of his neighbors were inspected
-            open_list.remove(n)
-            closed_list.add(n)
+        h = {}
 
-        logger.warning(f"AStar: could not find route from {start_node} to {stop_node}")
+        def heuristic(n):
+            if n not in h:
+                h[n] = distance(self.vert_dict[n], goal)
+            return h[n]
+
+        start = (start_node, 0)
+        g = {start: 0}
+        parents = {start: start}
+        closed_list = {}  # {vertex: [(broken, g)]} states whose neighbors have been inspected
+        open_list = [(0, heuristic(start_node), start_node)]
+
+        while len(open_list) > 0:
+            broken, f, n = heapq.heappop(open_list)
+            state = (n, broken)
+            if f > g[state] + heuristic(n):  # outdated evaluation
+                continue
+            # state is useless if vertex was reached breaking less (or same) restrictions with shorter distance
+            closed = closed_list.setdefault(n, [])
+            if any([b & ~broken == 0 and d <= g[state] for b, d in closed]):
+                continue
+
+            if n == stop_node:
+                reconst_path = []
+                while parents[state] != state:
+                    reconst_path.append(state[0])
+                    state = parents[state]
+                reconst_path.append(start_node)
+                reconst_path.reverse()
+                logger.info("..found")
+                return reconst_path
+
+            closed.append((broken, g[state]))
+
+            vertex = self.vert_dict[n]
+            for m, e in list(vertex.adjacent.items()) + [(m, e) for m, e in vertex.contraflow.items() if m not in vertex.adjacent]:
+                if not profile.allows(e):
+                    continue
+                next_state = (m, broken | profile.breaks(e, n))
+                if next_state not in g or g[next_state] > g[state] + e.cost:
+                    g[next_state] = g[state] + e.cost
+                    parents[next_state] = state
+                    heapq.heappush(open_list, (next_state[1], g[next_state] + heuristic(m), m))
+
+        logger.warning(f"AStarRelaxed: could not find route from {start_node} to {stop_node}")
         return None
@@ -0,0 +1,252 @@
+# Contraction hierarchies
+# Optional preprocessing of large airport routing networks for very fast shortest route queries.
+# Vertices are contracted one at a time, least important first. When a vertex is contracted,
+# a shortcut is added between two of its neighbors if the route through the vertex is their only shortest route.
+# Route query is a bidirectional Dijkstra that only goes "up" in the hierarchy,
+# shortcuts of the route are then unpacked into original vertices.
+# A hierarchy is built for a graph and a routing profile (edges allowed, one ways).
+# Hierarchies are kept in Graph.hierarchies, and in compiled airport cache.
+#
+import heapq
+import math
+
+from .globals import logger
+from .graph import Graph, RoutingProfile, EDGE_ONEWAY
+
+WITNESS_SETTLED = 200  # max vertices settled by witness search, a shortcut is added if no witness found in limit
+
+
+def profileKey(graph: Graph, profile: RoutingProfile | None) -> str | None:
+    # Profiles that allow the same edges of graph have the same key
+    if profile is None:
+        return "0:0"
+    if profile.relaxed:
+        logger.warning(f"relaxed profile {profile} has no hierarchy")
+        return None
+    contraflow = 1 if profile.contraflow and graph.flags & EDGE_ONEWAY != 0 else 0
+    return f"{profile.exclude & graph.flags}:{contraflow}"
+
+
+def findHierarchy(graph: Graph, profile: RoutingProfile | None):
+    # Returns hierarchy of graph for profile, None if there is none
+    key = profileKey(graph, profile) if len(graph.hierarchies) > 0 else None
+    if key is None:
+        return None
+    hierarchy = graph.hierarchies.get(key)
+    if type(hierarchy) is dict:  # compiled data, decoded on first use
+        hierarchy = ContractionHierarchy.fromCompiled(hierarchy)
+        graph.hierarchies[key] = hierarchy
+    return hierarchy
+
+
+def mkHierarchies(graph: Graph, profiles: list) -> int:
+    # Builds hierarchies of graph for profiles, if not already built. Returns number of hierarchies built.
+    count = 0
+    for profile in profiles:
+        key = profileKey(graph, profile)
+        if key is None or key in graph.hierarchies:
+            continue
+        graph.hierarchies[key] = ContractionHierarchy(graph, profile)
+        count = count + 1
+    return count
+
+
+class ContractionHierarchy:
+
+    def __init__(self, graph: Graph | None = None, profile: RoutingProfile | None = None):
+        self.rank = {}  # {vertex id: contraction order}
+        self.up = {}  # {vertex id: [(higher vertex id, cost)]} arcs to higher vertices
+        self.down = {}  # {vertex id: [(higher vertex id, cost)]} arcs from higher vertices
+        self.middle = {}  # {(src, dst): vertex id} contracted vertex of shortcut from src to dst
+        self.shortcuts = 0
+        if graph is not None:
+            self.build(graph, profile)
+
+    def build(self, graph: Graph, profile: RoutingProfile | None = None):
+        # Arcs are edges allowed by profile, in the direction(s) they can be travelled, with the cost Graph searches use
+        out = {}  # {src: {dst: cost}} arcs between vertices not contracted yet
+        inn = {}  # {dst: {src: cost}}
+        for v in graph.vert_dict.values():
+            out[v.id] = {}
+            inn[v.id] = {}
+        for v in graph.vert_dict.values():
+            for dst in graph.get_connections(v, profile=profile):
+                if dst == v.id:
+                    continue
+                out[v.id][dst] = graph.get_edge(v.id, dst, profile).cost
+                inn[dst][v.id] = out[v.id][dst]
+
+        def witness(src, skip, targets: set, limit: float) -> dict:
+            # Shortest distances from src to targets not going through skip, limited in cost and settled vertices
+            dist = {src: 0}
+            queue = [(0, src)]
+            settled = 0
+            found = 0
+            while queue and settled < WITNESS_SETTLED and found < len(targets):
+                d, n = heapq.heappop(queue)
+                if d > dist[n]:
+                    continue
+                if d > limit:
+                    break
+                settled = settled + 1
+                if n in targets:
+                    found = found + 1
+                for m, c in out[n].items():
+                    if m != skip and d + c < dist.get(m, math.inf):
+                        dist[m] = d + c
+                        heapq.heappush(queue, (d + c, m))
+            return dist
+
+        def shortcuts(v) -> list:
+            # Shortcuts needed to contract v
+            needed = []
+            targets = set(out[v])
+            for u, cu in inn[v].items():
+                others = targets - {u}
+                if len(others) == 0:
+                    continue
+                limit = cu + max([out[v][w] for w in others])
+                dist = witness(u, v, others, limit)
+                for w in others:
+                    cost = cu + out[v][w]
+                    if dist.get(w, math.inf) > cost:
+                        needed.append((u, w, cost))
+            return needed
+
+        contracted = {}  # {vertex id: number of contracted neighbors}
+        level = {}  # {vertex id: level in hierarchy, one above its highest contracted neighbor}
+
+        def priority(v) -> int:
+            # Edge difference, plus contracted neighbors and level to spread contraction uniformly
+            return 2 * (len(shortcuts(v)) - len(out[v]) - len(inn[v])) + contracted.get(v, 0) + level.get(v, 0)
+
+        queue = [(priority(v), v) for v in out]
+        heapq.heapify(queue)
+        order = 0
+        while queue:
+            p, v = heapq.heappop(queue)
+            p = priority(v)  # lazy update
+            if queue and p > queue[0][0]:
+                heapq.heappush(queue, (p, v))
+                continue
+            for u, w, cost in shortcuts(v):
+                if cost < out[u].get(w, math.inf):
+                    out[u][w] = cost
+                    inn[w][u] = cost
+                    self.middle[(u, w)] = v
+                    self.shortcuts = self.shortcuts + 1
+            self.rank[v] = order
+            order = order + 1
+            # remaining arcs of v go to vertices contracted later, i.e. higher in hierarchy
+            self.up[v] = list(out[v].items())
+            self.down[v] = list(inn[v].items())
+            for w in out[v]:
+                del inn[w][v]
+                contracted[w] = contracted.get(w, 0) + 1
+                level[w] = max(level.get(w, 0), level.get(v, 0) + 1)
+            for u in inn[v]:
+                del out[u][v]
+                contracted[u] = contracted.get(u, 0) + 1
+                level[u] = max(level.get(u, 0), level.get(v, 0) + 1)
+            del out[v]
+            del inn[v]
+        logger.debug(f"hierarchy {profile}: {len(self.rank)} vertices, {self.shortcuts} shortcuts")
+
+    def route(self, src, dst) -> list | None:
+        # Shortest route from src to dst, as a list of vertex ids, None if not found
+        if src not in self.rank or dst not in self.rank:
+            logger.warning(f"hierarchy: invalid vertex id {src} or {dst}")
+            return None
+        if src == dst:
+            return [src]
+        dist = [{src: 0}, {dst: 0}]
+        parents = [{src: None}, {dst: None}]
+        queues = [[(0, src)], [(0, dst)]]
+        arcs = [self.up, self.down]
+        best = math.inf
+        meet = None
+        while queues[0] or queues[1]:
+            for i in [0, 1]:
+                if not queues[i]:
+                    continue
+                d, n = heapq.heappop(queues[i])
+                if d > dist[i][n]:
+                    continue
+                if d >= best:  # cannot improve in this direction
+                    queues[i] = []
+                    continue
+                other = dist[1 - i].get(n)
+                if other is not None and d + other < best:
+                    best = d + other
+                    meet = n
+                # stall on demand: n is reached shorter from a higher vertex, no need to go further from n
+                stalled = False
+                for m, c in arcs[1 - i][n]:
+                    if dist[i].get(m, math.inf) + c < d:
+                        stalled = True
+                        break
+                if stalled:
+                    continue
+                for m, c in arcs[i][n]:
+                    if d + c < dist[i].get(m, math.inf):
+                        dist[i][m] = d + c
+                        parents[i][m] = n
+                        heapq.heappush(queues[i], (d + c, m))
+        if meet is None:
+            logger.debug(f"hierarchy: could not find route from {src} to {dst}")
+            return None
+
+        # up from src to meeting vertex, then down from meeting vertex to dst
+        path = [meet]
+        n = meet
+        while parents[0][n] is not None:
+            n = parents[0][n]
+            path.insert(0, n)
+        n = meet
+        while parents[1][n] is not None:
+            n = parents[1][n]
+            path.append(n)
+        route = [path[0]]
+        for i in range(len(path) - 1):
+            route = route + self.unpack(path[i], path[i + 1])
+        return route
+
+    def unpack(self, src, dst) -> list:
+        # Original vertices of arc from src to dst, excluding src
+        arcs = [(src, dst)]
+        route = []
+        while arcs:
+            u, w = arcs.pop()
+            m = self.middle.get((u, w))
+            if m is None:
+                route.append(w)
+            else:
+                arcs.append((m, w))
+                arcs.append((u, m))
+        return route
+
+    def compiled(self) -> dict:
+        # Hierarchy in a form suitable for compiled cache
+        arcs = []
+        for v, arr in self.up.items():
+            arcs = arcs + [(v, w, c, self.middle.get((v, w))) for w, c in arr]
+        for v, arr in self.down.items():
+            arcs = arcs + [(u, v, c, self.middle.get((u, v))) for u, c in arr]
+        return {"order": sorted(self.rank, key=self.rank.get), "arcs": arcs}
+
+    @classmethod
+    def fromCompiled(cls, data: dict):
+        hierarchy = cls()
+        hierarchy.rank = {v: i for i, v in enumerate(data["order"])}
+        for v in data["order"]:
+            hierarchy.up[v] = []
+            hierarchy.down[v] = []
+        for u, w, c, m in data["arcs"]:
+            if hierarchy.rank[u] < hierarchy.rank[w]:
+                hierarchy.up[u].append((w, c))
+            else:
+                hierarchy.down[w].append((u, c))
+            if m is not None:
+                hierarchy.middle[(u, w)] = m
+                hierarchy.shortcuts = hierarchy.shortcuts + 1
+        return hierarchy
@@ -1,7 +1,6 @@
 # Light setup utility Class
 # Keep track of all lights set for FTG, their status, etc. Manipulate them as well.
 #
-import math
 import os.path
 from random import randint
 
@@ -10,7 +9,8 @@ try:
 except ImportError:
     print("X-Plane not loaded")
 
-from .geo import Point, FeatureCollection, distance, bearing, destination, convertAngleTo360, pointInPolygon
+from .geo import Point, FeatureCollection, distance, distanceTo, bearing, destination, convertAngleTo360, pointInPolygon
+from .geoarray import Coordinates, closest
 from .globals import (
     logger,
     get_global,
@@ -162,6 +162,8 @@ POINT_COUNTS    0 0 0 0
 class Light:
     # A light to follow, or a stopbar light
     # Holds a referece to its instance
+    __slots__ = ("lightType", "edgeIndex", "position", "heading", "params", "drefs", "lightObject", "xyz", "instance", "instanceOff")
+
     def __init__(self, lightType, position, heading, index):
         self.lightType = lightType
         self.edgeIndex = index  # # of edge of route, starting from 0
@@ -333,6 +335,7 @@ class LightString:
         self.prefs = preferences  # get FtG preference from there
 
         self.lights = []  # all green lights from start to destination indexed from 0 to len(lights)
+        self.coordinates = Coordinates([])  # positions of lights, for vectorized geometry
         self.stopbars = []  # Keys of this dict are green light indices.
         self.segments = 0
         self.currentSegment = 0
@@ -484,6 +487,7 @@ class LightString:
         logger.debug(f"populate: on runway = {onRunway}")
         self.route = route
         graph = route.graph
+        projection = graph.projection
         thisLights = []
         onILSvtx = False
         onILSidx = None
@@ -511,9 +515,9 @@ class LightString:
             nextVertex = graph.get_vertex(route.route[i])
             logger.debug(f"at vertex {i}, {nextVertex.id}, {len(thisLights)}")
 
-            thisEdge = graph.get_edge(currVertex.id, nextVertex.id)
+            thisEdge = graph.get_edge(currVertex.id, nextVertex.id, route.profile)
             distToNextVertex = thisEdge.cost
-            brng = bearing(currVertex, nextVertex)  # make sure we have it the right orientation
+            brng = projection.bearing(currVertex, nextVertex)  # make sure we have it the right orientation
 
             # logger.debug(f"thisEdge: {currVertex.id}-{thisEdge.end.id}, {thisEdge.usage}, {thisEdge.mkActives()}, rwy={onRwy}, ils={False if not onILSvtx else True}")
             if not onILSvtx and thisEdge.has_active(TAXIWAY_ACTIVE.ILS):  # remember entry into ILS zone
@@ -601,8 +605,8 @@ class LightString:
                 distanceBeforeNextLight = distanceBeforeNextLight - distToNextVertex
             else:  # we insert a light until we reach the next point
                 while distanceBeforeNextLight < distToNextVertex:
-                    nextLightPos = destination(currPoint, brng, distanceBeforeNextLight)
-                    brgn = bearing(lastLight, nextLightPos)
+                    nextLightPos = projection.destination(currPoint, brng, distanceBeforeNextLight)
+                    brgn = projection.bearing(lastLight, nextLightPos)
                     thisLights.append(Light(self.nextTaxiwayLight(nextLightPos, thisEdge), nextLightPos, brgn, i - 1))
                     lastLight = nextLightPos
                     distToNextVertex = distToNextVertex - distanceBeforeNextLight  # should be close to ftg_geoutil.distance(currPoint, nextVertex)
@@ -614,7 +618,7 @@ class LightString:
                 # logger.debug("remaining: %f", distanceBeforeNextLight)
 
                 if self.add_light_at_vertex:  # may be we insert a last light at the vertex?
-                    brgn = bearing(lastLight, nextVertex)
+                    brgn = projection.bearing(lastLight, nextVertex)
                     thisLights.append(Light(self.nextTaxiwayLight(nextVertex, thisEdge), nextVertex, brgn, i - 1))
                     lastLight = nextVertex
                     # logger.debug("added light at vertex %s", nextVertex.id)
@@ -642,6 +646,7 @@ class LightString:
             last = sb.lightStringIndex
 
         self.lights = thisLights
+        self.coordinates = Coordinates([l.position for l in thisLights])
 
         return thisLights
 
@@ -870,25 +875,14 @@ class LightString:
         return len(self.lights) - 1
 
     def closest(self, position, after: int = 0):
-        # Find closest light to position (often aircraft)
-        dist = math.inf
-        idx = None
-        point = Point(position[0], position[1])
-        for i in range(after, len(self.lights)):
-            light = self.lights[i]
-            d = distance(point, light.position)
-            if d < dist:
-                dist = d
-                idx = i
-
-        return [idx, dist]
+        # Find closest light to position (often aircraft), all lights at once
+        return closest(position, self.coordinates, after)
 
     def toNextStop(self, position):
         # light index of next stop position and distance to it
         ns = self.nextStop()
         light = self.lights[ns]
-        point = Point(position[0], position[1])
-        d = distance(point, light.position)
+        d = distanceTo(light.position, position[0], position[1])
         c, d2 = self.closest(position)
         d3 = abs(c - ns) * self.distance_between_lights
         # logger.debug(f"control: closest={c} (at {round(d2, 1)}m), next stop={ns}, d calc={round(d3, 1)}m, d mesure={round(d, 1)}m")
@@ -0,0 +1,101 @@
+# Background airport prefetch
+# While the aircraft approaches an airport, the airport it will most likely land at
+# is loaded and prepared in a worker thread, so that it is ready when FtG is started after landing.
+# X-Plane SDK calls (aircraft position, nearest airport) are made in a flight loop, on X-Plane main thread.
+# Airport loading and preparation (no X-Plane SDK call) is made in the worker thread,
+# into the shared airport cache. If FtG asks for the airport while it is being prepared, it waits for it.
+#
+import threading
+import queue
+
+try:
+    import xp
+except ImportError:
+    print("X-Plane not loaded")
+
+from .globals import logger, get_global
+from .geo import distanceLatLon
+from .aircraft import Aircraft
+from .airports import airportCache
+
+
+class Prefetcher:
+
+    def __init__(self, ftg):
+        self.ftg = ftg
+        self.refprefetch = "FtG:prefetch"
+        self.flprefetch = None
+        self.running = False
+        self.aircraft = None
+        self.requested = None  # last airport requested for prefetch
+        self.failed = set()  # airports that could not be prepared, not requested again
+        self.requests = queue.Queue()
+        self.worker = None
+
+    def start(self):
+        if self.running:
+            logger.debug("prefetch running")
+            return
+        self.aircraft = Aircraft(prefs=self.ftg.prefs)
+        self.worker = threading.Thread(target=self.work, args=(self.requests,), name="FtG:prefetch", daemon=True)
+        self.worker.start()
+        self.flprefetch = xp.createFlightLoop(callback=self.prefetchFLCB, phase=xp.FlightLoop_Phase_AfterFlightModel, refCon=self.refprefetch)
+        xp.scheduleFlightLoop(self.flprefetch, get_global("PREFETCH_INTERVAL", self.ftg.prefs), 1)
+        self.running = True
+        logger.debug("prefetch started")
+
+    def stop(self):
+        if not self.running:
+            logger.debug("prefetch not running")
+            return
+        xp.destroyFlightLoop(self.flprefetch)
+        self.flprefetch = None
+        self.requests.put(None)  # stops worker after current airport
+        self.requests = queue.Queue()  # worker of next start gets its own queue
+        self.worker = None
+        self.running = False
+        logger.debug("prefetch stopped")
+
+    def prefetchFLCB(self, elapsedSinceLastCall, elapsedTimeSinceLastFlightLoop, counter, inRefcon):
+        # pylint: disable=unused-argument
+        # Main thread: guesses the airport the aircraft will land at, requests its preparation if needed.
+        interval = get_global("PREFETCH_INTERVAL", self.ftg.prefs)
+        try:
+            pos = self.aircraft.position()
+            if pos is None or (pos[0] == 0 and pos[1] == 0):
+                return interval
+            if self.aircraft.altitude() > get_global("PREFETCH_ALTITUDE", self.ftg.prefs):
+                return interval
+            airport = self.aircraft.airport(pos)
+            if airport is None or airport.name == "NOT FOUND":
+                return interval
+            icao = airport.navAidID
+            if icao == self.requested or icao in self.failed:
+                return interval
+            d = distanceLatLon(pos[0], pos[1], airport.latitude, airport.longitude)
+            if d > get_global("PREFETCH_DISTANCE", self.ftg.prefs):
+                return interval
+            self.requested = icao
+            self.requests.put(icao)
+            logger.info(f"prefetching {icao} at {round(d/1000, 1)}km")
+        except:
+            logger.debug("error", exc_info=True)
+        return interval
+
+    def work(self, requests: queue.Queue):
+        # Worker thread: prepares requested airports, one at a time, latest request first.
+        # Prepared airports go to the shared airport cache where FtG will find them.
+        while True:
+            icao = requests.get()
+            if icao is None:
+                return
+            while not requests.empty():  # only keep latest request
+                icao = requests.get()
+                if icao is None:
+                    return
+            airport, status = airportCache().get(icao, self.ftg.prefs)
+            if airport is not None:
+                logger.info(f"prefetched {icao}")
+            else:
+                self.failed.add(icao)
+                logger.info(f"{icao} not prefetched: {status[1]}")
@@ -0,0 +1,222 @@
+# Reverse shortest route trees
+# Destinations at an airport are few and known in advance: runways and holding positions on departure, ramps on arrival.
+# A reverse shortest route tree rooted at a destination vertex gives, for every vertex that can reach the destination,
+# the next vertex on the shortest route to the destination. Route to the destination is then a walk from the start vertex,
+# without search. New greens and re-routes after a wrong turn to the same destination reuse the tree.
+# Trees are built for a routing profile (edges allowed, one ways). When the profile changes (aircraft, strict mode),
+# trees of other profiles are dropped.
+# Trees are only built in a worker thread, never on the sim thread. When destinations are proposed, trees of the first
+# (most restricted) level are built for all destinations, trees of other levels while the cache is not full.
+# A route to a destination whose trees are not built yet is a miss: route is searched otherwise (see Route._search())
+# and trees of that destination are built next.
+# Trees use vertex indices (Graph.vert_dict order), parent of a vertex is an array index, to keep many trees small.
+#
+import heapq
+import math
+import threading
+from array import array
+from collections import OrderedDict, deque
+
+from .globals import logger
+from .graph import Graph, RoutingProfile
+from .hierarchy import profileKey
+
+
+def profileKeys(graph: Graph, profile: RoutingProfile | None) -> list:
+    # Returns [(profile key, profile)] of successive searches equivalent to profile search, see Route._findHierarchy()
+    profiles = profile.levels() if profile is not None and profile.relaxed else [profile]
+    keys = []
+    for p in profiles:
+        key = profileKey(graph, p)
+        if key not in [k[0] for k in keys]:  # profiles with same edges allowed
+            keys.append((key, p))
+    return keys
+
+
+class RouteTree:
+
+    def __init__(self, root: int, arcs: list):
+        self.root = root
+        self.parent = array("q", [-1]) * len(arcs)  # {index: next index toward root, -1 if root cannot be reached}
+        self.parent[root] = root
+        self.build(arcs)
+
+    def build(self, arcs: list):
+        # Dijkstra from root on reversed arcs, {dst index: [(src index, cost)]}
+        dist = {self.root: 0}
+        queue = [(0, self.root)]
+        while queue:
+            d, n = heapq.heappop(queue)
+            if d > dist[n]:
+                continue
+            for m, c in arcs[n]:
+                if d + c < dist.get(m, math.inf):
+                    dist[m] = d + c
+                    self.parent[m] = n
+                    heapq.heappush(queue, (d + c, m))
+
+    def route(self, src: int) -> list | None:
+        # Shortest route from src to root, as a list of vertex indices, None if root cannot be reached from src
+        if self.parent[src] < 0:
+            return None
+        route = [src]
+        while route[-1] != self.root:
+            route.append(self.parent[route[-1]])
+        return route
+
+
+class RouteTrees:
+
+    def __init__(self, graph: Graph, size: int):
+        self.graph = graph
+        self.size = size
+        self.capacity = size  # trees kept, at least one per destination and size more, see prepare()
+        self.ids = list(graph.vert_dict)  # {index: vertex id}
+        self.index = {vid: i for i, vid in enumerate(self.ids)}  # {vertex id: index}
+        self.trees = OrderedDict()  # {(profile key, root): RouteTree}, least recently used first
+        self.arcs = {}  # {profile key: {dst index: [(src index, cost)]}} reversed arcs allowed by profile
+        self.loading = {}  # {(profile key, root): threading.Event} trees being built
+        self.jobs = deque()  # [(generation, profile key, profile, root)] trees to build in worker thread
+        self.working = False  # worker thread running
+        self.lock = threading.RLock()
+        self.generation = 0  # incremented on each prepare, drops jobs of previous prepare
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> str:
+        return f"hits={self.hits}, misses={self.misses}, {len(self.trees)} trees"
+
+    def mkArcs(self, key: str, profile: RoutingProfile | None) -> list:
+        with self.lock:
+            arcs = self.arcs.get(key)
+            if arcs is not None:
+                return arcs
+        arcs = [[] for i in range(len(self.ids))]
+        for v in self.graph.vert_dict.values():
+            src = self.index[v.id]
+            for dst in self.graph.get_connections(v, profile=profile):
+                if dst != v.id:
+                    arcs[self.index[dst]].append((src, self.graph.get_edge(v.id, dst, profile).cost))
+        with self.lock:
+            self.arcs[key] = arcs
+        return arcs
+
+    def tree(self, key: str, profile: RoutingProfile | None, root) -> RouteTree:
+        # Returns tree toward root for profile, built if not available. If it is being built by another thread, waits for it.
+        while True:
+            with self.lock:
+                tree = self.trees.get((key, root))
+                if tree is not None:
+                    self.trees.move_to_end((key, root))
+                    return tree
+                loading = self.loading.get((key, root))
+                if loading is None:
+                    loading = threading.Event()
+                    self.loading[(key, root)] = loading
+                    break
+            loading.wait()
+        try:
+            tree = RouteTree(self.index[root], self.mkArcs(key, profile))
+            with self.lock:
+                self.trees[(key, root)] = tree
+                while len(self.trees) > self.capacity:
+                    self.trees.popitem(last=False)
+        finally:
+            with self.lock:
+                self.loading.pop((key, root), None)
+            loading.set()
+        return tree
+
+    def path(self, tree: RouteTree, src) -> list | None:
+        route = tree.route(self.index[src])
+        return [self.ids[i] for i in route] if route is not None else None
+
+    def route(self, src, dst, profile: RoutingProfile | None) -> list | None:
+        # Shortest route from src to dst, None if not found. Relaxed profile route is the route of the first level that has one.
+        # Trees are built if not available, not to be used on the sim thread, see lookup().
+        if src not in self.index or dst not in self.index:
+            return None
+        for key, p in profileKeys(self.graph, profile):
+            route = self.path(self.tree(key, p, dst), src)
+            if route is not None:
+                return route
+        return None
+
+    def lookup(self, src, dst, profile: RoutingProfile | None) -> tuple:
+        # Returns (True, shortest route from src to dst or None) if trees needed are built,
+        # (False, None) otherwise (miss), trees of dst are then queued for the worker thread. Never builds a tree.
+        if src not in self.index or dst not in self.index:
+            return False, None
+        keys = profileKeys(self.graph, profile)
+        for key, p in keys:
+            with self.lock:
+                tree = self.trees.get((key, dst))
+                if tree is not None:
+                    self.trees.move_to_end((key, dst))
+            if tree is None:
+                self.misses = self.misses + 1
+                self.queue([(key, p, dst) for key, p in keys], first=True)
+                return False, None
+            route = self.path(tree, src)
+            if route is not None:
+                self.hits = self.hits + 1
+                return True, route
+        self.hits = self.hits + 1
+        return True, None
+
+    def invalidate(self, keys: list):
+        # Drops trees and arcs of profile keys not in keys
+        with self.lock:
+            for k in [k for k in self.trees if k[0] not in keys]:
+                del self.trees[k]
+            for k in [k for k in self.arcs if k not in keys]:
+                del self.arcs[k]
+
+    def prepare(self, profile: RoutingProfile | None, roots: list):
+        # Drops trees of other profiles, queues trees toward roots for profile for the worker thread:
+        # first level for all roots, other levels are used less often, while cache is not full.
+        keys = profileKeys(self.graph, profile)
+        self.invalidate([k[0] for k in keys])
+        roots = [r for r in roots if r in self.index]
+        jobs = [(keys[0][0], keys[0][1], root) for root in roots]
+        for key, p in keys[1:]:
+            jobs = jobs + [(key, p, root) for root in roots]
+        jobs = jobs[: max(self.size, len(roots))]
+        with self.lock:
+            self.generation = self.generation + 1
+            self.jobs.clear()
+            self.capacity = len(jobs) + self.size  # room for trees built on miss
+        logger.debug(f"route trees: {len(roots)} destinations, {len(jobs)} trees queued")
+        self.queue(jobs)
+
+    def queue(self, jobs: list, first: bool = False):
+        # Adds [(profile key, profile, root)] trees to build, first to build them before others, starts worker if needed.
+        with self.lock:
+            jobs = [(self.generation, key, p, root) for key, p, root in jobs]
+            if first:
+                self.jobs.extendleft(reversed(jobs))
+            else:
+                self.jobs.extend(jobs)
+            if self.working or len(self.jobs) == 0:
+                return
+            self.working = True
+        worker = threading.Thread(target=self.work, name="FtG:routetrees", daemon=True)
+        worker.start()
+
+    def work(self):
+        # Worker thread: builds queued trees, stops when there is nothing left to build
+        count = 0
+        while True:
+            with self.lock:
+                if len(self.jobs) == 0:
+                    self.working = False
+                    break
+                generation, key, profile, root = self.jobs.popleft()
+                if generation != self.generation or (key, root) in self.trees:  # profile or destinations changed, or built
+                    continue
+            try:
+                self.tree(key, profile, root)
+                count = count + 1
+            except Exception:
+                logger.warning(f"route trees: could not build tree toward {root}", exc_info=True)
+        logger.debug(f"route trees: {count} trees built ({self.stats()})")
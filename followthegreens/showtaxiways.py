@@ -18,13 +18,15 @@ except ImportError:
     print("X-Plane not loaded")
 
 from .followthegreens import FollowTheGreens
-from .airport import Airport
+from .airports import airportCache
 from .lightstring import LightString
 from .globals import logger, FTG_STATUS
 
 
 class ShowTaxiways(FollowTheGreens):
 
+    PREFETCH = False  # airports are prefetched by Follow the greens
+
     def __init__(self, pi):
         FollowTheGreens.__init__(self, pi=pi)
         self._status = FTG_STATUS.INITIALIZED
@@ -34,8 +36,7 @@ class ShowTaxiways(FollowTheGreens):
 
     def showTaxiways(self, airport):
         if not self.airport:
-            self.airport = Airport(airport)
-            status = self.airport.prepare()  # [ok, errmsg]
+            self.airport, status = airportCache().get(airport, self.prefs)  # [ok, errmsg]
             if not status[0]:
                 logger.warning(f"airport not ready: {status[1]}")
                 return self.ui.sorry(status[1])
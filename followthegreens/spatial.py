@@ -0,0 +1,165 @@
+# Spatial indices
+# Uniform grid of latitude/longitude cells over airport routing network vertices (GridIndex) or edges (SegmentIndex).
+# Nearest search only looks at cells around the point, in rings of increasing size,
+# until nothing closer can be found in further rings. Polygon search only looks at cells under the polygon bounding box.
+# Results are the same as a scan of all vertices or edges, in graph order: first one found wins ties.
+#
+import math
+
+from .geo import R, distance, pointInPolygon, nearestPointToLine
+
+GRID_CELL = 100  # m, grid cell size
+
+
+class GridIndex:
+
+    def __init__(self, vertices, cell: float = GRID_CELL):
+        # vertices is an iterable of Vertex, in graph order
+        vertices = list(vertices)
+        self.setup(vertices, cell)
+        for order, v in enumerate(vertices):
+            self.add((order, v), v.lat, v.lon, v.lat, v.lon)
+
+    def setup(self, points: list, cell: float):
+        self.cells = {}  # {(i, j): [(order, item)]}
+        self.count = 0
+        self.dlat = math.degrees(cell / R)  # cell size in degrees
+        self.dlon = self.dlat
+        self.bbox = None  # (imin, jmin, imax, jmax) cells that contain items
+        self.maxlat = 0.0  # largest absolute latitude of items
+        if len(points) > 0:
+            lat0 = sum([p.lat for p in points]) / len(points)
+            self.dlon = self.dlat / max(math.cos(math.radians(lat0)), 0.01)
+
+    def add(self, item: tuple, lat1: float, lon1: float, lat2: float, lon2: float):
+        # Adds item to all cells of its bounding box
+        imin, jmin = self.cell(min(lat1, lat2), min(lon1, lon2))
+        imax, jmax = self.cell(max(lat1, lat2), max(lon1, lon2))
+        for i in range(imin, imax + 1):
+            for j in range(jmin, jmax + 1):
+                self.cells.setdefault((i, j), []).append(item)
+        if self.bbox is None:
+            self.bbox = (imin, jmin, imax, jmax)
+        else:
+            self.bbox = (min(imin, self.bbox[0]), min(jmin, self.bbox[1]), max(imax, self.bbox[2]), max(jmax, self.bbox[3]))
+        self.maxlat = max(self.maxlat, abs(lat1), abs(lat2))
+        self.count = self.count + 1
+
+    def cell(self, lat: float, lon: float) -> tuple:
+        return (math.floor(lat / self.dlat), math.floor(lon / self.dlon))
+
+    def bound(self, k: int, lat: float) -> float:
+        # Distance under which nothing in a cell k cells away (or further) from the point cell can be
+        if k <= 1:
+            return 0.0
+        dlat = math.radians((k - 1) * self.dlat)
+        dlon = math.radians((k - 1) * self.dlon)
+        coslat = math.cos(math.radians(min(max(self.maxlat, abs(lat)), 90.0)))
+        return min(R * dlat, 2 * R * math.asin(min(1.0, coslat * math.sin(min(dlon, math.pi) / 2))))
+
+    def ring(self, ci: int, cj: int, k: int) -> list:
+        # Cells at exactly k cells away from (ci, cj) that are inside bbox
+        imin, jmin, imax, jmax = self.bbox
+        cells = []
+        for i in range(max(ci - k, imin), min(ci + k, imax) + 1):
+            if abs(i - ci) == k:
+                js = range(max(cj - k, jmin), min(cj + k, jmax) + 1)
+            else:
+                js = [j for j in [cj - k, cj + k] if jmin <= j <= jmax]
+            for j in js:
+                cells.append((i, j))
+        return cells
+
+    def rings(self, point):
+        # Yields (k, bound, cells) of rings around point, from the first ring that touches bbox to the ring that covers it
+        ci, cj = self.cell(point.lat, point.lon)
+        imin, jmin, imax, jmax = self.bbox
+        kmin = max(imin - ci, ci - imax, jmin - cj, cj - jmax, 0)
+        kmax = max(abs(imin - ci), abs(imax - ci), abs(jmin - cj), abs(jmax - cj))
+        for k in range(kmin, kmax + 1):
+            yield k, self.bound(k, point.lat), self.ring(ci, cj, k)
+
+    def nearest(self, point, accept=None) -> tuple:
+        # Returns (vertex, distance) of closest vertex to point accepted by accept(vertex), (None, math.inf) if none
+        if self.bbox is None:
+            return None, math.inf
+        best = None  # (distance, order, vertex)
+        for k, bound, cells in self.rings(point):
+            if best is not None and best[0] < bound:
+                break
+            for c in cells:
+                for order, v in self.cells.get(c, []):
+                    d = distance(v, point)
+                    if best is not None and (d > best[0] or (d == best[0] and order > best[1])):
+                        continue
+                    if accept is None or accept(v):
+                        best = (d, order, v)
+        if best is None:
+            return None, math.inf
+        return best[2], best[0]
+
+    def inBox(self, points: list) -> list:
+        # Returns vertices in cells under bounding box of points, in vertex order
+        if self.bbox is None:
+            return []
+        imin, jmin = self.cell(min([p.lat for p in points]), min([p.lon for p in points]))
+        imax, jmax = self.cell(max([p.lat for p in points]), max([p.lon for p in points]))
+        found = []
+        for i in range(max(imin, self.bbox[0]), min(imax, self.bbox[2]) + 1):
+            for j in range(max(jmin, self.bbox[1]), min(jmax, self.bbox[3]) + 1):
+                found.extend(self.cells.get((i, j), []))
+        return [v for order, v in sorted(found, key=lambda f: f[0])]
+
+    def inPolygon(self, polygon, accept=None) -> list:
+        # Returns vertices inside polygon accepted by accept(vertex), in vertex order
+        if self.bbox is None:
+            return []
+        lats = [p.lat for p in polygon.coordinates]
+        lons = [p.lon for p in polygon.coordinates]
+        imin, jmin = self.cell(min(lats), min(lons))
+        imax, jmax = self.cell(max(lats), max(lons))
+        imin, jmin = max(imin, self.bbox[0]), max(jmin, self.bbox[1])
+        imax, jmax = min(imax, self.bbox[2]), min(jmax, self.bbox[3])
+        found = []
+        for i in range(imin, imax + 1):
+            for j in range(jmin, jmax + 1):
+                for order, v in self.cells.get((i, j), []):
+                    if pointInPolygon(v, polygon) and (accept is None or accept(v)):
+                        found.append((order, v))
+        return [v for order, v in sorted(found, key=lambda f: f[0])]
+
+
+class SegmentIndex(GridIndex):
+
+    def __init__(self, lines, cell: float = GRID_CELL):
+        # lines is an iterable of Line (Edge), in graph order, a line is in all cells of its bounding box
+        lines = list(lines)
+        self.setup([l.start for l in lines], cell)
+        for order, l in enumerate(lines):
+            self.add((order, l), l.start.lat, l.start.lon, l.end.lat, l.end.lon)
+
+    def nearestPoint(self, point) -> list:
+        # Returns [point, distance] of nearest point on lines, like geo.nearestPointToLines(), [None, math.inf] if none.
+        # Nearest point is on a line, in one of its cells, so it cannot be in a ring further than its distance.
+        if self.bbox is None:
+            return [None, math.inf]
+        best = None  # (distance, order, point)
+        seen = set()
+        for k, bound, cells in self.rings(point):
+            if best is not None and best[0] < bound:
+                break
+            for c in cells:
+                for order, l in self.cells.get(c, []):
+                    if order in seen:
+                        continue
+                    seen.add(order)
+                    found = nearestPointToLine(point, l)
+                    if found is None:
+                        continue
+                    if found[1] == 0:  # point is on line
+                        return found
+                    if best is None or found[1] < best[0] or (found[1] == best[0] and order < best[1]):
+                        best = (found[1], order, found[0])
+        if best is None:
+            return [None, math.inf]
+        return [best[2], best[0]]
@@ -0,0 +1,890 @@
+# Follow the greens developer benchmarks
+# Not part of the plugin, not distributed.
+# Run with python 3.12+ from the X-Plane root folder (or any folder with apt.dat files), for example:
+#
+#   python Resources/plugins/PythonPlugins/ftg_benchmark.py scan "Global Scenery/Global Airports/Earth nav data/apt.dat" EBBR
+#
+import os
+import sys
+import math
+import time
+import random
+import types
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from followthegreens.geo import R, Point, distance, pointInPolygon, nearestPointToLines
+from followthegreens.graph import Graph, Edge, RoutingProfile
+from followthegreens.aptdat import findAirportReadline, findAirportMmap, findBlockMmap, indexAirports, readAirport, streamAirport, AptRecords, ROUTING_CODES
+
+
+def memory(f, *args):
+    # Returns memory allocated by f(*args) and still in use after its return, and result
+    tracemalloc.start()
+    res = f(*args)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, res
+
+
+def timeit(f, *args, repeat: int = 3):
+    # Returns best time and last result of repeat calls of f(*args)
+    best = None
+    res = None
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        res = f(*args)
+        t = time.perf_counter() - t0
+        best = t if best is None or t < best else best
+    return best, res
+
+
+def scan(args):
+    # Compares apt.dat scanners: line by line + regex vs. memory-mapped header search
+    size = os.path.getsize(args.aptfile)
+    icao = args.icao
+    if icao is None:  # last airport in file, worst case
+        t, airports = timeit(indexAirports, args.aptfile, repeat=1)
+        icao = list(airports.keys())[-1]
+        print(f"indexed {len(airports)} airports in {round(t, 3)}s, using last airport {icao}")
+    print(f"file {args.aptfile} ({round(size / 1048576, 1)} MB), airport {icao}")
+    t1, lines1 = timeit(findAirportReadline, args.aptfile, icao, repeat=args.repeat)
+    print(f"readline: {round(t1, 3)}s, {len(lines1) if lines1 is not None else 0} lines")
+    t2, lines2 = timeit(findAirportMmap, args.aptfile, icao, repeat=args.repeat)
+    print(f"mmap    : {round(t2, 3)}s, {len(lines2) if lines2 is not None else 0} lines")
+    same = lines1 is not None and lines2 is not None and [l.strip() for l in lines1] == [l.strip() for l in lines2]
+    print(f"speedup : x{round(t1 / t2, 1)}, same lines: {same}")
+
+
+class LegacyAptLine:
+    # AptLine as it was before the record store, linecode is parsed on each call
+    def __init__(self, line):
+        self.arr = line.split()
+
+    def linecode(self):
+        if len(self.arr) > 0:
+            return int(self.arr[0])
+        return None
+
+    def content(self):
+        if len(self.arr) > 1:
+            return " ".join(self.arr[1:])
+        return None
+
+
+def legacyLines(lines):
+    return [l for l in [LegacyAptLine(line.strip()) for line in lines] if l.linecode() is not None]
+
+
+def legacyScans(lines):
+    # Passes made by loaders on list of lines, without building objects
+    n = len([l.content().split() for l in filter(lambda x: x.linecode() == 1201, lines)])  # mkRoutingNetwork vertices
+    for l in lines:  # mkRoutingNetwork edges
+        if l.linecode() == 1202 or l.linecode() == 1204:
+            n = n + len(l.content().split())
+    for l in lines:  # ldRunways
+        if l.linecode() == 100:
+            n = n + len(l.content().split())
+    for l in lines:  # ldRamps
+        if l.linecode() == 1300 or l.linecode() == 1301:
+            n = n + len(l.content().split())
+    s = {}
+    for l in lines:  # stats
+        if l.linecode() not in s:
+            s[l.linecode()] = 0
+        s[l.linecode()] = s[l.linecode()] + 1
+    return n
+
+
+def recordLines(lines):
+    records = AptRecords()
+    for line in lines:
+        records.add(line)
+    return records
+
+
+def recordScans(records):
+    # Passes made by loaders on record store, without building objects
+    n = len([r.args for r in records.get(1201)])
+    for r in records.get(1202):
+        n = n + len(r.args) + sum([len(d.args) for d in r.details or []])
+    for r in records.get(100):
+        n = n + len(r.args)
+    for r in records.get(1300):
+        n = n + len(r.args) + sum([len(d.args) for d in r.details or []])
+    records.stats()
+    return n
+
+
+def records(args):
+    # Compares list of AptLine and record store
+    lines = findAirportMmap(args.aptfile, args.icao)
+    if lines is None:
+        print(f"airport {args.icao} not found in {args.aptfile}")
+        return
+    print(f"airport {args.icao}, {len(lines)} lines")
+    m1, legacy = memory(legacyLines, lines)
+    t1, legacy = timeit(legacyLines, lines, repeat=args.repeat)
+    s1, n1 = timeit(legacyScans, legacy, repeat=args.repeat)
+    print(f"AptLine list : parse {round(t1, 3)}s, loader scans {round(s1, 3)}s, memory {round(m1 / 1048576, 1)} MB")
+    m2, store = memory(recordLines, lines)
+    t2, store = timeit(recordLines, lines, repeat=args.repeat)
+    s2, n2 = timeit(recordScans, store, repeat=args.repeat)
+    print(f"record store : parse {round(t2, 3)}s, loader scans {round(s2, 3)}s, memory {round(m2 / 1048576, 1)} MB")
+    print(f"saved        : {round(t1 + s1 - t2 - s2, 3)}s, {round((m1 - m2) / 1048576, 1)} MB, same content: {n1 == n2}")
+
+
+def blockRecords(filename, offset, length):
+    return recordLines(readAirport(filename, offset, length))
+
+
+def streamRecords(filename, offset, length):
+    records = AptRecords(codes=ROUTING_CODES)
+    for line in streamAirport(filename, offset, length):
+        records.add(line)
+    return records
+
+
+def stream(args):
+    # Compares whole airport block read and kept vs. streamed airport block keeping routing lines only
+    loc = findBlockMmap(args.aptfile, args.icao)
+    if loc is None:
+        print(f"airport {args.icao} not found in {args.aptfile}")
+        return
+    print(f"airport {args.icao}, {round(loc[1] / 1048576, 1)} MB")
+    m1, store1 = memory(blockRecords, args.aptfile, loc[0], loc[1])
+    t1, store1 = timeit(blockRecords, args.aptfile, loc[0], loc[1], repeat=args.repeat)
+    print(f"all lines     : parse {round(t1, 3)}s, {sum(len(r) for r in store1.rows.values())} records, memory {round(m1 / 1048576, 1)} MB")
+    m2, store2 = memory(streamRecords, args.aptfile, loc[0], loc[1])
+    t2, store2 = timeit(streamRecords, args.aptfile, loc[0], loc[1], repeat=args.repeat)
+    print(f"routing lines : parse {round(t2, 3)}s, {sum(len(r) for r in store2.rows.values())} records, memory {round(m2 / 1048576, 1)} MB")
+    same = all([[r.args for r in store1.get(c)] == [r.args for r in store2.get(c)] for c in ROUTING_CODES])
+    print(f"saved         : {round(t1 - t2, 3)}s, {round((m1 - m2) / 1048576, 1)} MB, same routing records: {same}, same counts: {store1.stats() == store2.stats()}")
+
+
+def gridGraph(size: int, seed: int = 1) -> Graph:
+    # Returns a taxiway network like graph of about size vertices:
+    # a grid of 60m spaced vertices, some edges missing, some oneway, some runway.
+    rnd = random.Random(seed)
+    side = int(math.sqrt(size))
+    graph = Graph(name=f"grid{size}")
+    for i in range(side):
+        for j in range(side):
+            graph.add_vertex(f"{i}_{j}", Point(50.0 + i * 0.00054, 4.0 + j * 0.00085 + rnd.uniform(-0.0001, 0.0001)), "both")
+    for i in range(side):
+        for j in range(side):
+            src = graph.get_vertex(f"{i}_{j}")
+            for dst in [graph.get_vertex(f"{i + 1}_{j}"), graph.get_vertex(f"{i}_{j + 1}")]:
+                if dst is None or rnd.random() < 0.15:
+                    continue
+                direction = "oneway" if rnd.random() < 0.1 else "twoway"
+                usage = "runway" if i == side // 2 else "taxiway_" + rnd.choice("CDE")
+                graph.add_edge(Edge(src, dst, distance(src, dst), direction, usage, f"T{i}"))
+    return graph
+
+
+def compiledGraph(data: dict) -> Graph:
+    # Routing network from compiled airport data, like Airport.ldCompiled()
+    graph = Graph()
+    for vid, lat, lon, usage, name in data["vertices"]:
+        graph.add_vertex(vid, Point(lat, lon), usage, name)
+    for src, dst, cost, direction, usage, name, actives in data["edges"]:
+        edge = Edge(graph.get_vertex(src), graph.get_vertex(dst), cost, direction, usage, name)
+        for active, runways in actives:
+            edge.add_active(active, runways)
+        graph.add_edge(edge)
+    return graph
+
+
+def routePairs(graph: Graph, count: int, seed: int = 2) -> list:
+    rnd = random.Random(seed)
+    connected = [v for v, vertex in graph.vert_dict.items() if len(vertex.adjacent) > 0]
+    return [(rnd.choice(connected), rnd.choice(connected)) for i in range(count)]
+
+
+def legacyDijkstra(graph, source, target, options={}):
+    # Graph.Dijkstra() before priority queue: linear scan for closest unvisited node, no early termination
+    route = []
+    unvisited_nodes = list(graph.get_vertices())
+    shortest_distance = {}
+    predecessor = {}
+    for nodes in unvisited_nodes:
+        shortest_distance[nodes] = math.inf
+    shortest_distance[str(source)] = 0
+    while unvisited_nodes:
+        min_node = None
+        for current_node in unvisited_nodes:
+            if min_node is None:
+                min_node = current_node
+            elif shortest_distance[min_node] > shortest_distance[current_node]:
+                min_node = current_node
+        connected = graph.get_connections(graph.get_vertex(min_node), options)
+        for child_node in connected:
+            e = graph.get_edge(min_node, child_node)
+            cost = e.cost
+            if (cost + shortest_distance[min_node]) < shortest_distance[child_node]:
+                shortest_distance[child_node] = cost + shortest_distance[min_node]
+                predecessor[child_node] = min_node
+        unvisited_nodes.remove(min_node)
+    node = target
+    while node and node != source and len(predecessor.keys()) > 0:
+        route.insert(0, node)
+        if node in predecessor:
+            node = predecessor[node]
+        else:
+            node = False
+    if not node:
+        return None
+    route.insert(0, source)
+    return route
+
+
+def legacyAStar(graph, start_node, stop_node):
+    # Graph.AStar() before priority queue: linear scan of open list, heuristic computed on each comparison
+    open_list = set([start_node])
+    closed_list = set([])
+    g = {start_node: 0}
+    parents = {start_node: start_node}
+    while len(open_list) > 0:
+        n = None
+        for v in open_list:
+            if n is None or g[v] + graph.heuristic(v, stop_node) < g[n] + graph.heuristic(n, stop_node):
+                n = v
+        if n == stop_node:
+            reconst_path = []
+            while parents[n] != n:
+                reconst_path.append(n)
+                n = parents[n]
+            reconst_path.append(start_node)
+            reconst_path.reverse()
+            return reconst_path
+        for m, weight in graph.get_neighbors(n):
+            if m not in open_list and m not in closed_list:
+                open_list.add(m)
+                parents[m] = n
+                g[m] = g[n] + weight
+            else:
+                if g[m] > g[n] + weight:
+                    g[m] = g[n] + weight
+                    parents[m] = n
+                    if m in closed_list:
+                        closed_list.remove(m)
+                        open_list.add(m)
+        open_list.remove(n)
+        closed_list.add(n)
+    return None
+
+
+def routeCost(graph: Graph, route) -> float | None:
+    if route is None:
+        return None
+    return round(sum([graph.get_vertex(route[i]).adjacent[route[i + 1]].cost for i in range(len(route) - 1)]), 6)
+
+
+def compareRouting(graph: Graph, pairs: list, legacy, current, repeat: int = 1):
+    # Runs both routing functions on all pairs, returns times and number of different routes
+    def run(f):
+        return [f(graph, s, t) for s, t in pairs]
+
+    t1, routes1 = timeit(run, legacy, repeat=repeat)
+    t2, routes2 = timeit(run, current, repeat=repeat)
+    different = len([1 for r1, r2 in zip(routes1, routes2) if r1 != r2])
+    longer = len([1 for r1, r2 in zip(routes1, routes2) if routeCost(graph, r1) != routeCost(graph, r2)])
+    return t1, t2, different, longer
+
+
+def routingGraphs(args) -> list:
+    # Graphs used in routing benchmarks: synthetic grids of increasing size, or an airport
+    if args.airport is not None:
+        from followthegreens.airport import Airport
+
+        airport = Airport(args.airport)
+        status = airport.prepare()
+        if not status[0]:
+            print(status[1])
+            return []
+        return [airport.graph]
+    return [gridGraph(size) for size in args.sizes]
+
+
+def dijkstra(args):
+    # Compares Dijkstra with linear scan (legacy) vs. priority queue with early termination
+    routing(args, legacyDijkstra, Graph.Dijkstra)
+
+
+def astar(args):
+    # Compares AStar with linear scan of open list (legacy) vs. priority queue and cached heuristic
+    routing(args, legacyAStar, Graph.AStar)
+
+
+def routing(args, legacy, current):
+    # Routes with different cost should never happen, routes with same cost may differ when several shortest routes exist
+    print(f"{'vertices':>8s} {'edges':>6s} {'legacy':>9s} {'heap':>9s} {'speedup':>8s} different routes (cost)")
+    for graph in routingGraphs(args):
+        pairs = routePairs(graph, args.pairs)
+        t1, t2, diff, longer = compareRouting(graph, pairs, legacy, current, repeat=args.repeat)
+        print(f"{len(graph.vert_dict):8d} {len(graph.edges_arr):6d} {t1 / len(pairs):8.4f}s {t2 / len(pairs):8.4f}s {t1 / t2:7.1f}x {diff}/{len(pairs)} ({longer})")
+
+
+def compact(args):
+    # Compares AStar and strict mode AStarRelaxed on Graph vs. compact (CSR) graph, and memory of both
+    from followthegreens.airport import Airport
+    from followthegreens.csr import CompactGraph
+    from followthegreens.globals import MOVEMENT, TAXIWAY_WIDTH_CODE
+
+    if args.airport is not None:
+        airport = Airport(args.airport)
+        status = airport.prepare()
+        if not status[0]:
+            print(status[1])
+            return
+        data = airport.compiled()
+        graphs = [(lambda: compiledGraph(data))]
+    else:
+        graphs = [(lambda size=size: gridGraph(size)) for size in args.sizes]
+    strict = RoutingProfile(TAXIWAY_WIDTH_CODE.D, MOVEMENT.ARRIVAL, True, False, False, True)
+    relaxed = RoutingProfile(TAXIWAY_WIDTH_CODE.D, MOVEMENT.ARRIVAL, True, False, False, True, relaxed=True)
+    print(f"{'vertices':>8s} {'edges':>6s} {'graph':>8s} {'csr':>8s} {'build':>7s} {'search':13s} {'graph':>9s} {'csr':>9s} {'speedup':>8s} different routes")
+    for mk in graphs:
+        m1, graph = memory(mk)
+        m2, csr = memory(CompactGraph, graph)
+        build, csr = timeit(CompactGraph, graph, repeat=args.repeat)
+        pairs = routePairs(graph, args.pairs)
+        searches = {
+            "AStar": (lambda: [graph.AStar(s, t) for s, t in pairs], lambda: [csr.AStar(s, t) for s, t in pairs]),
+            "AStar profile": (lambda: [graph.AStar(s, t, strict) for s, t in pairs], lambda: [csr.AStar(s, t, strict) for s, t in pairs]),
+            "AStarRelaxed": (lambda: [graph.AStarRelaxed(s, t, relaxed) for s, t in pairs], lambda: [csr.AStarRelaxed(s, t, relaxed) for s, t in pairs]),
+        }
+        head = f"{len(graph.vert_dict):8d} {len(graph.edges_arr):6d} {m1 / 1048576:6.2f}MB {m2 / 1048576:6.2f}MB {build:6.3f}s"
+        for name, (legacy, current) in searches.items():
+            t1, routes1 = timeit(legacy, repeat=args.repeat)
+            t2, routes2 = timeit(current, repeat=args.repeat)
+            diff = len([1 for r1, r2 in zip(routes1, routes2) if r1 != r2])
+            print(f"{head} {name:13s} {t1 / len(pairs):8.5f}s {t2 / len(pairs):8.5f}s {t1 / t2:7.1f}x {diff}/{len(pairs)}")
+            head = " " * len(head)
+
+
+def chains(args):
+    # Vertices and edges searches visit with chains contracted, AStar and strict mode AStarRelaxed on compact graph
+    # without and with chains contracted
+    from followthegreens.airport import Airport
+    from followthegreens.csr import CompactGraph
+    from followthegreens.globals import MOVEMENT, TAXIWAY_WIDTH_CODE
+
+    relaxed = RoutingProfile(TAXIWAY_WIDTH_CODE.D, MOVEMENT.ARRIVAL, True, False, False, True, relaxed=True)
+    print(f"{'airport':8s} {'vertices':>8s} {'edges':>6s} {'chains':>6s} {'vertices':>14s} {'edges':>14s} {'search':13s} {'csr':>9s} {'chains':>9s} {'speedup':>8s} different routes")
+    for icao in args.airports:
+        airport = Airport(icao)
+        status = airport.prepare()
+        if not status[0]:
+            print(f"{icao:8s} {status[1]}")
+            continue
+        graph = airport.graph
+        csr = CompactGraph(graph)
+        contracted = CompactGraph(graph, contract=True)
+        inside = len([c for c in contracted.chain if c >= 0])
+        count = len(set([c for c in contracted.chain if c >= 0]))
+        vertices = len(graph.vert_dict) - inside
+        edges = len(graph.edges_arr) - inside  # n vertices inside a chain, n + 1 edges replaced by one
+        pairs = routePairs(graph, args.pairs)
+        searches = {
+            "AStar": lambda g: [g.AStar(s, t) for s, t in pairs],
+            "AStarRelaxed": lambda g: [g.AStarRelaxed(s, t, relaxed) for s, t in pairs],
+        }
+        head = f"{icao:8s} {len(graph.vert_dict):8d} {len(graph.edges_arr):6d} {count:6d} {vertices:6d} ({vertices / len(graph.vert_dict):5.1%}) {edges:6d} ({edges / len(graph.edges_arr):5.1%})"
+        for name, search in searches.items():
+            t1, routes1 = timeit(search, csr, repeat=args.repeat)
+            t2, routes2 = timeit(search, contracted, repeat=args.repeat)
+            diff = len([1 for r1, r2 in zip(routes1, routes2) if r1 != r2])
+            print(f"{head} {name:13s} {t1 / len(pairs):8.5f}s {t2 / len(pairs):8.5f}s {t1 / t2:7.1f}x {diff}/{len(pairs)}")
+            head = " " * len(head)
+
+
+def legacyGetEdge(graph, src, dst):
+    # Graph.get_edge() before edge index: two scans of all edges
+    arr = list(filter(lambda x: x.start.id == src and x.end.id == dst, graph.edges_arr))
+    if len(arr) > 0:
+        return arr[0]
+    arr = list(filter(lambda x: x.start.id == dst and x.end.id == src and x.direction.value == "twoway", graph.edges_arr))
+    if len(arr) > 0:
+        return arr[0]
+    return None
+
+
+def edges(args):
+    # Compares edge lookup by scanning all edges (legacy) vs. edge index,
+    # in Dijkstra route search and in route building and light string population.
+    from followthegreens.airport import Airport, Route
+    from followthegreens.lightstring import LightString
+    from followthegreens.globals import MOVEMENT
+
+    airport = Airport(args.airport)
+    status = airport.prepare()
+    if not status[0]:
+        print(status[1])
+        return
+    graph = airport.graph
+    pairs = routePairs(graph, args.pairs)
+    routes = [r for r in [graph.AStar(s, t) for s, t in pairs] if r is not None and len(r) > 2]
+    aircraft = types.SimpleNamespace(lights_ahead=0, rabbit_length=80, rabbit_speed=0.2)  # what LightString uses from Aircraft
+    mismatch = len([1 for e in graph.edges_arr if legacyGetEdge(graph, e.start.id, e.end.id) is not graph.get_edge(e.start.id, e.end.id)])
+    print(f"airport {args.airport}: {len(graph.vert_dict)} vertices, {len(graph.edges_arr)} edges, {len(routes)} routes, edge index mismatches: {mismatch}")
+
+    def search():
+        return [graph.Dijkstra(s, t) for s, t in pairs]
+
+    def populate():
+        n = 0
+        for r in routes:
+            route = Route(graph)
+            route.route = r
+            route.mkVertices()
+            route.mkEdges()
+            lights = LightString(airport=airport, aircraft=aircraft, preferences={})
+            n = n + len(lights.populate(route, MOVEMENT.ARRIVAL))
+        return n
+
+    results = {}
+    for name, f in [("route search", search), ("populate", populate)]:
+        graph.get_edge = types.MethodType(legacyGetEdge, graph)
+        t1, r1 = timeit(f, repeat=args.repeat)
+        del graph.get_edge
+        t2, r2 = timeit(f, repeat=args.repeat)
+        results[name] = (t1, t2, r1 == r2)
+    for name, (t1, t2, same) in results.items():
+        print(f"{name:13s}: scan {t1:.3f}s, index {t2:.3f}s, x{round(t1 / t2, 1)}, same result: {same}")
+
+
+def profiles(args):
+    # Compares restricted route search on a cloned graph (legacy) vs. on the shared graph with a routing profile,
+    # for all restriction levels of strict mode (Route.Find)
+    from followthegreens.globals import MOVEMENT, TAXIWAY_WIDTH_CODE
+
+    levels = [(w, r, o) for w in [True, False] for r in [False, True] for o in [True, False]]
+    print(f"{'vertices':>8s} {'edges':>6s} {'clone':>9s} {'profile':>9s} {'speedup':>8s} different routes")
+    for graph in routingGraphs(args):
+        pairs = routePairs(graph, args.pairs)
+
+        def cloned():
+            routes = []
+            for respect_width, use_runway, respect_oneway in levels:
+                subgraph = graph.clone(TAXIWAY_WIDTH_CODE.D, MOVEMENT.ARRIVAL, respect_width, False, use_runway, respect_oneway)
+                routes = routes + [subgraph.AStar(s, t) if s in subgraph.vert_dict and t in subgraph.vert_dict else None for s, t in pairs]
+            return routes
+
+        def profiled():
+            routes = []
+            for respect_width, use_runway, respect_oneway in levels:
+                profile = RoutingProfile(TAXIWAY_WIDTH_CODE.D, MOVEMENT.ARRIVAL, respect_width, False, use_runway, respect_oneway)
+                routes = routes + [graph.AStar(s, t, profile) for s, t in pairs]
+            return routes
+
+        t1, routes1 = timeit(cloned, repeat=args.repeat)
+        t2, routes2 = timeit(profiled, repeat=args.repeat)
+        diff = len([1 for r1, r2 in zip(routes1, routes2) if r1 != r2])
+        n = len(levels) * len(pairs)
+        print(f"{len(graph.vert_dict):8d} {len(graph.edges_arr):6d} {t1 / n:8.4f}s {t2 / n:8.4f}s {t1 / t2:7.1f}x {diff}/{n}")
+
+
+def hierarchy(args):
+    # Compares route search with AStar vs. contraction hierarchy, and hierarchy preprocessing time
+    from followthegreens.hierarchy import ContractionHierarchy
+
+    print(f"{'vertices':>8s} {'edges':>6s} {'build':>7s} {'shortcuts':>9s} {'astar':>9s} {'hierarchy':>9s} {'speedup':>8s} different routes (cost)")
+    for graph in routingGraphs(args):
+        pairs = routePairs(graph, args.pairs)
+        t0 = time.perf_counter()
+        ch = ContractionHierarchy.fromCompiled(ContractionHierarchy(graph).compiled())  # as loaded from compiled cache
+        build = time.perf_counter() - t0
+        t1, t2, diff, longer = compareRouting(graph, pairs, Graph.AStar, lambda g, s, t: ch.route(s, t), repeat=args.repeat)
+        print(f"{len(graph.vert_dict):8d} {len(graph.edges_arr):6d} {build:6.2f}s {ch.shortcuts:9d} {t1 / len(pairs):8.5f}s {t2 / len(pairs):8.5f}s {t1 / t2:7.1f}x {diff}/{len(pairs)} ({longer})")
+
+
+def trees(args):
+    # Compares strict mode route search (AStarRelaxed) vs. walk in shortest route trees toward a few destinations,
+    # tree building time is reported separately (built once per destination, in background)
+    from followthegreens.globals import MOVEMENT, TAXIWAY_WIDTH_CODE
+    from followthegreens.routetree import RouteTrees, profileKeys
+
+    profile = RoutingProfile(TAXIWAY_WIDTH_CODE.D, MOVEMENT.ARRIVAL, True, False, False, True, relaxed=True)
+
+    def cost(graph, route):
+        if route is None:
+            return None
+        return round(sum([graph.get_edge(route[i], route[i + 1], profile).cost for i in range(len(route) - 1)]), 6)
+
+    print(f"{'vertices':>8s} {'edges':>6s} {'build':>7s} {'astar':>9s} {'tree':>9s} {'speedup':>8s} different routes (restrictions, cost)")
+    for graph in routingGraphs(args):
+        pairs = routePairs(graph, args.pairs)
+        roots = list(set([t for s, t in pairs]))[: args.destinations]
+        pairs = [(s, roots[i % len(roots)]) for i, (s, t) in enumerate(pairs)]
+        cache = RouteTrees(graph, len(roots) * len(profileKeys(graph, profile)))
+        t0 = time.perf_counter()
+        for key, p in profileKeys(graph, profile):
+            for root in roots:
+                cache.tree(key, p, root)
+        build = time.perf_counter() - t0
+        t1, routes1 = timeit(lambda: [graph.AStarRelaxed(s, t, profile) for s, t in pairs], repeat=args.repeat)
+        t2, routes2 = timeit(lambda: [cache.route(s, t, profile) for s, t in pairs], repeat=args.repeat)
+        diff = len([1 for r1, r2 in zip(routes1, routes2) if r1 != r2])
+        tags = len([1 for r1, r2 in zip(routes1, routes2) if (r1 is None) != (r2 is None) or (r1 is not None and profile.tag(graph, r1) != profile.tag(graph, r2))])
+        longer = len([1 for r1, r2 in zip(routes1, routes2) if cost(graph, r1) != cost(graph, r2)])
+        print(f"{len(graph.vert_dict):8d} {len(graph.edges_arr):6d} {build:6.2f}s {t1 / len(pairs):8.5f}s {t2 / len(pairs):8.5f}s {t1 / t2:7.1f}x {diff}/{len(pairs)} ({tags}, {longer})")
+
+
+def legacyClosestVertex(graph, point, profile=None):
+    # Graph.findClosestVertex() before spatial index: distance to all vertices
+    closest = None
+    shortest = math.inf
+    for n, v in graph.vert_dict.items():
+        if len(v.adjacent) > 0 or profile is not None:
+            d = distance(v, point)
+            if d < shortest and graph.is_connected(v, profile):
+                shortest = d
+                closest = n
+    return [closest, shortest]
+
+
+def legacyVertexInPolygon(graph, polygon, profile=None):
+    # Graph.findVertexInPolygon() before spatial index: all vertices tested
+    return [v for v in graph.vert_dict.values() if pointInPolygon(v, polygon) and (profile is None or graph.is_connected(v, profile, incoming=True))]
+
+
+def spatial(args):
+    # Compares closest vertex, vertices in polygon (triangle ahead of aircraft) and closest point on edges searches,
+    # all vertices or edges vs. spatial index
+    from followthegreens.geo import Polygon, destination
+    from followthegreens.globals import MOVEMENT, TAXIWAY_WIDTH_CODE
+
+    profile = RoutingProfile(TAXIWAY_WIDTH_CODE.D, MOVEMENT.ARRIVAL, True, False, False, True)
+    print(f"{'vertices':>8s} {'edges':>6s} {'index':>7s} {'closest':>9s} {'grid':>9s} {'speedup':>8s} {'polygon':>9s} {'grid':>9s} {'speedup':>8s} {'on edge':>9s} {'grid':>9s} {'speedup':>8s} different")
+    for graph in routingGraphs(args):
+        rnd = random.Random(3)
+        vertices = list(graph.vert_dict.values())
+        points = []
+        for i in range(args.points):
+            v = rnd.choice(vertices)
+            points.append(Point(v.lat + rnd.uniform(-0.002, 0.002), v.lon + rnd.uniform(-0.002, 0.002)))
+        triangles = []
+        for p in points:
+            brng = rnd.uniform(0, 360)
+            base = destination(p, brng, 300)
+            triangles.append(Polygon([p, destination(base, brng + 90, 100), destination(base, brng - 90, 100)]))
+        t0 = time.perf_counter()
+        graph.grid = None
+        graph.segments = None
+        graph.get_grid()
+        graph.get_segments()
+        build = time.perf_counter() - t0
+        t1, closest1 = timeit(lambda: [legacyClosestVertex(graph, p, pr) for p in points for pr in [None, profile]], repeat=args.repeat)
+        t2, closest2 = timeit(lambda: [graph.findClosestVertex(p, pr) for p in points for pr in [None, profile]], repeat=args.repeat)
+        t3, inside1 = timeit(lambda: [legacyVertexInPolygon(graph, t, pr) for t in triangles for pr in [None, profile]], repeat=args.repeat)
+        t4, inside2 = timeit(lambda: [graph.findVertexInPolygon(t, pr) for t in triangles for pr in [None, profile]], repeat=args.repeat)
+        t5, onedge1 = timeit(lambda: [nearestPointToLines(p, graph.edges_arr) for p in points], repeat=args.repeat)
+        t6, onedge2 = timeit(lambda: [graph.findClosestPointOnEdges(p) for p in points], repeat=args.repeat)
+        diff = len([1 for r1, r2 in zip(closest1 + inside1, closest2 + inside2) if r1 != r2])
+        diff = diff + len([1 for r1, r2 in zip(onedge1, onedge2) if r1[1] != r2[1] or (r1[0] is not None and r1[0].coords() != r2[0].coords())])
+        n = 2 * len(points)
+        print(
+            f"{len(graph.vert_dict):8d} {len(graph.edges_arr):6d} {build:6.3f}s {t1 / n:8.5f}s {t2 / n:8.5f}s {t1 / t2:7.1f}x {t3 / n:8.5f}s {t4 / n:8.5f}s {t3 / t4:7.1f}x"
+            + f" {t5 / len(points):8.5f}s {t6 / len(points):8.5f}s {t5 / t6:7.1f}x {diff}/{2 * n + len(points)}"
+        )
+
+
+def legacyClosestVertexAheadGuess(graph, point, brng, speed, profile=None):
+    # Graph.findClosestVertexAheadGuess() before sector query: growing triangles, all vertices tested for each triangle
+    from followthegreens.geo import Polygon, destination
+
+    found = [None]
+    ahead = 300
+    lateral = 40
+    while not found[0] and ahead < 500:
+        while not found[0] and lateral < 200:
+            maxpoint = destination(point, brng, 200)
+            base = destination(point, brng, ahead)
+            triangle = Polygon([point, destination(base, brng + 90, lateral), destination(base, brng - 90, lateral)])
+            v = None
+            d = math.inf
+            for vertex in legacyVertexInPolygon(graph, triangle, profile):
+                dist = distance(maxpoint, vertex) if ahead > 200 else distance(base, vertex)
+                if dist < d:
+                    d = dist
+                    v = vertex
+            found = [v.id, d] if v else [None, d]
+            lateral += 20
+        ahead += 100
+        lateral = 40
+    return found
+
+
+def ahead(args):
+    # Compares closest vertex ahead of aircraft (arrival route start), growing triangles vs. single grid query
+    from followthegreens.globals import MOVEMENT, TAXIWAY_WIDTH_CODE
+
+    profile = RoutingProfile(TAXIWAY_WIDTH_CODE.D, MOVEMENT.ARRIVAL, True, False, False, True)
+    print(f"{'vertices':>8s} {'edges':>6s} {'triangles':>9s} {'grid':>9s} {'speedup':>8s} not found, different")
+    for graph in routingGraphs(args):
+        rnd = random.Random(4)
+        vertices = list(graph.vert_dict.values())
+        points = []
+        for i in range(args.points):
+            v = rnd.choice(vertices)
+            points.append((Point(v.lat + rnd.uniform(-0.003, 0.003), v.lon + rnd.uniform(-0.003, 0.003)), rnd.uniform(0, 360)))
+        graph.get_grid()
+        t1, found1 = timeit(lambda: [legacyClosestVertexAheadGuess(graph, p, b, 0, pr) for p, b in points for pr in [None, profile]], repeat=args.repeat)
+        t2, found2 = timeit(lambda: [graph.findClosestVertexAheadGuess(p, b, 0, pr) for p, b in points for pr in [None, profile]], repeat=args.repeat)
+        diff = len([1 for r1, r2 in zip(found1, found2) if r1 != r2])
+        n = 2 * len(points)
+        print(f"{len(graph.vert_dict):8d} {len(graph.edges_arr):6d} {t1 / n:8.5f}s {t2 / n:8.5f}s {t1 / t2:7.1f}x {len([1 for r in found1 if r[0] is None])}/{n}, {diff}/{n}")
+
+
+def kernels(args):
+    # Compares geo.py functions called on each point vs. geoarray.py vectorized kernels (pure Python, and NumPy if available)
+    from followthegreens import geoarray
+    from followthegreens.geo import Polygon, bearing, destination
+
+    modes = ["python"] + (["numpy"] if geoarray.np is not None else [])
+    print(f"NumPy {'available' if geoarray.np is not None else 'not available'}")
+    print(f"{'points':>7s} {'kernel':14s} {'geo.py':>9s} " + " ".join([f"{m:>9s} {'speedup':>8s}" for m in modes]) + " max difference")
+    for size in args.sizes:
+        rnd = random.Random(5)
+        points = [Point(50.0 + rnd.uniform(-0.02, 0.02), 4.0 + rnd.uniform(-0.03, 0.03)) for i in range(size)]
+        point = Point(50.0, 4.0)
+        polygon = Polygon.new(49.99, 3.99, 50.01, 4.02, 800)
+        brngs = [rnd.uniform(0, 360) for i in range(size)]
+        dists = [rnd.uniform(0, 500) for i in range(size)]
+        scalar = {
+            "distance": lambda: [distance(point, p) for p in points],
+            "bearing": lambda: [bearing(point, p) for p in points],
+            "destination": lambda: [destination(p, b, d).coords() for p, b, d in zip(points, brngs, dists)],
+            "pointInPolygon": lambda: [pointInPolygon(p, polygon) for p in points],
+        }
+        for name, f in scalar.items():
+            t0, ref = timeit(f, repeat=args.repeat)
+            line = f"{size:7d} {name:14s} {t0 * 1000:7.2f}ms"
+            diffs = []
+            for mode in modes:
+                geoarray.HAS_NUMPY = mode == "numpy"
+                coords = geoarray.Coordinates(points)
+                vectorized = {
+                    "distance": lambda: geoarray.distances(point.coords(), coords),
+                    "bearing": lambda: geoarray.bearings(point, coords),
+                    "destination": lambda: list(zip(*geoarray.destinations(coords, brngs, dists))),
+                    "pointInPolygon": lambda: geoarray.pointsInPolygon(coords, polygon),
+                }
+                t1, res = timeit(vectorized[name], repeat=args.repeat)
+                line = line + f" {t1 * 1000:7.2f}ms {t0 / t1:7.1f}x"
+                if name == "destination":
+                    diffs.append(max([max(abs(r[0] - v[0]), abs(r[1] - v[1])) for r, v in zip(ref, res)]))
+                elif name == "pointInPolygon":
+                    diffs.append(len([1 for r, v in zip(ref, res) if r != bool(v)]))
+                else:
+                    diffs.append(max([abs(r - v) for r, v in zip(ref, res)]))
+            geoarray.HAS_NUMPY = geoarray.np is not None
+            print(line + " " + ", ".join([f"{d:.2g}" for d in diffs]))
+
+
+def legacyDistance(p1, p2):
+    # geo.distance() before Point cached its radian coordinates
+    lat1, lat2 = math.radians(p1.lat), math.radians(p2.lat)
+    long1, long2 = math.radians(p1.lon), math.radians(p2.lon)
+    a = math.pow(math.sin((lat2 - lat1) / 2), 2) + math.cos(lat1) * math.cos(lat2) * math.pow(math.sin((long2 - long1) / 2), 2)
+    return 2 * R * math.asin(math.sqrt(a))
+
+
+def fastpath(args):
+    # Compares per flight loop distance from raw X-Plane position [lat, lon]: new Points vs. float functions
+    from followthegreens.geo import distanceLatLon, distanceTo
+
+    rnd = random.Random(6)
+    positions = [[50.0 + rnd.uniform(-0.02, 0.02), 4.0 + rnd.uniform(-0.03, 0.03)] for i in range(args.points)]
+    lights = [Point(50.0 + rnd.uniform(-0.02, 0.02), 4.0 + rnd.uniform(-0.03, 0.03)) for i in range(args.points)]
+    pairs = list(zip(positions, lights))
+    funcs = {
+        "position to point": (
+            lambda: [legacyDistance(Point(pos[0], pos[1]), light) for pos, light in pairs],
+            lambda: [distanceTo(light, pos[0], pos[1]) for pos, light in pairs],
+        ),
+        "position to position": (
+            lambda: [legacyDistance(Point(pos[0], pos[1]), Point(light.lat, light.lon)) for pos, light in pairs],
+            lambda: [distanceLatLon(pos[0], pos[1], light.lat, light.lon) for pos, light in pairs],
+        ),
+        "point to point": (
+            lambda: [legacyDistance(lights[i - 1], lights[i]) for i in range(len(lights))],
+            lambda: [distance(lights[i - 1], lights[i]) for i in range(len(lights))],
+        ),
+    }
+    print(f"{'distance':22s} {'Point':>9s} {'floats':>9s} {'speedup':>8s} max difference")
+    for name, (legacy, current) in funcs.items():
+        t1, res1 = timeit(legacy, repeat=args.repeat)
+        t2, res2 = timeit(current, repeat=args.repeat)
+        diff = max([abs(r1 - r2) for r1, r2 in zip(res1, res2)])
+        print(f"{name:22s} {t1 * 1e6 / args.points:7.2f}us {t2 * 1e6 / args.points:7.2f}us {t1 / t2:7.1f}x {diff:.2g}")
+
+
+def footprint(args):
+    # Memory used by routing network of an airport (vertices, edges) and by a long light string (lights)
+    from followthegreens.airport import Airport
+    from followthegreens.geo import destination
+    from followthegreens.globals import LIGHT_TYPE
+    from followthegreens.lightstring import Light
+
+    def lights(count):
+        start = Point(50.0, 4.0)
+        return [Light(LIGHT_TYPE.TAXIWAY, destination(start, 90, i * 16), 90, i // 10) for i in range(count)]
+
+    print(f"{'':22s} {'count':>8s} {'memory':>9s} {'per object':>10s} {'time':>8s}")
+    for icao in args.airports:
+        airport = Airport(icao)
+        status = airport.prepare()
+        if not status[0]:
+            print(f"{icao:22s} {status[1]}")
+            continue
+        data = airport.compiled()
+        count = len(data["vertices"]) + len(data["edges"])
+        m, graph = memory(compiledGraph, data)
+        t, graph = timeit(compiledGraph, data, repeat=args.repeat)
+        print(f"{icao + ' vertices+edges':22s} {count:8d} {m / 1048576:7.2f}MB {m / count:8.0f} B {t:7.3f}s")
+    for count in args.lights:
+        m, res = memory(lights, count)
+        t, res = timeit(lights, count, repeat=args.repeat)
+        print(f"{'lights':22s} {count:8d} {m / 1048576:7.2f}MB {m / count:8.0f} B {t:7.3f}s")
+
+
+def projection(args):
+    # Accuracy of airport local projection vs. spherical geometry, and time of light placement like functions
+    # (bearing of each edge, destination and bearing of lights at green lights spacing) on all edges
+    from followthegreens.airport import Airport
+    from followthegreens.geo import EXACT
+
+    print(f"{'airport':8s} {'extent':>7s} {'distance':>9s} {'bearing':>8s} {'light':>8s} {'spacing':>7s} {'exact':>8s} {'local':>8s} {'speedup':>8s}")
+    for icao in args.airports:
+        airport = Airport(icao)
+        status = airport.prepare()
+        if not status[0]:
+            print(f"{icao:8s} {status[1]}")
+            continue
+        report = airport.projectionAccuracy()
+        spacing = airport.distance_between_green_lights
+
+        def lights(projection):
+            count = 0
+            for e in airport.graph.edges_arr:
+                brng = projection.bearing(e.start, e.end)
+                last = e.start
+                d = spacing
+                while d < e.cost:
+                    pos = projection.destination(e.start, brng, d)
+                    projection.bearing(last, pos)
+                    last = pos
+                    d = d + spacing
+                    count = count + 1
+            return count
+
+        t1, n = timeit(lights, EXACT, repeat=args.repeat)
+        t2, n = timeit(lights, airport.graph.projection, repeat=args.repeat)
+        print(
+            f"{icao:8s} {report['extent']:6.0f}m {report['distance']:8.4f}m {report['bearing']:7.4f}° {report['light']:7.4f}m {spacing:6.0f}m {t1 * 1000:6.1f}ms {t2 * 1000:6.1f}ms {t1 / t2:7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Follow the greens benchmarks")
+    parser.add_argument("--repeat", type=int, default=3, help="number of runs, best time is reported")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    p = subparsers.add_parser("scan", help="apt.dat scanners")
+    p.add_argument("aptfile", help="apt.dat file")
+    p.add_argument("icao", nargs="?", default=None, help="airport to look for, default to last airport in file")
+    p.set_defaults(func=scan)
+
+    p = subparsers.add_parser("records", help="apt.dat lines storage")
+    p.add_argument("aptfile", help="apt.dat file")
+    p.add_argument("icao", help="airport")
+    p.set_defaults(func=records)
+
+    p = subparsers.add_parser("stream", help="apt.dat airport block streaming")
+    p.add_argument("aptfile", help="apt.dat file")
+    p.add_argument("icao", help="airport")
+    p.set_defaults(func=stream)
+
+    p = subparsers.add_parser("dijkstra", help="Dijkstra scaling, time per route")
+    p.add_argument("--sizes", type=int, nargs="+", default=[250, 500, 1000, 2000], help="synthetic graph sizes (vertices)")
+    p.add_argument("--pairs", type=int, default=10, help="number of routes per graph")
+    p.add_argument("--airport", default=None, help="use airport routing network rather than synthetic graphs (run from X-Plane folder)")
+    p.set_defaults(func=dijkstra)
+
+    p = subparsers.add_parser("astar", help="AStar scaling, time per route")
+    p.add_argument("--sizes", type=int, nargs="+", default=[250, 500, 1000, 2000, 4000, 8000], help="synthetic graph sizes (vertices)")
+    p.add_argument("--pairs", type=int, default=10, help="number of routes per graph")
+    p.add_argument("--airport", default=None, help="use airport routing network rather than synthetic graphs (run from X-Plane folder)")
+    p.set_defaults(func=astar)
+
+    p = subparsers.add_parser("edges", help="edge lookup in route search, route building and lights population")
+    p.add_argument("airport", help="airport (run from X-Plane folder)")
+    p.add_argument("--pairs", type=int, default=5, help="number of routes")
+    p.set_defaults(func=edges)
+
+    p = subparsers.add_parser("profiles", help="restricted route search, cloned graph vs. routing profile, time per route")
+    p.add_argument("--sizes", type=int, nargs="+", default=[250, 500, 1000, 2000], help="synthetic graph sizes (vertices)")
+    p.add_argument("--airport", help="use airport routing network instead of synthetic graphs (run from X-Plane folder)")
+    p.add_argument("--pairs", type=int, default=10, help="number of routes per restriction level")
+    p.set_defaults(func=profiles)
+
+    p = subparsers.add_parser("csr", help="AStar searches, graph vs. compact (compressed sparse row) graph, memory and time per route")
+    p.add_argument("--sizes", type=int, nargs="+", default=[1000, 4000, 16000], help="synthetic graph sizes (vertices)")
+    p.add_argument("--airport", help="use airport routing network instead of synthetic graphs (run from X-Plane folder)")
+    p.add_argument("--pairs", type=int, default=20, help="number of routes")
+    p.set_defaults(func=compact)
+
+    p = subparsers.add_parser("chains", help="vertices and edges searches visit with chains contracted, AStar time per route")
+    p.add_argument("airports", nargs="+", help="airports (run from X-Plane folder)")
+    p.add_argument("--pairs", type=int, default=20, help="number of routes")
+    p.set_defaults(func=chains)
+
+    p = subparsers.add_parser("hierarchy", help="contraction hierarchy, preprocessing and time per route")
+    p.add_argument("--sizes", type=int, nargs="+", default=[250, 500, 1000, 2000], help="synthetic graph sizes (vertices)")
+    p.add_argument("--airport", help="use airport routing network instead of synthetic graphs (run from X-Plane folder)")
+    p.add_argument("--pairs", type=int, default=100, help="number of routes")
+    p.set_defaults(func=hierarchy)
+
+    p = subparsers.add_parser("trees", help="shortest route trees toward destinations, time per route")
+    p.add_argument("--sizes", type=int, nargs="+", default=[250, 500, 1000, 2000], help="synthetic graph sizes (vertices)")
+    p.add_argument("--airport", help="use airport routing network instead of synthetic graphs (run from X-Plane folder)")
+    p.add_argument("--pairs", type=int, default=100, help="number of routes")
+    p.add_argument("--destinations", type=int, default=8, help="number of destinations")
+    p.set_defaults(func=trees)
+
+    p = subparsers.add_parser("spatial", help="closest vertex, vertices in polygon and closest point on edges, full scan vs. spatial index, time per search")
+    p.add_argument("--sizes", type=int, nargs="+", default=[250, 1000, 4000, 16000], help="synthetic graph sizes (vertices)")
+    p.add_argument("--airport", help="use airport routing network instead of synthetic graphs (run from X-Plane folder)")
+    p.add_argument("--points", type=int, default=100, help="number of positions")
+    p.set_defaults(func=spatial)
+
+    p = subparsers.add_parser("ahead", help="closest vertex ahead of aircraft, growing triangles vs. single grid query, time per search")
+    p.add_argument("--sizes", type=int, nargs="+", default=[250, 1000, 4000], help="synthetic graph sizes (vertices)")
+    p.add_argument("--airport", help="use airport routing network instead of synthetic graphs (run from X-Plane folder)")
+    p.add_argument("--points", type=int, default=100, help="number of positions")
+    p.set_defaults(func=ahead)
+
+    p = subparsers.add_parser("kernels", help="geometry functions, point by point vs. vectorized kernels")
+    p.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000], help="number of points")
+    p.set_defaults(func=kernels)
+
+    p = subparsers.add_parser("fastpath", help="distance from raw positions, new Points vs. float functions, time per distance")
+    p.add_argument("--points", type=int, default=10000, help="number of positions")
+    p.set_defaults(func=fastpath)
+
+    p = subparsers.add_parser("memory", help="memory of airport routing network and of long light strings")
+    p.add_argument("airports", nargs="*", help="airports (run from X-Plane folder)")
+    p.add_argument("--lights", type=int, nargs="+", default=[2000, 20000], help="light string lengths")
+    p.set_defaults(func=footprint)
+
+    p = subparsers.add_parser("projection", help="airport local projection accuracy and speed vs. spherical geometry")
+    p.add_argument("airports", nargs="+", help="airports (run from X-Plane folder)")
+    p.set_defaults(func=projection)
+
+    args = parser.parse_args()
+    args.func(args)